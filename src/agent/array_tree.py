@@ -0,0 +1,200 @@
+import math
+import time
+import numpy as np
+from game import bitboard
+from agent import mcts_uct
+
+# Árbol de búsqueda compacto: en lugar de un objeto MCTSNode por nodo, cada atributo es un array de NumPy preasignado y un nodo es un índice.
+# Los hijos de un nodo ocupan posiciones consecutivas [first_child, first_child + created), por lo que la selección UCB1 se calcula vectorizada sobre ese tramo.
+# Se usa con mcts_uct(..., tree="array") o MCTSSearch(tree="array"). Tiene la misma semántica que tree_policy y MCTSNode.backup: los hijos se crean
+# en el mismo orden (tree_policy inicializa los movimientos por explorar sin barajar y expand saca el último, así que del último movimiento legal
+# al primero), los pases son un único hijo y cada nodo acumula la recompensa del jugador que movió para llegar a él (ver tests/test_array_tree.py).
+# Admite límite de tiempo, parada anticipada, varias simulaciones por hoja y caché de evaluaciones, pero no el resto de opciones de la búsqueda
+
+PASS = -1  # Movimiento que representa un pase de turno
+DEFAULT_CAPACITY = 1 << 18  # Número de nodos por defecto (unos 14 MB)
+SELECTION_NOISE = 0.01  # Ruido gaussiano de la selección UCB1, el mismo que MCTSNode.best_child por defecto
+
+class ArrayTree:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.total_reward = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)  # -1 mientras no se hayan reservado los hijos
+        self.num_children = np.zeros(capacity, dtype=np.int8)  # Hijos reservados: uno por movimiento legal, o uno solo si hay que pasar
+        self.created = np.zeros(capacity, dtype=np.int8)  # Hijos ya creados (expandidos) de los reservados
+        self.move = np.full(capacity, PASS, dtype=np.int8)  # Casilla 0-63 a la que se movió desde el padre
+        self.white = np.zeros(capacity, dtype=np.uint64)  # Posición empaquetada en dos bitboards
+        self.black = np.zeros(capacity, dtype=np.uint64)
+        self.player = np.zeros(capacity, dtype=np.int8)  # Jugador que moverá desde este estado
+        self.legal = np.zeros(capacity, dtype=np.uint64)  # Máscara de movimientos legales del jugador activo, calculada al crear el nodo
+        self.terminal = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def nbytes(self): # Memoria de los arrays, ocupada desde el principio aunque el árbol esté vacío
+        return sum(array.nbytes for array in vars(self).values() if isinstance(array, np.ndarray))
+
+    def clear(self): # Vacía el árbol sin volver a reservar memoria. Sólo hay que restaurar lo que se acumula o se consulta antes de escribirlo
+        used = slice(0, self.size)
+        self.visits[used] = 0
+        self.total_reward[used] = 0
+        self.parent[used] = -1
+        self.first_child[used] = -1
+        self.created[used] = 0
+        self.size = 0
+
+    def position(self, node):
+        return int(self.white[node]), int(self.black[node])
+
+    def set_state(self, node, position, player):
+        self.white[node], self.black[node] = position
+        self.player[node] = player
+        own, opp = bitboard.split(position, player)
+        legal = bitboard.move_mask(own, opp)
+        self.legal[node] = legal
+        self.terminal[node] = (own | opp) == bitboard.FULL or (legal == 0 and bitboard.move_mask(opp, own) == 0)
+
+    def add_root(self, position, player):
+        node = self.size
+        self.size += 1
+        self.set_state(node, position, player)
+        return node
+
+    def reserve_children(self, node): # Reserva un tramo consecutivo para todos los hijos del nodo. Devuelve False si no queda capacidad
+        moves = bitboard.squares(int(self.legal[node]))[::-1] or [PASS]  # Orden inverso: MCTSNode.expand saca los movimientos del final de la lista
+        if self.size + len(moves) > self.capacity:
+            return False
+        first = self.size
+        self.size += len(moves)
+        self.first_child[node] = first
+        self.num_children[node] = len(moves)
+        self.parent[first:self.size] = node
+        self.move[first:self.size] = moves
+        return True
+
+    def create_child(self, node): # Crea el siguiente hijo reservado aún no expandido, calculando su posición
+        child = self.first_child[node] + self.created[node]
+        self.created[node] += 1
+        player = int(self.player[node])
+        position = self.position(node)
+        square = int(self.move[child])
+        if square != PASS:
+            position = bitboard.apply_movement(position, square // 8, square % 8, player)
+        self.set_state(child, position, 3 - player)
+        return child
+
+    def children(self, node): # Tramo de los hijos creados del nodo
+        first = self.first_child[node]
+        return slice(first, first + self.created[node]) if first >= 0 else slice(0, 0)
+
+    def best_child(self, node, c, noise_std=SELECTION_NOISE): # UCB1 vectorizado sobre los hijos creados del nodo, como MCTSNode.best_child
+        children = self.children(node)
+        visits = self.visits[children]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = self.total_reward[children] / visits + c * np.sqrt(2 * math.log(max(self.visits[node], 1)) / visits)
+        scores[visits == 0] = np.inf  # Prioriza hijos no visitados para explorarlos
+        if noise_std:
+            scores += np.random.normal(0, noise_std, len(scores))
+        return children.start + int(np.argmax(scores))
+
+    def backup(self, node, reward): # Misma retropropagación que MCTSNode.backup, siguiendo los índices de los padres
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = self.parent[node]
+        path = np.array(path)
+        parents = self.parent[path]
+        root_player = self.player[path[-1]]
+        movers = np.where(parents >= 0, self.player[parents], 3 - root_player)  # Jugador que movió para llegar a cada nodo del camino
+        self.visits[path] += 1  # Cada nodo aparece una vez en el camino
+        self.total_reward[path] += np.where(movers == root_player, reward, -reward)
+
+    def action(self, node): # Acción en el formato de mcts_uct: tupla (x, y), o None si es un pase
+        square = int(self.move[node])
+        return None if square == PASS else divmod(square, 8)
+
+    def child(self, node, action): # Hijo creado al que lleva action desde node, o None si no se ha explorado
+        square = PASS if action is None else action[0] * 8 + action[1]
+        children = self.children(node)
+        matches = np.flatnonzero(self.move[children] == square)
+        return children.start + int(matches[0]) if len(matches) else None
+
+    def subtree_stats(self, root): # (nodos, profundidad máxima) del subárbol de root, recorriéndolo por niveles
+        size, depth = 1, 0
+        level = np.array([root])
+        while True:
+            first, created = self.first_child[level], self.created[level].astype(np.int64)
+            expanded = created > 0
+            if not expanded.any():
+                return size, depth
+            level = np.concatenate([np.arange(start, start + count) for start, count in zip(first[expanded], created[expanded])])
+            size += len(level)
+            depth += 1
+
+def check_options(batch_size=1, table=None, solver=None, puct=False, profile=False): # Error si se pide una opción de la búsqueda que el árbol de arrays no tiene
+    unsupported = [name for name, used in (("batch_size", batch_size > 1), ("table", table is not None), ("solver", solver is not None), ("puct", puct), ("profile", profile)) if used]
+    if unsupported:
+        raise ValueError(f"Opciones no disponibles con tree=\"array\": {', '.join(unsupported)}")
+
+def tree_policy(tree, node, c, noise_std=SELECTION_NOISE): # Misma semántica que mcts_uct.tree_policy sobre el árbol de arrays
+    while not tree.terminal[node]:
+        if tree.first_child[node] < 0 and not tree.reserve_children(node):
+            return node  # Sin capacidad para más nodos: se evalúa el propio nodo
+        if tree.created[node] < tree.num_children[node]:
+            return tree.create_child(node)
+        node = tree.best_child(node, c, noise_std)
+    return node
+
+def run_iterations(tree, root, iterations, neural, rollouts=1, cache=None): # Ejecuta iterations iteraciones de MCTS desde root, como mcts_uct.run_iterations en serie
+    root_player = int(tree.player[root])
+    for _ in range(iterations):
+        node = tree_policy(tree, root, mcts_uct.c, SELECTION_NOISE)  # Selección y expansión del nodo
+        position = tree.position(node)
+        if neural:
+            reward = mcts_uct.default_policy(position, root_player, cache)
+        else:
+            reward = mcts_uct.default_policy_rollouts([position], [int(tree.player[node])], root_player, rollouts)[0]
+        tree.backup(node, reward)  # Retropropagación
+
+def can_stop_early(tree, root, remaining): # Igual que mcts_uct.can_stop_early
+    if int(tree.legal[root]).bit_count() <= 1:
+        return True
+    visits = sorted(tree.visits[tree.children(root)].tolist(), reverse=True) + [0, 0]
+    return visits[0] - visits[1] > remaining
+
+def search(tree, root, iterations=1000, neural=True, *, time_limit=None, early_stop=False, rollouts=1, cache=None): # Como mcts_uct.search. Devuelve las mismas estadísticas, más los nodos ocupados
+    if iterations is None and time_limit is None:
+        raise ValueError("Hace falta un límite de iteraciones o de tiempo")
+    budget = math.inf if iterations is None else iterations
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit / 1000
+    chunk = budget if deadline is None and not early_stop else mcts_uct.CHECK_EVERY
+    before = cache.counters() if cache is not None else None
+    done = 0
+    while done < budget:
+        step = min(chunk, budget - done)
+        run_iterations(tree, root, step, neural, rollouts, cache)
+        done += step
+        now = time.perf_counter()
+        if deadline is not None and now >= deadline:
+            break
+        if early_stop:
+            remaining = budget - done
+            if deadline is not None:
+                remaining = min(remaining, done / (now - start) * (deadline - now))
+            if can_stop_early(tree, root, remaining):
+                break
+
+    elapsed = time.perf_counter() - start
+    size, depth = tree.subtree_stats(root)
+    stats = {"iterations": done, "seconds": elapsed, "nodes_per_second": done / elapsed if elapsed > 0 else 0.0, "tree_size": size, "max_depth": depth, "capacity_used": tree.size / tree.capacity}
+    if cache is not None:
+        stats.update({name: value - before[name] for name, value in cache.counters().items()})
+    return stats
+
+def choose_action(tree, root, noise_std=0.0, by_visits=False): # Como mcts_uct.choose_action: el hijo con mejor recompensa media, o el más visitado con by_visits
+    if by_visits:
+        children = tree.children(root)
+        return tree.action(children.start + int(np.argmax(tree.visits[children])))
+    return tree.action(tree.best_child(root, 0, noise_std))
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+
+# Caché de evaluaciones de la red delante del modelo: la misma posición (o una de sus 8 simetrías) vuelve a aparecer como hoja
+# en las búsquedas de las jugadas siguientes y en los árboles de los dos jugadores, y sin caché la red la evalúa cada vez.
+# La clave es la posición canónica (la menor (blancas, negras) de sus 8 simetrías) y el jugador desde cuya perspectiva se evalúa,
+# que es todo lo que ve la red salvo la orientación. Con expulsión LRU y un presupuesto de memoria en MB. Se crea una por partida
+# y se pasa a mcts_uct o MCTSSearch con cache, así que dura entre búsquedas. Con PUCT no se usa, ya que también hacen falta los priors
+
+ENTRY_BYTES = 270  # Memoria medida de cada entrada: clave (tupla con dos enteros de 64 bits y el jugador), valor y nodo del OrderedDict
+DEFAULT_MB = 64
+
+# Máscaras para las simetrías con operaciones de bits. La casilla (x, y) es el bit x * 8 + y, así que cada fila es un byte
+K1, K2, K4 = 0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F
+D1, D2, D4 = 0x5500550055005500, 0x3333000033330000, 0x0F0F0F0F00000000
+
+def flip_rows(bits): # (x, y) -> (7 - x, y): invierte el orden de los bytes
+    return int.from_bytes(bits.to_bytes(8, "little"), "big")
+
+def mirror(bits): # (x, y) -> (x, 7 - y): invierte los bits de cada byte
+    bits = ((bits >> 1) & K1) | ((bits & K1) << 1)
+    bits = ((bits >> 2) & K2) | ((bits & K2) << 2)
+    return ((bits >> 4) & K4) | ((bits & K4) << 4)
+
+def transpose(bits): # (x, y) -> (y, x), con tres intercambios de bloques. Lo que se sale de 64 bits lo descartan las máscaras
+    t = D4 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = D2 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = D1 & (bits ^ (bits << 7))
+    return bits ^ t ^ (t >> 7)
+
+def symmetries(bits): # Las 8 imágenes de un bitboard, siempre en el mismo orden
+    flipped = flip_rows(bits)
+    images = [bits, flipped, mirror(bits), mirror(flipped)]
+    return images + [transpose(image) for image in images]
+
+def canonical(position): # Representante canónico de (blancas, negras), el mismo que data.compaction.canonical
+    return min(zip(symmetries(position[0]), symmetries(position[1])))
+
+class EvaluationCache:
+    def __init__(self, max_mb=DEFAULT_MB):
+        self.capacity = max(int(max_mb * 2 ** 20 // ENTRY_BYTES), 1)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.model_seconds = 0.0  # Tiempo de las llamadas a la red por los fallos, para estimar el tiempo ahorrado por los aciertos
+
+    def evaluate(self, states, player, function): # Valores para player de cada estado. function(estados, player) evalúa los que no están, en una sola llamada
+        keys = [canonical(state) + (player,) for state in states]
+        values = [None] * len(states)
+        missing = {}  # Clave -> índices que la necesitan. Dos hojas simétricas del mismo batch se evalúan una vez
+        for i, key in enumerate(keys):
+            value = self.entries.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self.entries.move_to_end(key)  # Marca la entrada como usada recientemente
+                values[i] = value
+        self.hits += len(states) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            start = time.perf_counter()
+            predictions = function([states[indices[0]] for indices in missing.values()], player)
+            self.model_seconds += time.perf_counter() - start
+            for (key, indices), value in zip(missing.items(), predictions):
+                self.put(key, float(value))
+                for i in indices:
+                    values[i] = float(value)
+        return values
+
+    def put(self, key, value):
+        self.entries[key] = value
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)  # Expulsa la entrada menos usada recientemente
+            self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def seconds_saved(self): # Estimación: cada acierto habría costado lo que cuesta de media una posición evaluada por la red
+        return self.hits * self.model_seconds / self.misses if self.misses else 0.0
+
+    def counters(self): # Contadores acumulados, para calcular lo que corresponde a cada búsqueda
+        return {"cache_hits": self.hits, "cache_misses": self.misses, "cache_seconds_saved": self.seconds_saved()}
+
+    def stats(self): # Contadores para mostrar o guardar junto al resto de estadísticas, como TranspositionTable.stats
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "evictions": self.evictions,
+            "model_seconds": self.model_seconds,
+            "seconds_saved": self.seconds_saved(),
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+def merge(records): # Suma los contadores de caché de las estadísticas de varias búsquedas (las que no usaron caché no cuentan)
+    total = {"cache_hits": 0, "cache_misses": 0, "cache_seconds_saved": 0.0}
+    for record in records:
+        for name in total:
+            total[name] += record.get(name, 0)
+    return total
+
+def format_stats(total): # Texto del resumen de merge
+    lookups = total["cache_hits"] + total["cache_misses"]
+    rate = total["cache_hits"] / lookups if lookups else 0.0
+    return f"Caché de evaluaciones: {total['cache_hits']} aciertos, {total['cache_misses']} fallos ({rate * 100:.1f}% de aciertos), {total['cache_seconds_saved']:.1f} s de red ahorrados (estimado)"
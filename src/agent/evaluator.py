@@ -0,0 +1,150 @@
+import os
+import threading
+import numpy as np
+
+# Evaluadores de posiciones para mcts_uct. Todos reciben un batch de entradas de convert_board_state con forma (N, 8, 8, 4)
+# y devuelven un array (N,) con el valor estimado. El modelo sólo se carga la primera vez que se usa, así que importar
+# este módulo (o mcts_uct) no importa TensorFlow, y las partidas con neural=False nunca llegan a cargarlo.
+# Con un modelo de create_dual_model, evaluate_policy devuelve además la probabilidad de cada una de las 64 casillas (la usa el modo PUCT)
+# El backend "patterns" no usa la red, sino las tablas de patrones de agent.patterns, y "student" usa la red reducida de agent.model.distillation
+
+base_route = os.path.dirname(os.path.abspath(__file__))
+MODEL_ROUTE = os.path.join(base_route, "model/othello_model.keras")
+NUMPY_ROUTE = os.path.join(base_route, "model/othello_model.npz")
+STUDENT_ROUTE = os.path.join(base_route, "model/othello_student.npz")  # Modelo reducido de agent.model.distillation, en el formato de NumpyEvaluator
+
+# Nombres de los pesos de create_model en el fichero .npz, en el orden de model.get_weights()
+WEIGHT_NAMES = ["conv1_kernel", "conv1_bias", "conv2_kernel", "conv2_bias",
+                "dense1_kernel", "dense1_bias", "dense2_kernel", "dense2_bias", "dense3_kernel", "dense3_bias"]
+POLICY_WEIGHT_NAMES = ["policy_conv_kernel", "policy_conv_bias", "policy_kernel", "policy_bias"]  # Pesos de la cabeza de política del modelo dual
+BACKENDS = ["keras", "numpy", "patterns", "student"]  # Motores de inferencia de create_evaluator
+DUAL_LAYERS = ["conv1", "conv2", "dense1", "dense2", "value", "policy_conv", "policy"]  # Capas de create_dual_model en el orden de WEIGHT_NAMES + POLICY_WEIGHT_NAMES
+load_lock = threading.Lock()  # Carga diferida segura con varios hilos (búsqueda en paralelo en árbol): el modelo se carga una sola vez
+
+class KerasEvaluator: # Evalúa con el modelo de Keras, igual que hacía mcts_uct
+    def __init__(self, route=MODEL_ROUTE):
+        self.route = route
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            with load_lock:
+                if self.model is None:  # Otro hilo puede haberlo cargado mientras éste esperaba
+                    import keras  # Import diferido: sólo se paga el arranque de TensorFlow si se usa la red
+                    self.model = keras.models.load_model(self.route)
+        return self.model
+
+    def evaluate(self, inputs):
+        return self.evaluate_policy(inputs)[0]
+
+    def evaluate_policy(self, inputs): # (valores (N,), probabilidades (N, 64) o None si el modelo no tiene cabeza de política)
+        import tensorflow as tf
+        input_tensor = tf.convert_to_tensor(inputs, dtype=tf.float32)
+        output = self.load()(input_tensor, training = False)
+        if isinstance(output, dict):  # Modelo dual
+            return output["value"].numpy()[:, 0], output["policy"].numpy()
+        return output.numpy()[:, 0], None
+
+class NumpyEvaluator: # Evalúa la red de create_model en NumPy puro a partir de los pesos exportados con export_weights
+    # Los pesos pueden estar guardados en float16 o en int8 con una escala por canal de salida (nombre_scale); al cargarlos se pasan a float32
+    def __init__(self, route=NUMPY_ROUTE):
+        self.route = route
+        self.weights = None
+
+    def load(self):
+        if self.weights is None:
+            with load_lock:
+                if self.weights is None:
+                    with np.load(self.route) as data:
+                        self.weights = {name: dequantize(data, name) for name in WEIGHT_NAMES + POLICY_WEIGHT_NAMES if name in data}
+        return self.weights
+
+    def evaluate(self, inputs):
+        return self.evaluate_policy(inputs)[0]
+
+    def evaluate_policy(self, inputs): # Igual que KerasEvaluator.evaluate_policy
+        w = self.load()
+        x = np.asarray(inputs, dtype=np.float32)
+        x = relu(conv2d_same(x, w["conv1_kernel"], w["conv1_bias"]))
+        trunk = relu(conv2d_same(x, w["conv2_kernel"], w["conv2_bias"]))
+        x = trunk.reshape(len(trunk), -1)  # Flatten de Keras: orden (fila, columna, canal)
+        x = relu(x @ w["dense1_kernel"] + w["dense1_bias"])
+        x = relu(x @ w["dense2_kernel"] + w["dense2_bias"])
+        values = np.tanh(x @ w["dense3_kernel"] + w["dense3_bias"])[:, 0]
+        if "policy_kernel" not in w:
+            return values, None
+        policy = relu(trunk @ w["policy_conv_kernel"][0, 0] + w["policy_conv_bias"])  # Convolución 1x1: una multiplicación de matrices por casilla
+        logits = policy.reshape(len(policy), -1) @ w["policy_kernel"] + w["policy_bias"]
+        logits -= logits.max(axis=1, keepdims=True)  # Softmax estable
+        probabilities = np.exp(logits)
+        return values, probabilities / probabilities.sum(axis=1, keepdims=True)
+
+def dequantize(data, name): # Peso name del fichero .npz en float32
+    weight = data[name].astype(np.float32)
+    if f"{name}_scale" in data:
+        weight *= data[f"{name}_scale"]
+    return weight
+
+def relu(x):
+    return np.maximum(x, 0)
+
+def conv2d_same(x, kernel, bias): # Convolución 2D con padding 'same' y stride 1, como Conv2D de Keras. x: (N, H, W, C), kernel: (kh, kw, C, F)
+    kh, kw = kernel.shape[:2]
+    height, width = x.shape[1:3]
+    padded = np.pad(x, ((0, 0), (kh // 2, kh // 2), (kw // 2, kw // 2), (0, 0)))
+    out = np.zeros(x.shape[:3] + (kernel.shape[3],), dtype=np.float32)
+    for dy in range(kh):  # Una multiplicación de matrices por cada posición del filtro
+        for dx in range(kw):
+            out += padded[:, dy:dy + height, dx:dx + width, :] @ kernel[dy, dx]
+    return out + bias
+
+def export_weights(model_route=MODEL_ROUTE, numpy_route=NUMPY_ROUTE): # Exporta los pesos del modelo de Keras al fichero .npz que usa NumpyEvaluator
+    return save_weights(KerasEvaluator(model_route).load(), numpy_route)
+
+def save_weights(model, numpy_route=NUMPY_ROUTE): # Guarda los pesos de un modelo de Keras ya cargado en el formato de NumpyEvaluator
+    if "policy" in [layer.name for layer in model.layers]:  # Modelo dual: los pesos se toman por capa, ya que get_weights sigue el orden del grafo
+        weights = [weight for name in DUAL_LAYERS for weight in model.get_layer(name).get_weights()]
+        np.savez(numpy_route, **dict(zip(WEIGHT_NAMES + POLICY_WEIGHT_NAMES, weights)))
+    else:
+        np.savez(numpy_route, **dict(zip(WEIGHT_NAMES, model.get_weights())))
+    return numpy_route
+
+def create_evaluator(backend="keras", route=None): # backend: uno de BACKENDS
+    if backend == "keras":
+        return KerasEvaluator(route or MODEL_ROUTE)
+    if backend == "numpy":
+        return NumpyEvaluator(route or NUMPY_ROUTE)
+    if backend == "patterns":
+        from agent import patterns
+        return patterns.PatternEvaluator(route or patterns.PATTERNS_ROUTE)
+    if backend == "student":
+        return NumpyEvaluator(route or STUDENT_ROUTE)
+    raise ValueError(f"Motor de inferencia desconocido: {backend}")
+
+_evaluator = None  # Evaluador usado por mcts_uct, se crea al pedirlo por primera vez
+
+def get_evaluator():
+    global _evaluator
+    if _evaluator is None:
+        with load_lock:
+            if _evaluator is None:
+                _evaluator = KerasEvaluator()
+    return _evaluator
+
+def set_evaluator(evaluator):
+    global _evaluator
+    _evaluator = evaluator
+
+def use_backend(backend="keras", route=None): # Atajo para seleccionar el evaluador, útil como initializer de un Pool de procesos
+    set_evaluator(create_evaluator(backend, route))
+
+if __name__ == "__main__":
+    # Exporta el modelo actual a .npz y comprueba que ambos motores dan el mismo resultado
+    export_weights()
+    print(f"Pesos exportados a {NUMPY_ROUTE}")
+
+    rng = np.random.default_rng(0)
+    cells = rng.integers(0, 3, size=(256, 8, 8))
+    inputs = np.stack([(cells == 1), (cells == 2), (cells == 0), np.broadcast_to(rng.integers(0, 2, size=(256, 1, 1)), cells.shape)], axis=-1).astype(np.float32)
+    difference = np.abs(KerasEvaluator().evaluate(inputs) - NumpyEvaluator().evaluate(inputs)).max()
+    print(f"Diferencia máxima entre Keras y NumPy: {difference:.2e}")
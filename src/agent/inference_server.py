@@ -0,0 +1,127 @@
+import queue
+import time
+import multiprocessing as mp
+from multiprocessing import util
+from array import array
+from collections import Counter
+import numpy as np
+from agent import evaluator
+
+# Servidor de inferencia compartido: un único proceso carga el modelo y atiende las peticiones de todos los procesos de simulación.
+# Las peticiones que llegan dentro de una ventana de max_latency segundos se agrupan en un solo batch (hasta max_batch posiciones),
+# de modo que la red recibe lotes grandes aunque cada búsqueda evalúe las hojas de una en una
+
+SPARE_SLOTS = 2  # Colas de respuestas de más: un proceso que muere sin terminar limpiamente no devuelve la suya
+SLOT_TIMEOUT = 60  # Segundos que espera un proceso nuevo a que quede libre una cola de respuestas
+
+class RemoteEvaluator: # Evaluador para los procesos de simulación: envía las entradas al servidor y espera la respuesta
+    def __init__(self, requests, responses, worker):
+        self.requests = requests
+        self.responses = responses
+        self.worker = worker
+
+    def evaluate(self, inputs):
+        return self.evaluate_policy(inputs)[0]
+
+    def evaluate_policy(self, inputs): # (valores, política o None), como los evaluadores de agent.evaluator. La política la calcula el servidor si su modelo es dual
+        self.requests.put((self.worker, time.monotonic(), np.asarray(inputs, dtype=np.float32)))
+        return self.responses.get()
+
+def connect_worker(requests, responses, free_slots): # Initializer del Pool: toma una cola de respuestas libre para este proceso
+    # El hueco se devuelve al terminar el proceso, así que un Pool que sustituye procesos (maxtasksperchild) no se queda sin colas
+    try:
+        worker = free_slots.get(timeout=SLOT_TIMEOUT)
+    except queue.Empty:
+        raise RuntimeError("No queda ninguna cola de respuestas libre en el servidor de inferencia") from None
+    util.Finalize(None, free_slots.put, args=(worker,), exitpriority=10)
+    evaluator.set_evaluator(RemoteEvaluator(requests, responses[worker], worker))
+
+def serve(requests, responses, results, backend, route, max_batch, max_latency): # Bucle principal del proceso servidor
+    model = evaluator.create_evaluator(backend, route)
+    batch_sizes = Counter()  # Histograma: tamaño de batch -> número de llamadas a la red
+    latencies = array('d')  # Tiempo que espera cada petición en la cola hasta que entra en un batch
+    running = True
+    while running:
+        item = requests.get()
+        if item is None:
+            break
+        batch = [item]
+        rows = len(item[2])
+        deadline = time.monotonic() + max_latency
+        while rows < max_batch:  # Sigue recogiendo peticiones hasta llenar el batch o agotar la ventana de espera
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                running = False
+                break
+            batch.append(item)
+            rows += len(item[2])
+
+        start = time.monotonic()
+        batch_inputs = np.concatenate([inputs for _, _, inputs in batch])
+        if hasattr(model, "evaluate_policy"):
+            values, policy = model.evaluate_policy(batch_inputs)  # La política sale en la misma llamada si el modelo es dual
+        else:
+            values, policy = model.evaluate(batch_inputs), None
+        offset = 0
+        for worker, sent, inputs in batch:  # Devuelve a cada proceso su parte del resultado
+            responses[worker].put((values[offset:offset + len(inputs)], None if policy is None else policy[offset:offset + len(inputs)]))
+            offset += len(inputs)
+            latencies.append(start - sent)
+        batch_sizes[rows] += 1
+
+    results.put(summarize(batch_sizes, latencies))
+
+def summarize(batch_sizes, latencies): # Estadísticas del servidor para ajustar max_batch y max_latency al número de núcleos
+    calls = sum(batch_sizes.values())
+    positions = sum(size * count for size, count in batch_sizes.items())
+    latencies = np.array(latencies) * 1000
+    return {
+        "calls": calls,
+        "positions": positions,
+        "mean_batch": positions / calls if calls else 0.0,
+        "batch_sizes": dict(sorted(batch_sizes.items())),
+        "latency_ms": {
+            "mean": float(latencies.mean()) if len(latencies) else 0.0,
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "max": float(latencies.max()) if len(latencies) else 0.0,
+        },
+    }
+
+def format_stats(stats): # Texto para mostrar las estadísticas por consola
+    lines = [f"Llamadas a la red: {stats['calls']}, posiciones evaluadas: {stats['positions']}, batch medio: {stats['mean_batch']:.1f}"]
+    latency = stats["latency_ms"]
+    lines.append(f"Espera en cola (ms): media {latency['mean']:.2f}, p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, máx {latency['max']:.2f}")
+    lines.append("Histograma de tamaños de batch:")
+    for size, count in stats["batch_sizes"].items():
+        lines.append(f"  {size:4d}: {count}")
+    return "\n".join(lines)
+
+class InferenceServer:
+    def __init__(self, workers, backend="keras", route=None, max_batch=256, max_latency=0.002, spare_slots=SPARE_SLOTS):
+        self.requests = mp.Queue()
+        self.responses = [mp.Queue() for _ in range(workers + spare_slots)]  # Una cola de respuestas por proceso de simulación
+        self.results = mp.Queue()
+        self.free_slots = mp.Queue()  # Colas de respuestas sin proceso asignado
+        for slot in range(len(self.responses)):
+            self.free_slots.put(slot)
+        self.process = mp.Process(target=serve, args=(self.requests, self.responses, self.results, backend, route, max_batch, max_latency), daemon=True)
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def worker_args(self): # initargs para connect_worker
+        return self.requests, self.responses, self.free_slots
+
+    def stop(self): # Detiene el servidor y devuelve sus estadísticas
+        self.requests.put(None)
+        stats = self.results.get()
+        self.process.join()
+        return stats
@@ -1,55 +1,95 @@
 import math
 import random
+import time
 import numpy as np
-import keras
-import os
-import tensorflow as tf
-from game import othello
-from agent.model import model as mod
+from game import bitboard, zobrist
+from agent import evaluator, rollouts as vectorized
+from agent.profiling import Profiler, phase
+from agent.model import encoding as mod
 
 c = 1 / math.sqrt(2)  # Constante de exploración para UCT (balance entre exploración y explotación)
-
-# Cargo el modelo (Red Neuronal)
-base_route = os.path.dirname(os.path.abspath(__file__))
-model_route = os.path.join(base_route, "model/othello_model.keras")
-model = keras.models.load_model(model_route)
+VIRTUAL_LOSS = 1  # Derrotas ficticias que se suman a cada nodo de un camino pendiente de evaluar en el modo por lotes
+CHECK_EVERY = 16  # Con límite de tiempo o parada anticipada, iteraciones entre cada comprobación
+C_PUCT = 1.5  # Peso de los priors de la red frente a la recompensa media en la selección PUCT
+FPU_REDUCTION = 0.2  # Con PUCT, un movimiento sin explorar se valora como la media de sus hermanos menos esto
+VECTORIZED_LANES = 8  # Simulaciones aleatorias por llamada a partir de las que compensa agent.rollouts frente a default_policy_old
+TRAINING_NOISE = 1.0  # Con red y training: desviación del ruido gaussiano sumado a la recompensa media de cada hijo al elegir la jugada, para variar las partidas de autojuego
+TIE_NOISE = 0.01  # Sin red: ruido mínimo al elegir la jugada, que deshace los empates entre hijos con la misma recompensa media
+TREES = ["nodes", "array"]  # Almacenamiento del árbol: objetos MCTSNode, o los arrays de agent.array_tree
 
 class MCTSNode:
-    def __init__(self, state, player, parent=None, action=None):
-        self.state = state  # Estado del tablero en el nodo
+    def __init__(self, state, player, parent=None, action=None, key=None):
+        self.state = state  # Estado del tablero en el nodo, como posición de bitboards (blancas, negras)
         self.player = player  # Jugador que moverá desde este estado
         self.parent = parent
         self.action = action  # La acción que llevó a este nodo desde el padre. Es un vector, representando la casilla a la que se mueve
         self.children = []
+        self.moves = [] # Acción que lleva a cada hijo desde este nodo. Con tabla de transposiciones un hijo compartido puede tener otro action
+        self.key = key # Hash Zobrist del estado y el jugador, sólo se calcula si se usa tabla de transposiciones
         self.visits = 0
-        self.total_reward = 0 # Suma de 0s, 1s y -1s, según gane o pierda jugador en los distintos nodos
+        self.total_reward = 0 # Suma de recompensas (entre -1 y 1) para el jugador que movió para llegar a este nodo
         self.not_explored = None # Posibles movimientos aún no explorados
 
+        # El estado de un nodo no cambia, así que los movimientos legales, el fin de partida y el recuento de fichas se calculan una sola vez al crearlo
+        own, opp = bitboard.split(state, player)
+        self.move_mask = bitboard.move_mask(own, opp) # Casillas a las que puede mover el jugador activo
+        self.opponent_move_mask = bitboard.move_mask(opp, own) # Casillas a las que podría mover el rival
+        self.legal_moves = [divmod(square, 8) for square in bitboard.squares(self.move_mask)]
+        self.terminal = (own | opp) == bitboard.FULL or (self.move_mask == 0 and self.opponent_move_mask == 0)
+        self.discs = bitboard.count_discs(state) # (blancas, negras)
+        self.proven = None # Con solver de finales: resultado exacto para el jugador raíz (1, 0 o -1) si el nodo está resuelto
+        self.priors = None # Con PUCT: probabilidad de cada movimiento legal según la cabeza de política, {movimiento: p}. Se fija al evaluar el nodo
+
     def is_terminal(self):   # Nodo terminal: El juego ha terminado en este estado
-        return othello.is_game_finished(self.state)
+        return self.terminal
+
+    def add_child(self, action, state, player, table=None): # Crea el hijo alcanzado con action, o reutiliza el nodo de la tabla si la posición ya estaba en el árbol
+        child = None
+        key = None
+        if table is not None:
+            key = zobrist.update(self.key, self.state, state)
+            child = table.get(key)
+        if child is None:
+            child = MCTSNode(state, player, parent=self, action=action, key=key)
+            if table is not None:
+                table.put(key, child)
+        self.children.append(child)
+        self.moves.append(action)
+        return child
+
+    def set_priors(self, probabilities): # probabilities: (64,) de la cabeza de política, o None para priors uniformes. Se normalizan sobre los movimientos legales
+        weights = [float(probabilities[x * 8 + y]) if probabilities is not None else 1.0 for x, y in self.legal_moves]
+        total = sum(weights)
+        self.priors = {move: weight / total if total > 0 else 1 / len(weights) for move, weight in zip(self.legal_moves, weights)}
+        if self.not_explored is not None:
+            self.not_explored.sort(key=lambda move: self.priors[move])  # Ya se había empezado a expandir antes de tener los priors
 
-    def expand(self):
+    def ordered_moves(self): # Movimientos válidos por explorar. Con priors, ordenados para que pop saque primero el más probable
+        moves = list(self.legal_moves)
+        if self.priors is not None:
+            moves.sort(key=lambda move: self.priors[move])
+        return moves
+
+    def expand(self, table=None):
         if self.not_explored is None:
             # Inicializa la lista de movimientos válidos para explorar
-            self.not_explored = othello.valid_movements(self.state, self.player)
-            random.shuffle(self.not_explored)  # Aleatoriza para diversidad en la expansión
+            self.not_explored = self.ordered_moves()
+            if self.priors is None:
+                random.shuffle(self.not_explored)  # Aleatoriza para diversidad en la expansión
         
         # Saco un movimiento(acción) para expandir y creo el nodo hijo correspondiente
         action = self.not_explored.pop() # No da error ya que si ya no quedan movimientos por explorar, no se llama a expand
-        next_state = np.copy(self.state)
-        othello.apply_movement(next_state, action[0], action[1], self.player)
+        next_state = bitboard.apply_movement(self.state, action[0], action[1], self.player) # Los bitboards son inmutables, no hace falta copiar el tablero
         next_player = 3 - self.player  # Cambio el turno al siguiente jugador
-        child = MCTSNode(next_state, next_player, parent=self, action=action)
-        self.children.append(child)
-        return child
+        return self.add_child(action, next_state, next_player, table)
 
     def is_totally_expanded(self): # Compruebo si todos los movimientos posibles ya fueron explorados
         if self.not_explored is None:
             # Inicializa la lista de movimientos válidos si no está inicializada
-            self.not_explored = othello.valid_movements(self.state, self.player)
+            self.not_explored = self.ordered_moves() # Copia, ya que expand va sacando movimientos de la lista
         return len(self.not_explored) == 0
 
-    def best_child(self, c, noise_std=0.01, training=False):
+    def best_child(self, c, noise_std=0.01):
 
         def ucb1(n): # n objeto de tipo MCTSNode
             if n.visits == 0:
@@ -61,80 +101,512 @@ class MCTSNode:
 
         return max(self.children, key=ucb1)  # Devuelve el hijo que maximiza la ecuacion ucb
 
-    def backup(self, reward): # Algoritmo de retropropagación
+    def puct_child(self, noise_std=0.01): # Selección PUCT: el hijo que maximiza Q + C_PUCT * P * sqrt(N) / (1 + n), o None si puntúa más expandir el movimiento sin explorar más probable
+        visited = sum(child.visits for child in self.children)
+        first_play = (sum(child.total_reward for child in self.children) / visited if visited else 0.0) - FPU_REDUCTION  # Valor supuesto de lo no visitado
+        exploration = C_PUCT * math.sqrt(max(self.visits, 1))
+        best, best_score = None, -math.inf
+        if self.not_explored:
+            best_score = first_play + exploration * self.priors[self.not_explored[-1]]  # El más probable de los que quedan, que es el que sacaría expand
+        for move, child in zip(self.moves, self.children):
+            value = child.total_reward / child.visits if child.visits else first_play
+            score = value + exploration * self.priors.get(move, 0.0) / (1 + child.visits) + random.gauss(0, noise_std)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def backup(self, reward): # Algoritmo de retropropagación. reward es la recompensa para el jugador de la raíz
+        path = []
         node = self
-        current_reward = reward
         while node is not None:
-            node.visits += 1
-            node.total_reward += current_reward # Acumulo recompensas
-            current_reward = -current_reward # Cambio de perspectiva de jugador para reflejar la recompensa en el adversario
+            path.append(node)
             node = node.parent
+        root_player = path[-1].player
+        for node in path:
+            # Cada nodo acumula la recompensa del jugador que movió para llegar a él, que es quien lo elige en best_child.
+            # Se decide por jugador y no alternando por nivel, ya que la hoja puede estar a cualquier profundidad y los pases repiten jugador
+            mover = node.parent.player if node.parent is not None else 3 - root_player
+            node.visits += 1
+            node.total_reward += reward if mover == root_player else -reward # Acumulo recompensas
 
-def tree_policy(node, c):
-    while not node.is_terminal():
-        movs = othello.valid_movements(node.state, node.player)
-        if not movs:  # No hay movimientos, pasar turno
+def tree_policy(node, c, table=None, path=None, profiler=None): # Si se pasa path, se le añaden los nodos recorridos (necesario con tabla, ya que un nodo puede tener varios padres)
+    while not node.terminal and node.proven is None: # Un nodo resuelto no se explora más, su valor ya es exacto
+        if not node.legal_moves:  # No hay movimientos, pasar turno
             # Buscar si ya hay hijo que representa pase de turno (action == None)
-            pass_turn_child = next((child for child in node.children if child.action is None), None) # Devuelve primer elemento que cumple la condicion de que la accion sea nula
+            pass_turn_child = next((child for child, move in zip(node.children, node.moves) if move is None), None) # Devuelve primer elemento que cumple la condicion de que la accion sea nula
             if pass_turn_child is not None:
                 node = pass_turn_child # Paso directamente este nodo para no crear varios nodos exactamente iguales
+                if path is not None:
+                    path.append(node)
                 continue
             else:
-                child = MCTSNode(np.copy(node.state), 3 - node.player, parent=node, action=None)
-                node.children.append(child)
+                with phase(profiler, "expand"):
+                    child = node.add_child(None, node.state, 3 - node.player, table)
+                if path is not None:
+                    path.append(child)
                 return child
 
-        if not node.is_totally_expanded():
-            child = node.expand()
+        best = None
+        if node.priors is not None:  # PUCT: los priors deciden entre expandir el siguiente movimiento o bajar por un hijo ya creado
+            node.is_totally_expanded()  # Inicializa los movimientos por explorar, ya ordenados por los priors
+            best = node.puct_child()
+        if best is None and not node.is_totally_expanded():
+            with phase(profiler, "expand"):
+                child = node.expand(table)
+            if path is not None:
+                path.append(child)
             return child
         else:
-            best = node.best_child(c)
+            best = best or node.best_child(c)
             node = best
+            if path is not None:
+                path.append(node)
     return node
 
-def default_policy(state, player): # Siempre recibe el root player, que es para el que hay que calcular la recompensa
-    input = mod.convert_board_state(state, player) # Convierte el estado del tablero al formato que espera la red neuronal, desde la perspectiva del jugador raiz
+def default_policy(state, player, cache=None): # Siempre recibe el root player, que es para el que hay que calcular la recompensa # cache: EvaluationCache opcional
+    if cache is not None:
+        return default_policy_batch([state], player, cache)[0]
+    input = mod.convert_board_state(bitboard.to_array(state), player) # Convierte el estado del tablero al formato que espera la red neuronal, desde la perspectiva del jugador raiz
     input = np.expand_dims(input, axis=0)  # Añade una dimensión extra para simular un batch de tamaño 1 (necesario para la red neuronal)
-    input_tensor = tf.convert_to_tensor(input, dtype=tf.float32)
-    prediction = model(input_tensor, training = False)[0][0].numpy()  # Obtengo la predicción a partir del tensor, y convierto a un valor de numpy
+    prediction = evaluator.get_evaluator().evaluate(input)[0]  # El evaluador (Keras por defecto) carga el modelo la primera vez que se usa
     return prediction
 
 
+def default_policy_batch(states, player, cache=None): # Igual que default_policy pero evaluando varios estados con una sola llamada a la red
+    if cache is not None:
+        return cache.evaluate(states, player, default_policy_batch)  # La red sólo evalúa los estados que no están en la caché
+    inputs = np.stack([mod.convert_board_state(bitboard.to_array(state), player) for state in states]) # Batch de tamaño len(states)
+    return evaluator.get_evaluator().evaluate(inputs) # Una predicción por estado, en el mismo orden
+
+def policy_value_batch(nodes, root_player): # Con el modelo dual: recompensa para root_player de cada nodo y sus priors (que se guardan en el nodo), con una sola llamada a la red
+    # A diferencia de default_policy, la entrada es desde el jugador que mueve en cada nodo, como en el entrenamiento, ya que la política es suya
+    inputs = np.stack([mod.convert_board_state(bitboard.to_array(node.state), node.player) for node in nodes])
+    model = evaluator.get_evaluator()
+    if hasattr(model, "evaluate_policy"):
+        values, policy = model.evaluate_policy(inputs)
+    else:
+        values, policy = model.evaluate(inputs), None  # Evaluadores sin evaluate_policy: sólo valor, con priors uniformes
+    rewards = []
+    for i, node in enumerate(nodes):
+        if node.legal_moves:
+            node.set_priors(None if policy is None else policy[i])
+        rewards.append(values[i] if node.player == root_player else -values[i])
+    return rewards
+
 def default_policy_old(state, root_player, node_player): # Default policy antigua, pillando movimientos random. Se le pasa como parámetros root_player, el jugador para el que se estima la reward, y node_player, el jugador activo
-    board = np.copy(state)
+    own, opp = bitboard.split(state, node_player)
     actual_player = node_player
     skipped_turns = 0
 
-    # Simulación con acciones aleatorias hasta terminar la partida
-    while not othello.is_board_full(board) and skipped_turns < 2:
-        movs = othello.valid_movements(board, actual_player)
+    # Simulación con acciones aleatorias hasta terminar la partida. Se trabaja con (fichas del jugador activo, fichas del rival) y se intercambian en cada turno
+    while (own | opp) != bitboard.FULL and skipped_turns < 2:
+        movs = bitboard.squares(bitboard.move_mask(own, opp))
         if not movs:
             skipped_turns += 1
+            own, opp = opp, own
             actual_player = 3 - actual_player
             continue
         skipped_turns = 0
-        mov = random.choice(movs)
-        othello.apply_movement(board, mov[0], mov[1], actual_player)
+        square = random.choice(movs)
+        flipped = bitboard.flip_mask(own, opp, square)
+        own, opp = opp & ~flipped, own | flipped | (1 << square)
         actual_player =  3 - actual_player
 
-    winner = othello.get_winner(board)
+    winner = bitboard.get_winner(bitboard.join(own, opp, actual_player))
     if winner == 0:
         return 0  # Empate
     return 1 if root_player == winner else -1  # +1 si gana el jugador original, -1 si pierde
 
-def mcts_uct(state, player, iterations=1000, neural=True, training=False):  # Algoritmo principal MCTS con UCT # iterations: número de simulaciones para mejorar la decisión
-    # Asumimos que va a haber movimientos válidos en la raiz, ya que si no no se llama a la función en un primer lugar
-    root = MCTSNode(np.copy(state), player)
+def default_policy_rollouts(states, players, root_player, rollouts=1): # Recompensa media de rollouts simulaciones aleatorias desde cada estado (players: jugador activo de cada uno)
+    # Todas las simulaciones de todos los estados avanzan a la vez con agent.rollouts. Con muy pocas, el coste fijo por jugada
+    # del motor vectorizado no compensa y se juegan una a una con default_policy_old
+    if len(states) * rollouts < VECTORIZED_LANES:
+        return [sum(default_policy_old(state, root_player, player) for _ in range(rollouts)) / rollouts for state, player in zip(states, players)]
+    rewards = vectorized.playouts([state for state in states for _ in range(rollouts)], [player for player in players for _ in range(rollouts)], root_player)
+    return rewards.reshape(len(states), rollouts).mean(axis=1).tolist()
 
-    for _ in range(iterations):
-        node = tree_policy(root, c)  # Selección y expansión del nodo
-        if(neural):
-            reward = default_policy(node.state, root.player)  # Simulación con red neuronal como default policy
+def solved_reward(node, root_player, solver): # Recompensa exacta de la hoja para root_player si está resuelta o el solver de finales puede resolverla. Si no, None
+    if solver is None:
+        return None
+    if node.proven is None:
+        if node.terminal:
+            winner = bitboard.get_winner(node.state)
+            node.proven = 0 if winner == 0 else 1 if winner == root_player else -1
+        elif solver.can_solve(node.state):
+            outcome = solver.outcome(node.state, node.player)  # Resultado para el jugador que mueve en el nodo
+            node.proven = outcome if node.player == root_player else -outcome
         else:
-            reward = default_policy_old(node.state, root.player, node.player)  # Simulación con default policy propia de mcts uct
-        node.backup(reward)  # Retropropagación
-    if (neural):
-        best_node = root.best_child(0, training) # Selecciona el hijo con mejor recompensa media (c=0, solo explotación). Alternativa: Devolver hijo con más visitas.
+            return None
+        prove_ancestors(node.parent, root_player)
+    return node.proven
+
+def prove_ancestors(node, root_player): # Propaga los resultados exactos hacia la raíz (estilo MCTS-solver), mientras se puedan demostrar
+    while node is not None and node.proven is None:
+        values = [child.proven for child in node.children]
+        best = 1 if node.player == root_player else -1  # El jugador raíz busca 1 y el rival -1
+        if best in values:
+            node.proven = best  # Hay un movimiento que fuerza el mejor resultado posible
+        elif node.children and node.is_totally_expanded() and None not in values:
+            node.proven = max(values) if best == 1 else min(values)  # Todos los movimientos están resueltos
+        else:
+            return
+        node = node.parent
+
+def evaluate_leaves(leaves, root_player, neural, *, solver=None, profiler=None, rollouts=1, puct=False, cache=None): # Recompensas de varias hojas: exactas si están resueltas, y el resto con una sola llamada a la red (o a las simulaciones)
+    rewards = [None] * len(leaves)
+    if solver is not None:
+        with phase(profiler, "solver"):
+            rewards = [solved_reward(leaf, root_player, solver) for leaf in leaves]
+    pending = [i for i, reward in enumerate(rewards) if reward is None]
+    if not pending:
+        return rewards
+    with phase(profiler, "evaluation"):
+        if(neural and puct):
+            values = policy_value_batch([leaves[i] for i in pending], root_player)  # Valor y priors de toda la ronda con una llamada
+        elif(neural):
+            values = default_policy_batch([leaves[i].state for i in pending], root_player, cache)  # Una sola llamada a la red para toda la ronda
+        else:
+            values = default_policy_rollouts([leaves[i].state for i in pending], [leaves[i].player for i in pending], root_player, rollouts)  # Todas las simulaciones de la ronda a la vez
+    for i, value in zip(pending, values):
+        rewards[i] = value
+    return rewards
+
+def virtual_loss(node, amount): # Suma amount visitas perdidas a todo el camino hasta la raíz, para que tree_policy elija otro camino. Con -amount se deshace
+    while node is not None:
+        node.visits += amount
+        node.total_reward -= amount
+        node = node.parent
+
+def search_batched(root, iterations, neural, batch_size, *, solver=None, profiler=None, rollouts=1, puct=False, cache=None): # Iteraciones de MCTS en rondas de batch_size hojas evaluadas a la vez
+    done = 0
+    while done < iterations:
+        leaves = []
+        with phase(profiler, "selection"):
+            for _ in range(min(batch_size, iterations - done)):
+                node = tree_policy(root, c, profiler=profiler)  # Selección y expansión del nodo
+                virtual_loss(node, VIRTUAL_LOSS)  # Penaliza el camino para que la siguiente selección de la ronda sea distinta
+                leaves.append(node)
+            for node in leaves:
+                virtual_loss(node, -VIRTUAL_LOSS)  # Quita la pérdida virtual antes de la retropropagación real
+
+        rewards = evaluate_leaves(leaves, root.player, neural, solver=solver, profiler=profiler, rollouts=rollouts, puct=puct, cache=cache)
+        with phase(profiler, "backup"):
+            for node, reward in zip(leaves, rewards):
+                node.backup(reward)  # Retropropagación
+        done += len(leaves)
+
+def backup_path(path, reward): # Igual que MCTSNode.backup pero siguiendo el camino recorrido en lugar de los padres (el árbol es un DAG)
+    root_player = path[0].player
+    mover = 3 - root_player
+    for node in path:
+        node.visits += 1
+        node.total_reward += reward if mover == root_player else -reward
+        mover = node.player
+
+def search_transpositions(root, iterations, neural, batch_size, table, *, solver=None, profiler=None, rollouts=1, puct=False, cache=None): # Iteraciones de MCTS con las posiciones transpuestas compartidas a través de la tabla
+    done = 0
+    while done < iterations:
+        paths = []
+        pending = set() # Nodos nuevos de esta ronda, que hay que evaluar aunque ya tengan visitas virtuales
+        with phase(profiler, "selection"):
+            for _ in range(min(batch_size, iterations - done)):
+                path = [root]
+                leaf = tree_policy(root, c, table, path, profiler)  # Selección y expansión, guardando el camino
+                if leaf.visits == 0:
+                    pending.add(leaf)
+                for node in path:  # Pérdida virtual sobre el camino, para que la siguiente selección de la ronda sea distinta
+                    node.visits += VIRTUAL_LOSS
+                    node.total_reward -= VIRTUAL_LOSS
+                paths.append(path)
+            for path in paths:
+                for node in path:
+                    node.visits -= VIRTUAL_LOSS
+                    node.total_reward += VIRTUAL_LOSS
+
+        # Sólo se evalúan las hojas nuevas. Si la hoja ya tenía estadísticas (transposición o nodo terminal), se usa su recompensa media
+        leaves = [path[-1] for path in paths]
+        new_leaves = [leaf for leaf in leaves if leaf in pending]
+        values = dict(zip(new_leaves, evaluate_leaves(new_leaves, root.player, neural, solver=solver, profiler=profiler, rollouts=rollouts, puct=puct, cache=cache)))
+        with phase(profiler, "backup"):
+            for path, leaf in zip(paths, leaves):
+                if leaf in pending:
+                    reward = values[leaf]
+                elif leaf.proven is not None:
+                    reward = leaf.proven
+                else:
+                    reward = leaf.total_reward / leaf.visits  # Media para el jugador que movió a la hoja, se pasa a la perspectiva de la raíz
+                    if len(path) > 1 and path[-2].player != root.player:
+                        reward = -reward
+                    table.evaluations_saved += 1
+                backup_path(path, reward)  # Retropropagación
+        done += len(paths)
+
+def run_iterations(root, iterations, neural, *, batch_size=1, table=None, solver=None, profiler=None, rollouts=1, puct=False, cache=None): # Ejecuta iterations iteraciones de MCTS sobre el árbol que cuelga de root
+    # rollouts: simulaciones aleatorias por hoja sin red neuronal, cuya recompensa media se retropropaga
+    # puct: evalúa con el modelo dual (policy_value_batch), y los priors de los nodos evaluados activan la selección PUCT en tree_policy
+    if table is not None:
+        search_transpositions(root, iterations, neural, batch_size, table, solver=solver, profiler=profiler, rollouts=rollouts, puct=puct, cache=cache)
+    elif batch_size > 1:
+        search_batched(root, iterations, neural, batch_size, solver=solver, profiler=profiler, rollouts=rollouts, puct=puct, cache=cache)
+    else:
+        for _ in range(iterations):
+            with phase(profiler, "selection"):
+                node = tree_policy(root, c, profiler=profiler)  # Selección y expansión del nodo
+            reward = None
+            if solver is not None:
+                with phase(profiler, "solver"):
+                    reward = solved_reward(node, root.player, solver)  # Valor exacto con el solver de finales, si procede
+            if reward is None:
+                with phase(profiler, "evaluation"):
+                    if(neural and puct):
+                        reward = policy_value_batch([node], root.player)[0]  # Valor de la red y priors para los hijos del nodo
+                    elif(neural):
+                        reward = default_policy(node.state, root.player, cache)  # Simulación con red neuronal como default policy
+                    else:
+                        reward = default_policy_rollouts([node.state], [node.player], root.player, rollouts)[0]  # Simulaciones con default policy propia de mcts uct
+            with phase(profiler, "backup"):
+                node.backup(reward)  # Retropropagación
+
+def can_stop_early(root, remaining): # True si el hijo más visitado de la raíz ya no puede ser superado en visitas con las iteraciones restantes
+    # Sólo garantiza que no cambia la jugada si se elige por visitas, así que con early_stop choose_action elige con by_visits
+    if len(root.legal_moves) <= 1:
+        return True  # Movimiento forzado, no hay nada que decidir
+    visits = sorted((child.visits for child in root.children), reverse=True) + [0, 0]  # Los movimientos sin explorar cuentan con 0 visitas
+    return visits[0] - visits[1] > remaining
+
+def tree_stats(root): # Tamaño del árbol y profundidad máxima alcanzada, recorriendo cada nodo una vez (con tabla el árbol es un DAG)
+    seen = {id(root)}
+    level = [root]
+    depth = 0
+    while level:
+        next_level = []
+        for node in level:
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    next_level.append(child)
+        if next_level:
+            depth += 1
+        level = next_level
+    return len(seen), depth
+
+def tree_shape(root): # Profundidad media de los nodos y factor de ramificación medio (hijos por nodo expandido), recorriendo cada nodo una vez
+    seen = {id(root)}
+    level = [root]
+    depth = total_depth = expanded = branches = 0
+    while level:
+        next_level = []
+        for node in level:
+            total_depth += depth
+            if node.children:
+                expanded += 1
+                branches += len(node.children)
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    next_level.append(child)
+        depth += 1
+        level = next_level
+    return {"mean_depth": total_depth / len(seen), "branching_factor": branches / expanded if expanded else 0.0}
+
+def search(root, iterations=1000, neural=True, *, batch_size=1, table=None, time_limit=None, early_stop=False, solver=None, profile=False, rollouts=1, puct=False, cache=None): # Búsqueda con presupuesto. Devuelve sus estadísticas
+    # Para cuando se agotan las iterations o los time_limit milisegundos, lo que ocurra antes (cualquiera de los dos puede ser None).
+    # Con early_stop también para en cuanto el hijo más visitado de la raíz no pueda ser superado (la jugada se elige entonces por visitas). Con solver (EndgameSolver), para si la raíz queda resuelta
+    # Con profile, las estadísticas incluyen el tiempo por fase (agent.profiling), la forma del árbol y las visitas de los hijos de la raíz
+    # Con cache (EvaluationCache), incluyen los aciertos, fallos y segundos de red ahorrados durante esta búsqueda, y con table las consultas,
+    # aciertos y evaluaciones ahorradas de la tabla de transposiciones
+    if iterations is None and time_limit is None:
+        raise ValueError("Hace falta un límite de iteraciones o de tiempo")
+    budget = math.inf if iterations is None else iterations
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit / 1000
+    if root.proven is not None and not root.children:
+        root.proven = None  # Resuelta como hoja en una búsqueda anterior: se vuelve a expandir para saber qué jugada lleva al resultado
+    if puct and neural and root.priors is None and root.legal_moves:
+        policy_value_batch([root], root.player)  # La raíz necesita priors antes de la primera selección
+    chunk = budget if deadline is None and not early_stop and solver is None else max(batch_size, CHECK_EVERY)
+    profiler = Profiler() if profile else None
+    before = cache.counters() if cache is not None else None
+    before_table = table.counters() if table is not None else None
+    done = 0
+    while done < budget:
+        step = min(chunk, budget - done)
+        run_iterations(root, step, neural, batch_size=batch_size, table=table, solver=solver, profiler=profiler, rollouts=rollouts, puct=puct, cache=cache)
+        done += step
+        now = time.perf_counter()
+        if root.proven is not None:
+            break  # Resultado exacto conocido, más iteraciones no cambian la decisión
+        if deadline is not None and now >= deadline:
+            break
+        if early_stop:
+            remaining = budget - done
+            if deadline is not None:  # Estimación de las iteraciones que caben en el tiempo restante
+                remaining = min(remaining, done / (now - start) * (deadline - now))
+            if can_stop_early(root, remaining):
+                break
+
+    elapsed = time.perf_counter() - start
+    size, depth = tree_stats(root)
+    stats = {
+        "iterations": done,
+        "seconds": elapsed,
+        "nodes_per_second": done / elapsed if elapsed > 0 else 0.0,
+        "tree_size": size,
+        "max_depth": depth,
+    }
+    if cache is not None:
+        stats.update({name: value - before[name] for name, value in cache.counters().items()})
+    if table is not None:
+        stats.update({name: value - before_table[name] for name, value in table.counters().items()})
+    if profiler is not None:
+        stats.update(tree_shape(root))
+        stats["phases"] = profiler.summary()
+        stats["root_visits"] = {"pass" if move is None else f"{move[0]},{move[1]}": child.visits for move, child in zip(root.moves, root.children)}
+    return stats
+
+def choice_noise(neural, training, noise_std=None): # Desviación del ruido de choose_action. Si no se fija con noise_std, depende de si se usa la red y de training
+    if noise_std is not None:
+        return noise_std
+    if not neural:
+        return TIE_NOISE
+    return TRAINING_NOISE if training else 0.0
+
+def choose_action(root, noise_std=0.0, by_visits=False): # Elige la jugada final a partir de las estadísticas de los hijos de la raíz. noise_std: ver choice_noise
+    # by_visits: elige el hijo más visitado en lugar del de mejor recompensa media (con early_stop, que sólo asegura que no cambie el más visitado)
+    winning = [move for move, child in zip(root.moves, root.children) if child.proven == 1]
+    if winning:
+        return winning[0]  # Victoria demostrada por el solver de finales
+    if root.proven is not None:
+        # Raíz resuelta sin victoria: se juega el mejor resultado exacto (empate si lo hay), prefiriendo el más visitado
+        return max(zip(root.moves, root.children), key=lambda item: (item[1].proven if item[1].proven is not None else -2, item[1].visits))[0]
+    if root.priors is not None or by_visits:
+        best_node = max(root.children, key=lambda child: child.visits)  # Con PUCT las visitas ya reflejan priors y recompensas
     else:
-        best_node = root.best_child(0) # Si no se usa la red neuronal nunca se va a introducir ruido
-    return best_node.action
+        best_node = root.best_child(0, noise_std) # Selecciona el hijo con mejor recompensa media (c=0, solo explotación). Alternativa: Devolver hijo con más visitas.
+    return root.moves[root.children.index(best_node)]
+
+def visit_distribution(root): # Distribución de las visitas de los hijos de la raíz sobre las 64 casillas (objetivo de la cabeza de política)
+    distribution = np.zeros(64, dtype=np.float32)
+    for move, child in zip(root.moves, root.children):
+        if move is not None:
+            distribution[move[0] * 8 + move[1]] += child.visits
+    total = distribution.sum()
+    return distribution / total if total > 0 else distribution
+
+def create_root(position, player, table=None): # Crea la raíz de la búsqueda, o la reutiliza de la tabla de transposiciones si ya se había visto
+    if table is None:
+        return MCTSNode(position, player)
+    key = zobrist.hash_position(position, player)
+    root = table.get(key)
+    if root is None:
+        root = MCTSNode(position, player, key=key)
+        table.put(key, root)
+    return root
+
+def mcts_uct(state, player, iterations=1000, neural=True, training=False, *, batch_size=1, table=None, time_limit=None, early_stop=False, return_stats=False, solver=None, book=None, profile=False, rollouts=1, puct=False, cache=None, noise_std=None, tree="nodes", capacity=None):  # Algoritmo principal MCTS con UCT # iterations: número de simulaciones para mejorar la decisión # batch_size: hojas evaluadas por llamada a la red # table: TranspositionTable opcional
+    # Las opciones a partir de batch_size sólo se pueden pasar por nombre, igual que en MCTSSearch, search y las funciones que recorren: son muchas y un orden equivocado cambiaría la búsqueda sin dar error
+    # time_limit: milisegundos por jugada (opcional) # return_stats: devuelve (acción, estadísticas) en lugar de sólo la acción # solver: EndgameSolver opcional para resolver los finales
+    # book: OpeningBook opcional. Si la posición está en el libro se juega su movimiento sin buscar # profile: añade a las estadísticas el tiempo por fase (ver search)
+    # rollouts: simulaciones aleatorias por hoja con neural=False, jugadas a la vez con agent.rollouts
+    # puct: selección PUCT con los priors de la cabeza de política (necesita un modelo de create_dual_model)
+    # cache: EvaluationCache opcional. Si se pasa la misma en todas las jugadas, las posiciones ya evaluadas (o simétricas) no vuelven a la red
+    # noise_std: desviación del ruido al elegir la jugada entre los hijos de la raíz. Por defecto TRAINING_NOISE con red y training, 0 con red sin training y TIE_NOISE sin red
+    # tree: uno de TREES. "array" busca sobre agent.array_tree con capacity nodos como máximo (por defecto array_tree.DEFAULT_CAPACITY)
+    # Asumimos que va a haber movimientos válidos en la raiz, ya que si no no se llama a la función en un primer lugar
+    position = bitboard.from_array(state)
+    action, stats = book_move(book, position, player)
+    if action is not None:
+        return (action, stats) if return_stats else action
+    if tree == "array":
+        from agent import array_tree  # Import diferido: array_tree usa las evaluaciones de este módulo
+        array_tree.check_options(batch_size=batch_size, table=table, solver=solver, puct=puct, profile=profile)
+        store = array_tree.ArrayTree(capacity or array_tree.DEFAULT_CAPACITY)
+        root = store.add_root(position, player)
+        stats = array_tree.search(store, root, iterations, neural, time_limit=time_limit, early_stop=early_stop, rollouts=rollouts, cache=cache)
+        action = array_tree.choose_action(store, root, choice_noise(neural, training, noise_std), by_visits=early_stop)
+        return (action, stats) if return_stats else action
+    if tree != "nodes":
+        raise ValueError(f"Árbol de búsqueda desconocido: {tree}")
+    root = create_root(position, player, table)
+    stats = search(root, iterations, neural, batch_size=batch_size, table=table, time_limit=time_limit, early_stop=early_stop, solver=solver, profile=profile, rollouts=rollouts, puct=puct, cache=cache)
+    action = choose_action(root, choice_noise(neural, training, noise_std), by_visits=early_stop)
+    return (action, stats) if return_stats else action
+
+def book_move(book, position, player): # Consulta el libro de aperturas. Devuelve (movimiento, estadísticas) o (None, None) si no hay libro o la posición no está
+    if book is None:
+        return None, None
+    start = time.perf_counter()
+    action = book.choose(position, player)
+    if action is None:
+        return None, None
+    return action, {"iterations": 0, "seconds": time.perf_counter() - start, "nodes_per_second": 0.0, "tree_size": 0, "max_depth": 0, "book": True}
+
+class MCTSSearch: # Búsqueda persistente: conserva el árbol entre jugadas para reutilizar las visitas y recompensas ya calculadas
+    # Cada nodo acumula la recompensa del jugador que movió para llegar a él, pero proven (y la entrada de la red en las hojas) es desde la
+    # perspectiva del jugador raíz, así que cada jugador debe usar su propio MCTSSearch
+    # Con tree="array" el árbol es un agent.array_tree.ArrayTree, que se reutiliza entre jugadas mientras quede al menos la mitad de su capacidad libre
+    def __init__(self, iterations=1000, neural=True, training=False, *, batch_size=1, table=None, time_limit=None, early_stop=False, solver=None, book=None, profile=False, rollouts=1, puct=False, cache=None, noise_std=None, tree="nodes", capacity=None):
+        self.iterations = iterations
+        self.cache = cache  # EvaluationCache opcional. A diferencia de la tabla, puede compartirse entre los dos jugadores
+        self.puct = puct  # Selección PUCT con el modelo dual
+        self.rollouts = rollouts  # Simulaciones aleatorias por hoja sin red neuronal
+        self.profile = profile
+        self.solver = solver
+        self.book = book  # OpeningBook opcional
+        self.time_limit = time_limit
+        self.early_stop = early_stop
+        self.stats = None  # Estadísticas de la última búsqueda
+        self.neural = neural
+        self.training = training
+        self.noise_std = choice_noise(neural, training, noise_std)  # Ruido al elegir la jugada, como en mcts_uct
+        self.batch_size = batch_size
+        self.table = table  # TranspositionTable opcional, también debe usarla un único jugador
+        self.root = None  # Se crea en la primera búsqueda
+        self.array = None  # ArrayTree con tree="array", y el índice de su raíz
+        self.array_root = None
+        if tree == "array":
+            from agent import array_tree
+            array_tree.check_options(batch_size=batch_size, table=table, solver=solver, puct=puct, profile=profile)
+            self.array = array_tree.ArrayTree(capacity or array_tree.DEFAULT_CAPACITY)
+        elif tree != "nodes":
+            raise ValueError(f"Árbol de búsqueda desconocido: {tree}")
+
+    def search(self, state, player): # Equivalente a mcts_uct, pero partiendo del subárbol conservado si corresponde a este estado
+        position = bitboard.from_array(state)
+        action, stats = book_move(self.book, position, player)
+        if action is not None:
+            self.stats = stats
+            self.root = self.array_root = None  # Sin árbol de esta jugada: la primera búsqueda fuera del libro empieza de cero
+            return action
+        if self.array is not None:
+            return self.search_array(position, player)
+        if self.root is None or self.root.state != position or self.root.player != player:
+            self.root = create_root(position, player, self.table)  # No hay subárbol reutilizable, se empieza de cero (o desde la tabla)
+        self.stats = search(self.root, self.iterations, self.neural, batch_size=self.batch_size, table=self.table, time_limit=self.time_limit, early_stop=self.early_stop,
+                            solver=self.solver, profile=self.profile, rollouts=self.rollouts, puct=self.puct, cache=self.cache)
+        return choose_action(self.root, self.noise_std, by_visits=self.early_stop)
+
+    def search_array(self, position, player): # search con el árbol de arrays
+        from agent import array_tree
+        tree = self.array
+        if self.array_root is None or tree.position(self.array_root) != position or tree.player[self.array_root] != player or tree.size > tree.capacity // 2:
+            tree.clear()  # Sin subárbol reutilizable, o con poca capacidad libre para esta búsqueda: se empieza de cero
+            self.array_root = tree.add_root(position, player)
+        self.stats = array_tree.search(tree, self.array_root, self.iterations, self.neural, time_limit=self.time_limit, early_stop=self.early_stop, rollouts=self.rollouts, cache=self.cache)
+        return array_tree.choose_action(tree, self.array_root, self.noise_std, by_visits=self.early_stop)
+
+    def advance(self, action): # Avanza la raíz por la jugada realizada por cualquiera de los dos jugadores. action = None es un pase de turno
+        if self.array_root is not None:
+            child = self.array.child(self.array_root, action)
+            if child is not None:
+                self.array.parent[child] = -1  # La retropropagación se detiene en la nueva raíz. El resto del árbol ocupa capacidad hasta el siguiente clear
+            self.array_root = child
+            return
+        if self.root is None:
+            return
+        child = next((child for child, move in zip(self.root.children, self.root.moves) if move == action), None)
+        if child is None:
+            self.root = None  # La jugada no se había explorado, la siguiente búsqueda empieza de cero
+            return
+        child.parent = None  # Corta el enlace para que la retropropagación se detenga en la nueva raíz y se libere el resto del árbol
+        self.root = child
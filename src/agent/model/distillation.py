@@ -0,0 +1,153 @@
+import os
+import time
+import argparse
+import itertools
+import tempfile
+import numpy as np
+from agent import evaluator
+from agent.model import pipeline, encoding
+from data import dataset
+
+# Compresión del modelo para la búsqueda: mcts_uct hace miles de evaluaciones por jugada, y create_model está dimensionado para
+# la precisión. Se destila el modelo entrenado (profesor) en una red con la misma estructura pero más estrecha (alumno),
+# entrenada para reproducir las predicciones del profesor sobre los datos de entrenamiento. El alumno se exporta al formato de
+# NumpyEvaluator, opcionalmente con pesos en float16 o int8 (con una escala por canal de salida), y mcts_uct lo usa en lugar del
+# modelo completo con evaluator.use_backend("student"). El informe compara el error respecto al profesor, las evaluaciones por
+# segundo y la memoria de cada variante
+
+FILTERS = 32  # Filtros de cada convolución del alumno (128 en create_model)
+HIDDEN = 64  # Neuronas de la primera capa densa (128 en create_model). La segunda tiene la mitad
+PRECISIONS = ["float32", "float16", "int8"]
+WEIGHT_RANKS = [4, 1, 4, 1, 2, 1, 2, 1, 2, 1]  # Dimensiones de cada peso de evaluator.WEIGHT_NAMES: kernels y sesgos de las dos Conv2D y las tres Dense
+MIN_SECONDS = 0.5  # Duración mínima de cada medida de velocidad
+
+def create_student_model(filters=FILTERS, hidden=HIDDEN, input_shape=(8, 8, 4)): # Las mismas capas que create_model, así que NumpyEvaluator lo evalúa sin cambios
+    from keras.models import Sequential
+    from keras.layers import Input, Conv2D, Flatten, Dense
+    from keras.optimizers import Adam
+    model = Sequential([
+        Input(shape=input_shape),
+        Conv2D(filters, kernel_size=3, padding='same', activation='relu'),
+        Conv2D(filters, kernel_size=3, padding='same', activation='relu'),
+        Flatten(),
+        Dense(hidden, activation='relu'),
+        Dense(hidden // 2, activation='relu'),
+        Dense(1, activation='tanh'),
+    ])
+    model.compile(optimizer=Adam(), loss='mse', metrics=['mae'])
+    return model
+
+def teacher_value(teacher, inputs): # Valor (N, 1) que predice el profesor. Un modelo de create_dual_model devuelve un diccionario con la política
+    output = teacher(inputs, training=False)
+    return output["value"] if isinstance(output, dict) else output
+
+def distillation_data(teacher, split, result_weight, route, batch_size=256): # Batches de pipeline con las predicciones del profesor como objetivo
+    # result_weight: peso del resultado real de la partida en el objetivo (0 para imitar sólo al profesor)
+    data = pipeline.make_dataset(split, batch_size=batch_size, augmented=split == "train", shuffle=split == "train", route=route)
+    return data.map(lambda inputs, results: (inputs, result_weight * results + (1 - result_weight) * teacher_value(teacher, inputs)))
+
+def distill(teacher_route=evaluator.MODEL_ROUTE, route=dataset.DATASET_ROUTE, epochs=10, filters=FILTERS, hidden=HIDDEN, result_weight=0.0): # Entrena el alumno. Devuelve el modelo de Keras
+    import keras
+    teacher = keras.models.load_model(teacher_route)
+    student = create_student_model(filters, hidden)
+    student.fit(distillation_data(teacher, "train", result_weight, route), validation_data=distillation_data(teacher, "validation", result_weight, route), epochs=epochs)
+    return student
+
+def quantize(weights, precision): # Pesos {nombre: array float32} -> pesos para guardar en el .npz con la precisión pedida
+    if precision == "float32":
+        return weights
+    if precision == "float16":
+        return {name: weight.astype(np.float16) for name, weight in weights.items()}
+    if precision != "int8":
+        raise ValueError(f"Precisión desconocida: {precision}")
+    quantized = {}
+    for name, weight in weights.items():
+        if name.endswith("_bias"):  # Los sesgos son pocos y se dejan en float32
+            quantized[name] = weight
+            continue
+        scale = np.abs(weight.reshape(-1, weight.shape[-1])).max(axis=0) / 127  # Escala simétrica por canal de salida
+        scale[scale == 0] = 1
+        quantized[name] = np.round(weight / scale).astype(np.int8)
+        quantized[f"{name}_scale"] = scale.astype(np.float32)
+    return quantized
+
+def export(model, route=evaluator.STUDENT_ROUTE, precision="float32"): # Guarda los pesos de un modelo de Keras para NumpyEvaluator con la precisión pedida
+    # Sólo modelos con las capas de create_student_model: con otras, zip emparejaría nombres y pesos que no se corresponden
+    weights = model.get_weights()
+    if [weight.ndim for weight in weights] != WEIGHT_RANKS or weights[-2].shape[-1] != 1:
+        raise ValueError(f"El modelo no tiene las capas de create_student_model ({len(weights)} pesos con dimensiones {[weight.shape for weight in weights]}), no se puede exportar para NumpyEvaluator")
+    weights = dict(zip(evaluator.WEIGHT_NAMES, (weight.astype(np.float32) for weight in weights)))
+    np.savez(route, **quantize(weights, precision))
+    return route
+
+def throughput(model, inputs): # Posiciones evaluadas por segundo con el batch inputs, repitiendo durante al menos MIN_SECONDS
+    model.evaluate(inputs)  # Calentamiento: carga de los pesos
+    runs = 0
+    begin = time.perf_counter()
+    while time.perf_counter() - begin < MIN_SECONDS:
+        model.evaluate(inputs)
+        runs += 1
+    return len(inputs) * runs / (time.perf_counter() - begin)
+
+def report(routes, teacher_route=evaluator.NUMPY_ROUTE, route=dataset.DATASET_ROUTE, batch_sizes=(1, 256), max_batches=20): # Una fila por modelo de routes ({nombre: ruta .npz}) y otra para el profesor
+    # Error cuadrático medio respecto al profesor y respecto a los resultados en la validación, posiciones por segundo con NumpyEvaluator
+    # para cada tamaño de batch, parámetros, tamaño del fichero y memoria de los pesos cargados (siempre en float32)
+    models = {"profesor": evaluator.NumpyEvaluator(teacher_route), **{name: evaluator.NumpyEvaluator(path) for name, path in routes.items()}}
+    files = {"profesor": teacher_route, **routes}
+    errors = {name: [0.0, 0.0] for name in models}
+    count = 0
+    for inputs, results in itertools.islice(pipeline.batches("validation", 512, shuffle=False, route=route), max_batches):
+        reference = models["profesor"].evaluate(inputs)
+        for name, model in models.items():
+            predictions = model.evaluate(inputs)
+            errors[name][0] += float(((predictions - reference) ** 2).sum())
+            errors[name][1] += float(((predictions - results[:, 0]) ** 2).sum())
+        count += len(inputs)
+    rng = np.random.default_rng(0)
+    rows = []
+    for name, model in models.items():
+        row = {"name": name, "mse_teacher": errors[name][0] / count if count else float("nan"), "mse_results": errors[name][1] / count if count else float("nan")}
+        for batch_size in batch_sizes:
+            boards = rng.integers(0, 3, size=(batch_size, 8, 8))
+            row[f"positions_per_second_{batch_size}"] = throughput(model, encoding.convert_board_states(boards, rng.integers(1, 3, size=batch_size)))
+        weights = model.load()
+        row["parameters"] = sum(weight.size for weight in weights.values())
+        row["file_mb"] = os.path.getsize(files[name]) / 2 ** 20
+        row["memory_mb"] = sum(weight.nbytes for weight in weights.values()) / 2 ** 20
+        rows.append(row)
+    return rows
+
+def format_report(rows, batch_sizes=(1, 256)):
+    header = f"{'modelo':>10} {'MSE profesor':>13} {'MSE resultados':>15} " + " ".join(f"{f'pos/s batch {size}':>16}" for size in batch_sizes) + f" {'parámetros':>11} {'MB fichero':>11} {'MB memoria':>11}"
+    lines = [header]
+    for row in rows:
+        speeds = " ".join(f"{row[f'positions_per_second_{size}']:16.0f}" for size in batch_sizes)
+        lines.append(f"{row['name']:>10} {row['mse_teacher']:13.5f} {row['mse_results']:15.4f} {speeds} {row['parameters']:11d} {row['file_mb']:11.2f} {row['memory_mb']:11.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teacher", default=evaluator.MODEL_ROUTE, help="Modelo de Keras a destilar")
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE, help="Conjunto de datos (el mismo que usa agent.model.model)")
+    parser.add_argument("--output", default=evaluator.STUDENT_ROUTE, help="Pesos del alumno para NumpyEvaluator. El modelo de Keras se guarda junto, con extensión .keras")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--filters", type=int, default=FILTERS)
+    parser.add_argument("--hidden", type=int, default=HIDDEN)
+    parser.add_argument("--result-weight", type=float, default=0.0, help="Peso del resultado real frente a la predicción del profesor en el objetivo")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32", help="Precisión de los pesos en --output")
+    parser.add_argument("--report-only", action="store_true", help="No entrena: sólo compara el alumno ya guardado (el .keras junto a --output)")
+    args = parser.parse_args()
+
+    keras_route = os.path.splitext(args.output)[0] + ".keras"
+    if args.report_only:
+        import keras
+        student = keras.models.load_model(keras_route)
+    else:
+        student = distill(args.teacher, args.route, args.epochs, args.filters, args.hidden, args.result_weight)
+        student.save(keras_route)
+        export(student, args.output, args.precision)
+        print(f"Alumno guardado en {args.output} ({args.precision}). mcts_uct lo usa con evaluator.use_backend(\"student\"), o --backend student en la arena y los generadores")
+    with tempfile.TemporaryDirectory() as folder:  # El profesor y las demás precisiones se exportan sólo para compararlos, todos en NumPy
+        teacher_numpy = evaluator.export_weights(args.teacher, os.path.join(folder, "teacher.npz"))
+        routes = {precision: args.output if precision == args.precision else export(student, os.path.join(folder, f"{precision}.npz"), precision) for precision in PRECISIONS}
+        print(format_report(report(routes, teacher_numpy, args.route)))
@@ -0,0 +1,33 @@
+import numpy as np
+
+def convert_board_state(board, player): # Convierte la matriz que representa el tablero para su procesamiento en la red neuronal
+    if player == 1: # jugador BLANCO
+        player_pieces = (board == 1).astype(np.float32)
+        opponent_pieces = (board == 2).astype(np.float32)
+        player_flag = 1.0
+    else: # jugador NEGRO
+        player_pieces = (board == 2).astype(np.float32)
+        opponent_pieces = (board == 1).astype(np.float32)
+        player_flag = 0.0
+    
+    empty = (board == 0).astype(np.float32)
+    player_channel = np.full(board.shape, player_flag, dtype=np.float32)
+    
+    # Creación de cuatro canales: 1. Casillas del jugador para el que se calcula la probabilidad de victoria, marcadas a 1 | 2. Casillas del oponente, marcadas a 2 | 3. Casillas vacías | 4. Identificador del jugador, 0 negro 1 blanco
+    return np.stack([player_pieces, opponent_pieces, empty, player_channel], axis=-1)
+
+def convert_board_states(boards, players): # Versión vectorizada de convert_board_state para un array de tableros (N, 8, 8) y de jugadores (N,)
+    boards = np.asarray(boards)
+    players = np.asarray(players).reshape(-1, 1, 1)
+    own = np.where(players == 1, 1, 2)  # Valor de las fichas del jugador activo en cada tablero
+    player_pieces = boards == own
+    opponent_pieces = boards == 3 - own
+    empty = boards == 0
+    player_channel = np.broadcast_to(players == 1, boards.shape)  # 1 blanco, 0 negro
+    return np.stack([player_pieces, opponent_pieces, empty, player_channel], axis=-1).astype(np.float32)
+
+def symmetry(boards, k): # Aplica la simetría k (0-7) del tablero: k % 4 giros de 90 grados, y reflejo si k >= 4. boards: (N, 8, 8, ...)
+    result = np.rot90(boards, k % 4, axes=(1, 2))
+    if k >= 4:
+        result = result[:, :, ::-1]
+    return result
@@ -1,11 +1,16 @@
 import os
-import pandas as pd
-import numpy as np
 
-from keras.models import Sequential
-from keras.layers import Conv2D, Flatten, Dense
+from keras.models import Sequential, Model
+from keras.layers import Input, Conv2D, Flatten, Dense
 from keras.optimizers import Adam
-from sklearn.model_selection import train_test_split
+from agent.model import pipeline
+from agent.model.encoding import convert_board_state # Se definía aquí: se reexporta para no romper from agent.model.model import convert_board_state
+from data import dataset
+
+AUGMENT = True # Aplica al azar una de las 8 simetrías del tablero a cada muestra de entrenamiento
+COMPACT = False # Entrena con el conjunto compactado (python -m data.compaction), usando el número de apariciones de cada posición como peso
+DUAL = False # Entrena el modelo con cabeza de política (create_dual_model). Necesita partidas generadas guardando las visitas de la raíz, y no admite COMPACT
+POLICY_WEIGHT = 1.0 # Peso de la pérdida de la política frente a la del valor en el modelo dual
 
 def create_model(input_shape=(8, 8, 4)): # Tablero de 8 x 8, con 3 canales representando las situaciones de las casillas, y 1 representando el jugador actual
     model = Sequential() # Red secuencial = pila de capas donde la salida de una es la entrada de la siguiente
@@ -25,51 +30,48 @@ def create_model(input_shape=(8, 8, 4)): # Tablero de 8 x 8, con 3 canales repre
     model.compile(optimizer=Adam(), loss='mse', metrics=['mae']) # Define entrenamiento del modelo, mse para penalizar errores grandes y mae para mostrar resultados
     return model
 
-def convert_board_state(board, player): # Convierte la matriz que representa el tablero para su procesamiento en la red neuronal
-    if player == 1: # jugador BLANCO
-        player_pieces = (board == 1).astype(np.float32)
-        opponent_pieces = (board == 2).astype(np.float32)
-        player_flag = 1.0
-    else: # jugador NEGRO
-        player_pieces = (board == 2).astype(np.float32)
-        opponent_pieces = (board == 1).astype(np.float32)
-        player_flag = 0.0
-    
-    empty = (board == 0).astype(np.float32)
-    player_channel = np.full(board.shape, player_flag, dtype=np.float32)
-    
-    # Creación de cuatro canales: 1. Casillas del jugador para el que se calcula la probabilidad de victoria, marcadas a 1 | 2. Casillas del oponente, marcadas a 2 | 3. Casillas vacías | 4. Identificador del jugador, 0 negro 1 blanco
-    return np.stack([player_pieces, opponent_pieces, empty, player_channel], axis=-1)
+def create_dual_model(input_shape=(8, 8, 4)): # Las mismas capas que create_model para el valor, más una cabeza de política con la probabilidad de mover a cada una de las 64 casillas
+    # Las capas tienen nombre para que agent.evaluator pueda exportar sus pesos sin depender del orden de get_weights
+    inputs = Input(shape=input_shape)
+    x = Conv2D(128, kernel_size=3, padding='same', activation='relu', name='conv1')(inputs)
+    x = Conv2D(128, kernel_size=3, padding='same', activation='relu', name='conv2')(x)
+
+    # Cabeza de valor, igual que en create_model
+    value = Flatten()(x)
+    value = Dense(128, activation='relu', name='dense1')(value)
+    value = Dense(64, activation='relu', name='dense2')(value)
+    value = Dense(1, activation='tanh', name='value')(value)
+
+    # Cabeza de política: convolución 1x1 que resume los 128 canales en 2 por casilla, y una capa densa con softmax sobre las 64 casillas (índice x * 8 + y)
+    policy = Conv2D(2, kernel_size=1, activation='relu', name='policy_conv')(x)
+    policy = Flatten()(policy)
+    policy = Dense(64, activation='softmax', name='policy')(policy)
+
+    model = Model(inputs=inputs, outputs={'value': value, 'policy': policy})
+    # Entropía cruzada con la distribución de visitas de la raíz. Las muestras sin búsqueda (objetivo todo ceros) no aportan pérdida
+    model.compile(optimizer=Adam(), loss={'value': 'mse', 'policy': 'categorical_crossentropy'}, loss_weights={'value': 1.0, 'policy': POLICY_WEIGHT}, metrics={'value': ['mae']})
+    return model
 
 if __name__ == "__main__":
-    # Establecimiento de ruta de lectura del fichero
     base_route = os.path.dirname(os.path.abspath(__file__))
-    data_route = os.path.join(base_route, "../..", "data")
-    file_route = os.path.join(data_route, "training_data.pkl")
-
-    df = pd.read_pickle(file_route)  # nuevo archivo limpio con pandas
-
-    states = df['state'].to_list() # Representación del tablero tras una jugada
-    players = df['player'].to_list() # Jugador activo en cada estado
-    results = df['result'].to_list() # Resultado de la partida para el jugador activo. Es lo que la red debe predecir según los estados
-
-    board_states = np.array([convert_board_state(tablero, player) for tablero, player in zip(states, players)])
-    outcomes = np.array(results).reshape(-1, 1) # Cambia la forma del array para que tenga una columna(1) y tantas filas como sea necesario(-1)
 
-    # División entrenamiento/validación
-    attributes_train, attributes_eval, goal_train, goal_eval = train_test_split(board_states, outcomes, test_size=.2, random_state=12) # random_state establece la misma semilla siempre, para asegurar reproducibilidad
+    # Los datos se leen por bloques de data/training_data y se codifican por batches (ver pipeline.py), sin cargar todo el conjunto en memoria
+    # La división entrenamiento/validación (80/20) es por partidas y siempre la misma
+    data_route = dataset.COMPACT_ROUTE if COMPACT else dataset.DATASET_ROUTE
+    train_data = pipeline.make_dataset("train", batch_size=256, augmented=AUGMENT, route=data_route, weighted=COMPACT, policy=DUAL) # Minilotes de 256. Cuando haya menos datos, mejor usar 50 épocas con minilotes de 128
+    eval_data = pipeline.make_dataset("validation", batch_size=128, shuffle=False, route=data_route, weighted=COMPACT, policy=DUAL)
 
     # Crear modelo
-    model = create_model()
+    model = create_dual_model() if DUAL else create_model()
 
     # Entrenamiento
-    history = model.fit(
-        attributes_train, goal_train,
-        epochs=100, batch_size=256, # 100 épocas, con minilotes de 256. Cuanda haya mneos datos, mejor usar 50 épocas con minilotes de 128.
-    )
+    history = model.fit(train_data, epochs=100) # 100 épocas
 
     #Evaluación
-    mse, mae = model.evaluate(attributes_eval, goal_eval, batch_size=128)
+    results = model.evaluate(eval_data, return_dict=True)
+    mse, mae = (results["value_loss"], results["value_mae"]) if DUAL else (results["loss"], results["mae"])
+    if DUAL:
+        print(f"Pérdida de la política (entropía cruzada) en validación: {results['policy_loss']:.4f}")
     print(f"Pérdida (MSE) en validación: {mse:.4f}")
     print(f"Error absoluto medio (MAE) en validación: {mae:.4f}")
 
@@ -79,7 +81,7 @@ if __name__ == "__main__":
 
     print("Entrenamiento terminado y modelo guardado.")
 
-    variance = np.var(goal_eval)
+    variance = pipeline.target_variance("validation", data_route)
     r2 = 1 - (mse / variance)
 
     print(f"Coeficiente de determinación: {r2:.4f}")
\ No newline at end of file
@@ -0,0 +1,109 @@
+import itertools
+import numpy as np
+from data import dataset
+from agent.model.encoding import convert_board_states, symmetry
+
+# Entrada de datos para el entrenamiento por streaming: se leen los shards de data/training_data por bloques, se codifican
+# de forma vectorizada y se entregan en batches, sin tener nunca todo el conjunto en memoria.
+# La división entrenamiento/validación se hace por partidas (todas las posiciones de una partida van al mismo lado) y es determinista
+
+VALIDATION_PERCENT = 20
+
+def is_validation(games, percent=VALIDATION_PERCENT): # Decide por partida, con un hash del identificador para repartirlas de forma uniforme
+    mixed = (np.asarray(games, dtype=np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    return mixed % np.uint64(100) < np.uint64(percent)
+
+def split_mask(records, split): # split: "train", "validation" o "all"
+    if split == "all":
+        return np.ones(len(records), dtype=bool)
+    validation = is_validation(records["game"])
+    return validation if split == "validation" else ~validation
+
+def encode(records): # Registros de data.dataset -> (entradas (N, 8, 8, 4), objetivos (N, 1), pesos (N,) o None)
+    boards = dataset.unpack_boards(records["white"], records["black"])
+    inputs = convert_board_states(boards, records["player"])
+    weights = records["count"].astype(np.float32) if "count" in records.dtype.names else None  # Conjunto compactado: cada fila pesa lo que sus apariciones
+    return inputs, records["result"].astype(np.float32).reshape(-1, 1), weights
+
+def augment(inputs, rng, policy=None): # Aplica a cada muestra una de las 8 simetrías al azar. El resultado de la partida no cambia con la simetría
+    # policy: objetivos de política (N, 64), que se transforman con la misma simetría que su tablero. Si se pasa, devuelve (entradas, política)
+    choice = rng.integers(0, 8, len(inputs))
+    result = np.empty_like(inputs)
+    for k in range(8):
+        selected = choice == k
+        result[selected] = symmetry(inputs[selected], k)
+    if policy is None:
+        return result
+    boards = policy.reshape(-1, 8, 8)
+    moved = np.empty_like(boards)
+    for k in range(8):
+        selected = choice == k
+        moved[selected] = symmetry(boards[selected], k)
+    return result, moved.reshape(-1, 64)
+
+def batches(split="train", batch_size=256, augmented=False, shuffle=True, seed=0, chunk_size=65536, route=dataset.DATASET_ROUTE, weighted=False, shards=None, policy=False): # Generador de batches (entradas, objetivos), o (entradas, objetivos, pesos) si weighted
+    # shards: índices de los shards a recorrer (por defecto todos), por ejemplo los de window_shards
+    # policy: los objetivos son {"value": resultados, "policy": distribución de visitas (N, 64)}, para create_dual_model. Los shards sin política dan ceros
+    rng = np.random.default_rng(seed)
+    data = dataset.Dataset(route)
+    chunks = [(i, start) for i, shard in enumerate(data.index["shards"]) if shards is None or i in shards for start in range(0, shard["samples"], chunk_size)]
+    if shuffle:
+        chunks = [chunks[i] for i in rng.permutation(len(chunks))]  # Orden de los bloques aleatorio en cada recorrido
+    for i, start in chunks:
+        records = data.shard(i)[start:start + chunk_size]
+        selected = split_mask(records, split)
+        records = records[selected]
+        if policy:
+            stored = data.policy(i)
+            visits = np.asarray(stored[start:start + chunk_size][selected], dtype=np.float32) if stored is not None else np.zeros((len(records), 64), dtype=np.float32)
+        if shuffle:
+            order = rng.permutation(len(records))
+            records = records[order]  # Mezcla dentro del bloque
+            if policy:
+                visits = visits[order]
+        for offset in range(0, len(records), batch_size):
+            inputs, targets, weights = encode(records[offset:offset + batch_size])
+            if policy:
+                moves = visits[offset:offset + batch_size]
+                if augmented:
+                    inputs, moves = augment(inputs, rng, moves)
+                targets = {"value": targets, "policy": moves}
+            elif augmented:
+                inputs = augment(inputs, rng)
+            if weighted:
+                yield inputs, targets, weights if weights is not None else np.ones(len(inputs), dtype=np.float32)
+            else:
+                yield inputs, targets
+
+def window_shards(data, games): # Índices de los últimos shards de data (un Dataset) que suman al menos games partidas: la ventana de repetición del entrenamiento continuo
+    selected = []
+    total = 0
+    for i in reversed(range(len(data.index["shards"]))):
+        if total >= games:
+            break
+        selected.append(i)
+        total += data.index["shards"][i]["games"]
+    return sorted(selected)
+
+def make_dataset(split="train", batch_size=256, augmented=False, shuffle=True, seed=0, route=dataset.DATASET_ROUTE, weighted=False, policy=False): # tf.data.Dataset con los batches de batches()
+    import tensorflow as tf
+    epochs = itertools.count(seed)  # Cada recorrido (época) usa otra semilla para mezclar y aumentar de forma distinta
+    targets = tf.TensorSpec(shape=(None, 1), dtype=tf.float32)
+    if policy:
+        targets = {"value": targets, "policy": tf.TensorSpec(shape=(None, 64), dtype=tf.float32)}
+    signature = (tf.TensorSpec(shape=(None, 8, 8, 4), dtype=tf.float32), targets)
+    if weighted:
+        signature += (tf.TensorSpec(shape=(None,), dtype=tf.float32),)
+    data = tf.data.Dataset.from_generator(lambda: batches(split, batch_size, augmented, shuffle, next(epochs), route=route, weighted=weighted, policy=policy), output_signature=signature)
+    return data.prefetch(tf.data.AUTOTUNE)  # Prepara el siguiente batch mientras la red entrena con el actual
+
+def target_variance(split="validation", route=dataset.DATASET_ROUTE): # Varianza de los resultados, calculada por bloques (ponderada por apariciones en el conjunto compactado)
+    count = total = squares = 0
+    for records in dataset.Dataset(route).chunks():
+        selected = records[split_mask(records, split)]
+        results = selected["result"].astype(np.float64)
+        weights = selected["count"].astype(np.float64) if "count" in selected.dtype.names else np.ones(len(results))
+        count += weights.sum()
+        total += (weights * results).sum()
+        squares += (weights * results ** 2).sum()
+    return squares / count - (total / count) ** 2 if count else 0.0
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import re
+import queue
+import random
+import shutil
+import argparse
+import itertools
+import numpy as np
+from collections import Counter
+from multiprocessing import Pool, Process, Event, Lock
+from agent import evaluator
+from agent.model import pipeline
+from data import dataset
+
+# Entrenamiento continuo: generación de partidas y entrenamiento a la vez, en lugar de los dos pasos manuales
+# (python -m game.game_generator y python -m agent.model.model). Un Pool de procesos juega partidas de autojuego sin parar y
+# las añade como shards al conjunto de datos, mientras un proceso entrenador afina la red a partir de su última versión con las
+# partidas más recientes (la ventana de repetición) y publica versiones numeradas en CHECKPOINT_ROUTE. Antes de cada partida,
+# cada proceso de autojuego mira la última versión publicada y, si ha cambiado, carga los pesos nuevos sin reiniciar el Pool.
+# Las métricas (partidas por hora, muestras entrenadas por segundo, retraso de versión de las partidas) se muestran por consola
+# y se guardan en METRICS_NAME
+
+base_route = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_ROUTE = os.path.join(base_route, "checkpoints")
+LATEST_NAME = "latest.json"  # Última versión publicada
+TRAINER_NAME = "trainer.json"  # Estadísticas del entrenador, que las escribe tras cada versión
+METRICS_NAME = "metrics.json"  # Métricas de todo el bucle, que escribe el proceso principal
+IN_USE_NAME = "in_use.json"  # Versiones asignadas a partidas en curso, que el entrenador no debe borrar
+VALIDATION_BATCHES = 8  # Batches de validación de la ventana evaluados tras cada versión
+
+def write_json(route, content): # Escritura atómica, como Dataset.save_index: ningún proceso lee nunca un fichero a medias
+    temporary = route + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(content, f, indent=1)
+    os.replace(temporary, route)
+
+def read_json(route):
+    if not os.path.exists(route):
+        return None
+    with open(route) as f:
+        return json.load(f)
+
+def checkpoint_route(checkpoints, version, backend="keras"): # Fichero de una versión para el motor de inferencia dado
+    return os.path.join(checkpoints, f"model-{version:05d}.{'keras' if backend == 'keras' else 'npz'}")
+
+def latest_version(checkpoints): # Número de la última versión publicada, o None si todavía no hay ninguna
+    latest = read_json(os.path.join(checkpoints, LATEST_NAME))
+    return None if latest is None else latest["version"]
+
+def publish(model, checkpoints, version, keep, lock): # Guarda la versión para los dos motores, la anuncia en LATEST_NAME y borra las que quedan fuera de las keep últimas
+    for backend in ("keras", "numpy"):
+        route = checkpoint_route(checkpoints, version, backend)
+        base, extension = os.path.splitext(route)
+        temporary = f"{base}.tmp{extension}"  # Keras y np.savez deciden el formato por la extensión
+        if backend == "keras":
+            model.save(temporary)
+        else:
+            evaluator.save_weights(model, temporary)
+        os.replace(temporary, route)
+    write_json(os.path.join(checkpoints, LATEST_NAME), {"version": version, "timestamp": time.time()})
+    remove_old_versions(checkpoints, version, keep, lock)
+
+def remove_old_versions(checkpoints, version, keep, lock): # Borra las versiones fuera de las keep últimas, salvo las asignadas a una partida en curso
+    # Un proceso de autojuego carga su versión en la primera evaluación de la partida, así que la que tiene asignada debe seguir en disco.
+    # Las que no se pueden borrar ahora se borran en una publicación posterior. Con lock, el proceso principal no asigna versiones mientras tanto
+    with lock:
+        in_use = set(read_json(os.path.join(checkpoints, IN_USE_NAME)) or [])
+        for name in os.listdir(checkpoints):
+            match = re.fullmatch(r"model-(\d+)\.(keras|npz)", name)
+            if match and int(match.group(1)) <= version - keep and int(match.group(1)) not in in_use:
+                os.remove(os.path.join(checkpoints, name))
+
+def assign_version(checkpoints, assigned, lock): # Última versión publicada, que se apunta en IN_USE_NAME para una partida nueva
+    # assigned: Counter versión -> partidas en curso, del proceso principal
+    with lock:
+        version = latest_version(checkpoints)
+        assigned[version] += 1
+        write_in_use(checkpoints, assigned)
+    return version
+
+def release_version(checkpoints, assigned, version, lock): # Ha terminado una partida que jugaba con version
+    with lock:
+        assigned[version] -= 1
+        write_in_use(checkpoints, assigned)
+
+def write_in_use(checkpoints, assigned):
+    write_json(os.path.join(checkpoints, IN_USE_NAME), sorted(version for version, games in assigned.items() if games > 0))
+
+_loaded = {"version": None}  # Versión cargada en este proceso de autojuego
+
+def selfplay_game(checkpoints, backend, iterations, version, seed): # Una partida de autojuego con la versión asignada por el proceso principal. Devuelve (muestras, versión usada, segundos)
+    from game import game_generator  # Import diferido: game_generator importa este paquete
+    if version != _loaded["version"]:
+        evaluator.use_backend(backend, checkpoint_route(checkpoints, version, backend))  # Cambio de modelo en caliente. Se carga en la primera evaluación
+        _loaded["version"] = version
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    start = time.perf_counter()
+    samples, _ = game_generator.simulate_agent_vs_agent(iterations)
+    return samples, version, time.perf_counter() - start
+
+def repeated_batches(route, shards, batch_size, seed): # Batches de entrenamiento de la ventana, recorriéndola las veces que haga falta
+    for epoch in itertools.count(seed):
+        empty = True
+        for batch in pipeline.batches("train", batch_size, augmented=True, seed=epoch, route=route, shards=shards):
+            empty = False
+            yield batch
+        if empty:
+            return  # Sin muestras de entrenamiento en la ventana (todas sus partidas son de validación)
+
+def validation_mse(model, route, shards): # Error cuadrático medio sobre las partidas de validación de la ventana, o None si no hay
+    total = count = 0
+    for inputs, targets in itertools.islice(pipeline.batches("validation", 512, shuffle=False, route=route, shards=shards), VALIDATION_BATCHES):
+        predictions = model(inputs, training=False).numpy()
+        total += float(((predictions - targets) ** 2).sum())
+        count += len(targets)
+    return total / count if count else None
+
+def train_loop(route, checkpoints, initial, window, steps, batch_size, min_samples, replay_ratio, keep, learning_rate, stop, lock): # Proceso entrenador, hasta que se active stop
+    # Cada versión son steps batches de la ventana (las últimas window partidas). Para no sobreajustar a pocas partidas, espera
+    # si ya ha entrenado más de replay_ratio muestras por cada muestra generada desde que empezó (contando al menos min_samples)
+    # learning_rate: menor que el de create_model. Con un Adam recién creado, las primeras actualizaciones mueven todos los pesos
+    # casi lo mismo que el learning rate, y con 1e-3 la capa densa de 8192 entradas satura la salida del modelo ya entrenado
+    import keras  # Import diferido: sólo este proceso necesita TensorFlow para entrenar
+    from agent.model.model import create_model
+    version = latest_version(checkpoints)
+    if version is None:  # Primera ejecución: la versión 0 es el modelo inicial (o uno nuevo) y los procesos de autojuego esperan a que exista
+        model = keras.models.load_model(initial) if initial and os.path.exists(initial) else create_model()
+        version = 0
+        publish(model, checkpoints, version, keep, lock)
+    else:
+        model = keras.models.load_model(checkpoint_route(checkpoints, version))  # Continúa desde la última versión, con el estado del optimizador
+    model.optimizer.learning_rate = learning_rate
+    initial_samples = len(dataset.Dataset(route))
+    trained = 0
+    seconds = 0.0
+    while not stop.is_set():
+        data = dataset.Dataset(route)  # Se vuelve a leer el índice para ver los shards nuevos
+        generated = len(data) - initial_samples
+        shards = pipeline.window_shards(data, window)
+        window_samples = sum(data.index["shards"][i]["samples"] for i in shards)
+        if window_samples < min_samples or trained >= replay_ratio * max(generated, min_samples):
+            stop.wait(1.0)  # Esperando partidas nuevas
+            continue
+        start = time.perf_counter()
+        losses = []
+        samples = 0
+        for inputs, targets in itertools.islice(repeated_batches(route, shards, batch_size, version * steps), steps):
+            losses.append(float(model.train_on_batch(inputs, targets)[0]))
+            samples += len(inputs)
+        if not samples:
+            stop.wait(1.0)
+            continue
+        trained += samples
+        seconds += time.perf_counter() - start
+        version += 1
+        publish(model, checkpoints, version, keep, lock)
+        stats = {"version": version, "samples_trained": trained, "train_seconds": seconds, "samples_per_second": trained / seconds,
+                 "loss": sum(losses) / len(losses), "validation_mse": validation_mse(model, route, shards),
+                 "window_games": sum(data.index["shards"][i]["games"] for i in shards), "window_samples": window_samples}
+        write_json(os.path.join(checkpoints, TRAINER_NAME), stats)
+
+def run(route=dataset.DATASET_ROUTE, checkpoints=CHECKPOINT_ROUTE, initial=evaluator.MODEL_ROUTE, processes=1, iterations=100, backend="keras",
+        games=None, hours=None, window=2000, steps=200, batch_size=256, min_samples=5000, replay_ratio=4.0, keep=5, shard_games=8, learning_rate=1e-4): # Bucle completo. Devuelve las métricas finales
+    # games / hours: para tras ese número de partidas o de horas (cualquiera de los dos puede ser None, y sin ninguno no para)
+    # shard_games: partidas que se juntan en cada shard nuevo (cada shard es una escritura del índice)
+    os.makedirs(checkpoints, exist_ok=True)
+    for name in (TRAINER_NAME, IN_USE_NAME):  # Las estadísticas del entrenador y las partidas en curso son de esta ejecución, no de la anterior
+        if os.path.exists(os.path.join(checkpoints, name)):
+            os.remove(os.path.join(checkpoints, name))
+    stop = Event()
+    lock = Lock()  # Entre la asignación de versiones a las partidas y el borrado de versiones antiguas
+    assigned = Counter()
+    trainer = Process(target=train_loop, args=(route, checkpoints, initial, window, steps, batch_size, min_samples, replay_ratio, keep, learning_rate, stop, lock))
+    trainer.start()
+    while latest_version(checkpoints) is None:
+        if not trainer.is_alive():
+            raise RuntimeError("El proceso entrenador ha terminado sin publicar la versión inicial")
+        time.sleep(0.5)
+
+    data = dataset.Dataset(route)
+    finished = queue.Queue()  # Resultados de las partidas según terminan (o la excepción del proceso que ha fallado)
+    seeds = itertools.count(random.getrandbits(32))
+    deadline = None if hours is None else time.time() + hours * 3600
+    start = time.perf_counter()
+    played = 0
+    lags = []  # Versiones publicadas entre la que jugó cada partida y la última al terminarla
+    buffer = []
+    metrics = {}
+    print(f"Entrenamiento continuo con {processes} procesos de autojuego, ventana de {window} partidas. Versiones en {checkpoints}")
+    # Los procesos de autojuego se crean después del entrenador y el proceso principal nunca importa TensorFlow, así que el fork es seguro
+    with Pool(processes=processes) as pool:
+        def submit():
+            version = assign_version(checkpoints, assigned, lock)  # Asignada antes de lanzar la partida, para que no se borre mientras se juega
+            pool.apply_async(selfplay_game, (checkpoints, backend, iterations, version, next(seeds)), callback=finished.put, error_callback=finished.put)
+        for _ in range(processes):  # Siempre hay una partida en curso por proceso
+            submit()
+        try:
+            while True:
+                result = finished.get()
+                if isinstance(result, BaseException):
+                    raise result
+                samples, version, _ = result
+                release_version(checkpoints, assigned, version, lock)
+                played += 1
+                buffer.extend(samples)
+                latest = latest_version(checkpoints)
+                lags.append(latest - version)
+                done = (games is not None and played >= games) or (deadline is not None and time.time() >= deadline)
+                if not done:
+                    submit()
+                if len(buffer) and (played % shard_games == 0 or done):
+                    data.append(buffer)  # Las partidas quedan disponibles para el entrenador en cuanto se escribe el índice
+                    buffer = []
+                    metrics = loop_metrics(checkpoints, played, len(data), time.perf_counter() - start, latest, lags)
+                    write_json(os.path.join(checkpoints, METRICS_NAME), metrics)
+                    print(format_metrics(metrics), flush=True)
+                if done:
+                    break
+        finally:
+            pool.terminate()  # Descarta las partidas en curso
+            stop.set()
+            trainer.join()
+    return metrics
+
+def loop_metrics(checkpoints, played, samples, elapsed, latest, lags, recent=100): # Métricas del bucle. El retraso es la media de las últimas recent partidas
+    trainer = read_json(os.path.join(checkpoints, TRAINER_NAME)) or {}
+    train_seconds = trainer.get("train_seconds", 0.0)
+    return {"games": played, "games_per_hour": played * 3600 / elapsed, "samples": samples, "model_version": latest,
+            "version_lag": sum(lags[-recent:]) / len(lags[-recent:]), "samples_trained": trainer.get("samples_trained", 0),
+            "trained_per_second": trainer.get("samples_per_second", 0.0), "trainer_busy": min(train_seconds / elapsed, 1.0),
+            "loss": trainer.get("loss"), "validation_mse": trainer.get("validation_mse"), "elapsed": elapsed}
+
+def format_metrics(metrics):
+    validation = "-" if metrics["validation_mse"] is None else f"{metrics['validation_mse']:.4f}"
+    return (f"Partidas {metrics['games']:6d} ({metrics['games_per_hour']:7.1f}/h) | muestras {metrics['samples']:8d} | versión {metrics['model_version']:4d} "
+            f"(retraso {metrics['version_lag']:.2f}) | entrenadas {metrics['samples_trained']:9d} ({metrics['trained_per_second']:7.1f}/s, "
+            f"entrenador ocupado {metrics['trainer_busy'] * 100:5.1f}%) | MSE validación {validation}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=None, help="Partidas a jugar antes de parar")
+    parser.add_argument("--hours", type=float, default=None, help="Horas antes de parar")
+    parser.add_argument("--iterations", type=int, default=100, help="Iteraciones de mcts_uct por jugada")
+    parser.add_argument("--processes", type=int, default=max((os.cpu_count() or 2) - 1, 1), help="Procesos de autojuego (el entrenador usa uno más)")
+    parser.add_argument("--backend", choices=["keras", "numpy"], default="keras", help="Motor de inferencia de los procesos de autojuego")
+    parser.add_argument("--window", type=int, default=2000, help="Partidas más recientes con las que se entrena")
+    parser.add_argument("--steps", type=int, default=200, help="Batches de entrenamiento por versión")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--min-samples", type=int, default=5000, help="Muestras mínimas en la ventana para empezar a entrenar")
+    parser.add_argument("--replay-ratio", type=float, default=4.0, help="Máximo de muestras entrenadas por cada muestra generada")
+    parser.add_argument("--learning-rate", type=float, default=1e-4, help="Learning rate del afinado")
+    parser.add_argument("--keep", type=int, default=5, help="Versiones que se conservan en disco")
+    parser.add_argument("--shard-games", type=int, default=8, help="Partidas por shard nuevo")
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE, help="Conjunto de datos al que se añaden las partidas")
+    parser.add_argument("--checkpoints", default=CHECKPOINT_ROUTE)
+    parser.add_argument("--initial", default=evaluator.MODEL_ROUTE, help="Modelo del que se parte si no hay versiones (si no existe, uno nuevo)")
+    parser.add_argument("--publish", action="store_true", help="Al terminar, copia la última versión a los modelos por defecto de agent.evaluator")
+    args = parser.parse_args()
+
+    if args.games is None and args.hours is None:
+        print("Sin --games ni --hours: el bucle sigue hasta que se interrumpa con Ctrl+C")
+    try:
+        run(args.route, args.checkpoints, args.initial, args.processes, args.iterations, args.backend, args.games, args.hours, args.window,
+            args.steps, args.batch_size, args.min_samples, args.replay_ratio, args.keep, args.shard_games, args.learning_rate)
+    except KeyboardInterrupt:
+        print("Interrumpido")
+    if args.publish:
+        version = latest_version(args.checkpoints)
+        shutil.copyfile(checkpoint_route(args.checkpoints, version, "keras"), evaluator.MODEL_ROUTE)
+        shutil.copyfile(checkpoint_route(args.checkpoints, version, "numpy"), evaluator.NUMPY_ROUTE)
+        print(f"Versión {version} copiada a {evaluator.MODEL_ROUTE} y {evaluator.NUMPY_ROUTE}")
@@ -0,0 +1,177 @@
+import os
+import random
+import argparse
+import numpy as np
+from game import bitboard, zobrist
+from data import dataset
+from agent import mcts_uct
+from agent.model.encoding import symmetry
+
+# Libro de aperturas: estadísticas posición -> movimiento para las primeras jugadas, obtenidas de las partidas del generador
+# (python -m game.game_generator) o de búsquedas profundas hechas de antemano. Las posiciones se guardan en forma canónica
+# (la menor de sus 8 simetrías, como en data.compaction) y el movimiento en el mismo sistema de referencia, de modo que
+# todas las aperturas simétricas comparten entradas. El fichero es un array de BOOK_RECORD ordenado por clave (hash Zobrist
+# de la posición canónica con el jugador que mueve), así que una consulta es una búsqueda binaria sobre el array
+
+BOOK_RECORD = np.dtype([("key", "<u8"), ("move", "u1"), ("count", "<u4"), ("score", "<f4")])  # score: resultado medio para el jugador que mueve
+
+base_route = os.path.dirname(os.path.abspath(__file__))
+BOOK_ROUTE = os.path.join(base_route, "opening_book.npy")
+BOOK_DEPTH = 12  # Jugadas desde el inicio que cubre el libro por defecto
+
+def canonical_moves(white, black, moves): # Para cada (posición, movimiento como bit): posición canónica y casilla del movimiento en ese sistema de referencia
+    # Si varias simetrías llevan a la misma posición canónica (posiciones simétricas) se elige la que da la menor casilla,
+    # para que movimientos equivalentes compartan entrada
+    boards = dataset.unpack_boards(white, black)
+    targets = dataset.unpack_boards(moves, np.zeros_like(moves))
+    best_white, best_black = dataset.pack_boards(boards)
+    best_move, _ = dataset.pack_boards(targets)
+    for k in range(1, 8):
+        sym_white, sym_black = dataset.pack_boards(symmetry(boards, k))
+        sym_move, _ = dataset.pack_boards(symmetry(targets, k))
+        same = (sym_white == best_white) & (sym_black == best_black)
+        better = (sym_white < best_white) | ((sym_white == best_white) & (sym_black < best_black)) | (same & (sym_move < best_move))
+        best_white = np.where(better, sym_white, best_white)
+        best_black = np.where(better, sym_black, best_black)
+        best_move = np.where(better, sym_move, best_move)
+    squares = np.unpackbits(best_move.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little').argmax(axis=1)
+    return best_white, best_black, squares
+
+def aggregate(keys, moves, counts, scores): # Agrupa las filas con la misma clave y movimiento: suma las apariciones y promedia el resultado. Devuelve el array del libro, ordenado
+    rows = np.zeros(len(keys), dtype=[("key", "<u8"), ("move", "u1")])
+    rows["key"], rows["move"] = keys, moves
+    unique, inverse = np.unique(rows, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.asarray(counts, dtype=np.float64)
+    book = np.zeros(len(unique), dtype=BOOK_RECORD)
+    book["key"], book["move"] = unique["key"], unique["move"]
+    book["count"] = np.bincount(inverse, weights=counts, minlength=len(unique))
+    book["score"] = np.bincount(inverse, weights=counts * scores, minlength=len(unique)) / np.maximum(book["count"], 1)
+    return book
+
+def game_moves(records): # A partir de los registros de partidas completas, cada jugada como (blancas, negras, jugador que mueve, casilla como bit, resultado para él, ply)
+    # El generador guarda la posición después de cada jugada, así que la jugada es la casilla que se ocupa entre un registro y el anterior.
+    # La posición inicial no se guarda: es la anterior al primer registro de cada partida
+    white = np.asarray(records["white"], dtype=np.uint64)
+    black = np.asarray(records["black"], dtype=np.uint64)
+    starts = np.concatenate(([True], records["game"][1:] != records["game"][:-1]))
+    initial_white, initial_black = bitboard.create_position()
+    before_white = np.where(starts, np.uint64(initial_white), np.roll(white, 1))
+    before_black = np.where(starts, np.uint64(initial_black), np.roll(black, 1))
+    moves = (white | black) & ~(before_white | before_black)
+    movers = np.where(white & moves, bitboard.WHITE, bitboard.BLACK)
+    results = np.asarray(records["result"], dtype=np.float64)
+    results = np.where(records["player"] == movers, results, -results)  # El resultado guardado es para el jugador que mueve después
+    return before_white, before_black, movers, moves, results, records["ply"]
+
+def from_games(route=dataset.DATASET_ROUTE, depth=BOOK_DEPTH): # Filas del libro con las jugadas de las primeras depth jugadas de todas las partidas del conjunto
+    parts = []
+    for shard in dataset.Dataset(route).shards():  # Las partidas no se reparten entre shards
+        white, black, movers, moves, results, ply = game_moves(shard)
+        keep = ply < depth
+        canonical_white, canonical_black, squares = canonical_moves(white[keep], black[keep], moves[keep])
+        keys = zobrist.hash_positions(canonical_white, canonical_black, movers[keep])
+        parts.append((keys, squares, np.ones(len(keys)), results[keep]))
+    if not parts:
+        return np.zeros(0, dtype=BOOK_RECORD)
+    return aggregate(*(np.concatenate(column) for column in zip(*parts)))
+
+def from_search(depth=4, iterations=2000, neural=False): # Filas del libro con búsquedas de iterations iteraciones sobre todas las posiciones (canónicas) de las primeras depth jugadas
+    frontier = [(bitboard.create_position(), bitboard.BLACK)]
+    keys, squares, counts, scores = [], [], [], []
+    for _ in range(depth):
+        following = {}  # Clave canónica -> (posición, jugador) de la siguiente jugada, sin repetir posiciones simétricas
+        for position, player in frontier:
+            root = mcts_uct.MCTSNode(position, player)
+            mcts_uct.search(root, iterations, neural)
+            children = [(move, child) for move, child in zip(root.moves, root.children) if child.visits > 0]
+            bits = np.array([1 << (x * 8 + y) for (x, y), _ in children], dtype=np.uint64)
+            size = len(bits)
+            canonical_white, canonical_black, canonical_squares = canonical_moves(np.full(size, position[0], dtype=np.uint64), np.full(size, position[1], dtype=np.uint64), bits)
+            keys.append(zobrist.hash_positions(canonical_white, canonical_black, np.full(size, player)))
+            squares.append(canonical_squares)
+            counts.append([child.visits for _, child in children])
+            scores.append([child.total_reward / child.visits for _, child in children])  # Recompensa media del hijo, la que usa choose_action
+            for x, y in bitboard.valid_movements(position, player):
+                after = bitboard.apply_movement(position, x, y, player)
+                following_player = 3 - player if bitboard.valid_movements(after, 3 - player) else player  # Pase de turno
+                if not bitboard.valid_movements(after, following_player):
+                    continue  # Partida terminada
+                canonical_white, canonical_black, _ = canonical_moves(np.array([after[0]], dtype=np.uint64), np.array([after[1]], dtype=np.uint64), np.zeros(1, dtype=np.uint64))
+                following.setdefault((int(canonical_white[0]), int(canonical_black[0]), following_player), (after, following_player))
+        frontier = list(following.values())
+    if not keys:
+        return np.zeros(0, dtype=BOOK_RECORD)
+    return aggregate(np.concatenate(keys), np.concatenate(squares), np.concatenate(counts), np.concatenate(scores))
+
+def save(book, route=BOOK_ROUTE):
+    np.save(route, book)
+    return route
+
+class OpeningBook:
+    def __init__(self, route=BOOK_ROUTE, max_ply=BOOK_DEPTH, min_count=1, randomized=False, temperature=1.0):
+        # max_ply: sólo se consulta el libro en las primeras max_ply jugadas # min_count: apariciones mínimas de un movimiento para jugarlo
+        # randomized: elige entre los movimientos del libro con probabilidad proporcional a count ** (1 / temperature), para variar las partidas
+        # de entrenamiento. Si no, juega siempre el más repetido
+        self.route = route
+        self.max_ply = max_ply
+        self.min_count = min_count
+        self.randomized = randomized
+        self.temperature = temperature
+        self.book = None  # Se carga la primera vez que se consulta. Si no existe el fichero, el libro está vacío
+
+    def load(self):
+        if self.book is None:
+            self.book = np.load(self.route) if os.path.exists(self.route) else np.zeros(0, dtype=BOOK_RECORD)
+        return self.book
+
+    def __len__(self):
+        return len(self.load())
+
+    def lookup(self, position, player): # Lista de (movimiento (x, y), apariciones, resultado medio) de los movimientos legales que están en el libro
+        book = self.load()
+        legal = bitboard.valid_movements(position, player)
+        if not len(book) or not legal:
+            return []
+        size = len(legal)
+        bits = np.array([1 << (x * 8 + y) for x, y in legal], dtype=np.uint64)
+        canonical_white, canonical_black, squares = canonical_moves(np.full(size, position[0], dtype=np.uint64), np.full(size, position[1], dtype=np.uint64), bits)
+        key = zobrist.hash_positions(canonical_white[:1], canonical_black[:1], [player])[0]
+        start = np.searchsorted(book["key"], key, side="left")
+        end = np.searchsorted(book["key"], key, side="right")
+        rows = {int(row["move"]): row for row in book[start:end]}
+        entries = []
+        for move, square in zip(legal, squares):
+            row = rows.get(int(square))
+            if row is not None:
+                entries.append((move, int(row["count"]), float(row["score"])))
+        return entries
+
+    def choose(self, position, player): # Movimiento del libro para la posición, o None si está fuera del libro
+        if (position[0] | position[1]).bit_count() - 4 >= self.max_ply:
+            return None
+        entries = [entry for entry in self.lookup(position, player) if entry[1] >= self.min_count]
+        if not entries:
+            return None
+        if self.randomized:
+            return random.choices([move for move, _, _ in entries], weights=[count ** (1 / self.temperature) for _, count, _ in entries])[0]
+        return max(entries, key=lambda entry: (entry[1], entry[2]))[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", choices=["games", "search", "both"], default="games", help="Partidas del conjunto de entrenamiento, búsquedas profundas o ambas")
+    parser.add_argument("--depth", type=int, default=None, help=f"Jugadas que cubre el libro (por defecto {BOOK_DEPTH} con partidas y 4 con búsquedas)")
+    parser.add_argument("--iterations", type=int, default=2000, help="Iteraciones de cada búsqueda")
+    parser.add_argument("--neural", action="store_true", help="Búsquedas con la red neuronal en lugar de simulaciones aleatorias")
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE, help="Conjunto de partidas")
+    args = parser.parse_args()
+
+    parts = []
+    if args.source in ("games", "both"):
+        parts.append(from_games(args.route, args.depth or BOOK_DEPTH))
+    if args.source in ("search", "both"):
+        parts.append(from_search(args.depth or 4, args.iterations, args.neural))
+    rows = np.concatenate(parts)
+    book = aggregate(rows["key"], rows["move"], rows["count"], rows["score"])
+    save(book)
+    print(f"Libro con {len(np.unique(book['key']))} posiciones y {len(book)} movimientos guardado en {BOOK_ROUTE}")
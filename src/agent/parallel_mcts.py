@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+import numpy as np
+from multiprocessing import Pool
+from game import bitboard
+from agent import mcts_uct, evaluator
+
+# MCTS en paralelo para una única decisión, en dos variantes:
+# - "root": paralelismo de raíz. Cada proceso construye su propio árbol desde la misma posición (con otra semilla) y al final
+#   se suman las visitas y recompensas de los hijos de la raíz de todos los árboles
+# - "tree": paralelismo de árbol. Varios hilos comparten un mismo árbol y usan pérdida virtual para no elegir todos el mismo camino.
+#   Sólo la evaluación se hace fuera del cerrojo, así que sólo escala cuando la evaluación libera el GIL (la red neuronal), no con simulaciones aleatorias
+
+def create_pool(workers, backend="keras"): # Pool reutilizable entre jugadas, para no pagar el arranque de los procesos (y la carga del modelo) en cada una
+    return Pool(processes=workers, initializer=evaluator.use_backend, initargs=(backend,))
+
+def root_worker(position, player, iterations, neural, time_limit, seed): # Búsqueda independiente en un proceso. Devuelve las estadísticas de los hijos de la raíz
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    root = mcts_uct.MCTSNode(position, player)
+    stats = mcts_uct.search(root, iterations, neural, time_limit=time_limit)
+    children = [(move, child.visits, child.total_reward) for move, child in zip(root.moves, root.children)]
+    return children, stats
+
+def search_root_parallel(position, player, iterations, neural, workers, time_limit, pool):
+    seeds = [random.getrandbits(63) for _ in range(workers)]
+    own_pool = pool is None
+    pool = pool or create_pool(workers)
+    try:
+        results = pool.starmap(root_worker, [(position, player, iterations, neural, time_limit, seed) for seed in seeds])
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+
+    merged = {}  # Movimiento -> [visitas, recompensa total] sumadas entre todos los árboles
+    for children, _ in results:
+        for move, visits, reward in children:
+            totals = merged.setdefault(move, [0, 0.0])
+            totals[0] += visits
+            totals[1] += reward
+    return merged, sum(stats["iterations"] for _, stats in results)
+
+def search_tree_parallel(position, player, iterations, neural, workers, time_limit, root=None): # root: árbol de una búsqueda anterior desde esta posición, para seguir ampliándolo
+    root = root if root is not None else mcts_uct.MCTSNode(position, player)
+    lock = threading.Lock()
+    budget = float("inf") if iterations is None else iterations
+    deadline = None if time_limit is None else time.perf_counter() + time_limit / 1000
+    done = [0]
+
+    def work():
+        while True:
+            with lock:  # Selección y expansión con el árbol bloqueado
+                if done[0] >= budget or (deadline is not None and time.perf_counter() >= deadline):
+                    return
+                done[0] += 1
+                node = mcts_uct.tree_policy(root, mcts_uct.c)
+                mcts_uct.virtual_loss(node, mcts_uct.VIRTUAL_LOSS)
+            if neural:  # La evaluación se hace sin el cerrojo, mientras otros hilos siguen recorriendo el árbol
+                reward = mcts_uct.default_policy(node.state, player)
+            else:
+                reward = mcts_uct.default_policy_old(node.state, player, node.player)
+            with lock:
+                mcts_uct.virtual_loss(node, -mcts_uct.VIRTUAL_LOSS)
+                node.backup(reward)
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    merged = {move: [child.visits, child.total_reward] for move, child in zip(root.moves, root.children)}
+    return merged, done[0]
+
+def parallel_mcts(state, player, iterations=1000, neural=True, workers=2, mode="root", time_limit=None, pool=None, return_stats=False, root=None):
+    # iterations y time_limit funcionan como en mcts_uct. En modo "root" el presupuesto es por proceso; en modo "tree" es el total compartido
+    # pool: Pool de create_pool para reutilizar los procesos entre jugadas (sólo modo "root")
+    # root: MCTSNode de esta posición con el árbol ya construido en jugadas anteriores (sólo modo "tree")
+    position = bitboard.from_array(state)
+    start = time.perf_counter()
+    if mode == "root":
+        merged, done = search_root_parallel(position, player, iterations, neural, workers, time_limit, pool)
+    elif mode == "tree":
+        merged, done = search_tree_parallel(position, player, iterations, neural, workers, time_limit, root)
+    else:
+        raise ValueError(f"Modo de paralelismo desconocido: {mode}")
+    elapsed = time.perf_counter() - start
+
+    # Igual que choose_action: el hijo con mejor recompensa media (c=0, solo explotación). Si el tiempo se agota antes de que termine
+    # ninguna iteración no hay hijos visitados, y se juega el primer movimiento legal
+    action = max((move for move, (visits, _) in merged.items() if visits > 0), key=lambda move: merged[move][1] / merged[move][0], default=None)
+    if action is None:
+        action = (bitboard.valid_movements(position, player) or [None])[0]  # None: pase, si no hay movimientos
+    stats = {"iterations": done, "seconds": elapsed, "nodes_per_second": done / elapsed if elapsed > 0 else 0.0,
+             "root_visits": {move: visits for move, (visits, _) in merged.items()}}
+    return (action, stats) if return_stats else action
+
+class ParallelSearch: # Misma interfaz que mcts_uct.MCTSSearch (search, advance, stats) con parallel_mcts, para usarla en play_match
+    # En modo "tree" conserva el árbol entre jugadas como MCTSSearch. En modo "root" no: cada proceso construye su árbol y sólo devuelve los
+    # hijos de la raíz, así que cada jugada empieza de cero. El Pool se crea una vez y se reutiliza en todas las jugadas; hay que cerrarlo con close
+    # Las posiciones que el solver puede resolver se buscan en serie con el solver, que da el resultado exacto
+    def __init__(self, iterations=1000, neural=True, workers=2, mode="root", time_limit=None, solver=None, book=None, backend="keras"):
+        self.iterations = iterations
+        self.neural = neural
+        self.workers = workers
+        self.mode = mode
+        self.time_limit = time_limit
+        self.solver = solver
+        self.book = book
+        self.stats = None  # Estadísticas de la última búsqueda
+        self.root = None  # Árbol conservado entre jugadas, sólo en modo "tree"
+        self.pool = create_pool(workers, backend) if mode == "root" else None  # Antes de cargar ningún modelo en este proceso
+        if neural and mode == "tree":
+            evaluator.use_backend(backend)
+
+    def search(self, state, player):
+        position = bitboard.from_array(state)
+        action, stats = mcts_uct.book_move(self.book, position, player)
+        if action is None and self.solver is not None and self.solver.can_solve(position):
+            action, stats = mcts_uct.mcts_uct(state, player, iterations=self.iterations, neural=self.neural, time_limit=self.time_limit, solver=self.solver, return_stats=True)
+        if action is not None:
+            self.root = None  # Jugada sin árbol en paralelo: la siguiente búsqueda empieza de cero
+        else:
+            if self.mode == "tree" and (self.root is None or self.root.state != position or self.root.player != player):
+                self.root = mcts_uct.MCTSNode(position, player)
+            action, stats = parallel_mcts(state, player, self.iterations, self.neural, self.workers, self.mode, self.time_limit, self.pool, return_stats=True, root=self.root)
+        self.stats = stats
+        return action
+
+    def advance(self, action): # Como MCTSSearch.advance. En modo "root" no hay árbol que conservar
+        if self.root is None:
+            return
+        child = next((child for child, move in zip(self.root.children, self.root.moves) if move == action), None)
+        if child is not None:
+            child.parent = None  # La retropropagación se detiene en la nueva raíz y se libera el resto del árbol
+        self.root = child
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -0,0 +1,155 @@
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+from data import dataset
+from agent import evaluator
+from agent.model import pipeline
+
+# Evaluador por patrones (n-tuplas), como en los programas clásicos de Othello: el valor de una posición es la suma de los pesos
+# de la configuración de cada patrón (bordes, esquinas, líneas y diagonales), leídos de una tabla indexada en base 3 con el estado de
+# sus casillas (0 vacía, 1 propia, 2 del rival), y pasada por tanh como la salida de la red. Cada patrón se aplica en sus simetrías
+# con la misma tabla, y hay un juego de tablas por fase de la partida. Recibe las mismas entradas que los evaluadores de
+# agent.evaluator, así que mcts_uct lo usa como evaluador de las hojas con evaluator.use_backend("patterns"), y es mucho más barato
+# por llamada que la red. Se entrena por regresión sobre los mismos datos que el modelo: python -m agent.patterns
+
+base_route = os.path.dirname(os.path.abspath(__file__))
+PATTERNS_ROUTE = os.path.join(base_route, "model/othello_patterns.npz")
+
+# Casillas (fila, columna) de cada patrón, en su posición junto a la esquina superior izquierda
+PATTERNS = {
+    "edge_2x": [(0, i) for i in range(8)] + [(1, 1), (1, 6)],  # Borde con las dos casillas X
+    "corner_3x3": [(i, j) for i in range(3) for j in range(3)],
+    "corner_2x5": [(i, j) for i in range(2) for j in range(5)],
+    "line_2": [(1, i) for i in range(8)],
+    "line_3": [(2, i) for i in range(8)],
+    "line_4": [(3, i) for i in range(8)],
+    "diagonal_8": [(i, i) for i in range(8)],
+    "diagonal_7": [(i, i + 1) for i in range(7)],
+    "diagonal_6": [(i, i + 2) for i in range(6)],
+    "diagonal_5": [(i, i + 3) for i in range(5)],
+    "diagonal_4": [(i, i + 4) for i in range(4)],
+}
+PHASES = 4  # Juegos de tablas según las casillas vacías. Con más fases el modelo es más fino, pero necesita más datos
+MAX_LENGTH = max(len(squares) for squares in PATTERNS.values())
+POWERS = (3 ** np.arange(MAX_LENGTH)).astype(np.float32)  # Exacto en float32: 3^10 < 2^24
+
+def transform(square, k): # Casilla tras la simetría k (0-7), la misma que encoding.symmetry: k % 4 giros y reflejo si k >= 4
+    row, column = square
+    for _ in range(k % 4):
+        row, column = 7 - column, row
+    return (row, 7 - column) if k >= 4 else (row, column)
+
+def layout(patterns=PATTERNS): # (casillas de cada instancia (F, MAX_LENGTH), desplazamiento de su tabla (F,), tamaño de un juego de tablas)
+    # Las instancias más cortas se rellenan con la casilla 64, que siempre vale 0. Se usan las 8 simetrías aunque algunas den las mismas
+    # casillas en otro orden (un borde y su reflejo), para que el valor sea exactamente el mismo en los 8 tableros simétricos
+    # La última posición de cada juego de tablas es un término independiente
+    cells, offsets = [], []
+    offset = 0
+    for squares in patterns.values():
+        for k in range(8):
+            moved = [transform(square, k) for square in squares]
+            cells.append([row * 8 + column for row, column in moved] + [64] * (MAX_LENGTH - len(squares)))
+            offsets.append(offset)
+        offset += 3 ** len(squares)
+    return np.array(cells), np.array(offsets), offset + 1
+
+CELLS, OFFSETS, TABLE_SIZE = layout()
+
+def features(inputs, phases=PHASES): # Entradas (N, 8, 8, 4) de convert_board_state -> índices (N, F + 1) en el vector de pesos aplanado (phases * TABLE_SIZE)
+    inputs = np.asarray(inputs, dtype=np.float32)
+    codes = np.zeros((len(inputs), 65), dtype=np.float32)
+    codes[:, :64] = (inputs[..., 0] + 2 * inputs[..., 1]).reshape(len(inputs), 64)
+    empties = inputs[..., 2].reshape(len(inputs), 64).sum(axis=1)
+    phase = np.minimum((60 - empties) * phases // 60, phases - 1).astype(np.int64)
+    indices = (codes[:, CELLS] @ POWERS).astype(np.int64) + OFFSETS  # Una sola indexación y producto para todas las instancias
+    indices = np.concatenate([indices, np.full((len(inputs), 1), TABLE_SIZE - 1)], axis=1)
+    return indices + phase[:, None] * TABLE_SIZE
+
+class PatternEvaluator: # Evalúa con las tablas de patrones guardadas con save
+    def __init__(self, route=PATTERNS_ROUTE):
+        self.route = route
+        self.weights = None
+
+    def load(self):
+        if self.weights is None:
+            with evaluator.load_lock:  # Como los evaluadores de agent.evaluator, una sola carga aunque la pidan varios hilos
+                if self.weights is None:
+                    self.weights = load(self.route)
+        return self.weights
+
+    def evaluate(self, inputs):
+        weights = self.load()
+        return np.tanh(weights.ravel()[features(inputs, len(weights))].sum(axis=1))
+
+    def evaluate_policy(self, inputs): # Sin política, como NumpyEvaluator con un modelo de una sola cabeza (lo usa el autojuego por batches)
+        return self.evaluate(inputs), None
+
+def load(route=PATTERNS_ROUTE): # Pesos (fases, TABLE_SIZE) en float32
+    with np.load(route) as data:
+        weights = data["weights"].astype(np.float32)
+    if weights.shape[1] != TABLE_SIZE:
+        raise ValueError(f"Las tablas de {route} no corresponden a los patrones actuales")
+    return weights
+
+def save(weights, route=PATTERNS_ROUTE): # Guarda los pesos en float16: unos pocos MB comprimidos, frente a los del modelo convolucional
+    np.savez_compressed(route, weights=weights.astype(np.float16))
+    return route
+
+def train(route=dataset.DATASET_ROUTE, epochs=10, batch_size=256, learning_rate=0.001, l2=1e-6, phases=PHASES, seed=0): # Regresión de los resultados con Adam
+    # Minimiza el error cuadrático medio entre tanh(suma de pesos) y el resultado, como la red. No hace falta aumentar los datos con
+    # las simetrías, ya que cada patrón se aplica en todas. Con cientos de miles de pesos
+    # sobreajusta pronto si hay pocas partidas, así que devuelve los pesos (fases, TABLE_SIZE) de la época con menor error en la validación
+    weights = np.zeros(phases * TABLE_SIZE, dtype=np.float64)
+    moment = np.zeros_like(weights)
+    second = np.zeros_like(weights)
+    beta1, beta2 = 0.9, 0.999
+    step = 0
+    best, best_error = weights.copy(), float("inf")
+    for epoch in range(epochs):
+        begin = time.perf_counter()
+        total = count = 0
+        for inputs, targets, sample_weights in pipeline.batches("train", batch_size, seed=seed + epoch, route=route, weighted=True):
+            indices = features(inputs, phases)
+            values = np.tanh(weights[indices].sum(axis=1))  # sample_weights: apariciones de cada fila en el conjunto compactado, o unos
+            errors = values - targets[:, 0]
+            total += float((sample_weights * errors ** 2).sum())
+            count += float(sample_weights.sum())
+            slopes = 2 * sample_weights * errors * (1 - values ** 2) / sample_weights.sum()  # Derivada del error respecto a la suma de cada muestra
+            gradient = np.bincount(indices.ravel(), weights=np.repeat(slopes, indices.shape[1]), minlength=len(weights)) + l2 * weights
+            step += 1
+            moment = beta1 * moment + (1 - beta1) * gradient
+            second = beta2 * second + (1 - beta2) * gradient ** 2
+            weights -= learning_rate * (moment / (1 - beta1 ** step)) / (np.sqrt(second / (1 - beta2 ** step)) + 1e-8)
+        validation = validation_mse(PatternModel(weights.reshape(phases, TABLE_SIZE)), route)
+        print(f"Época {epoch + 1}/{epochs}: MSE entrenamiento {total / max(count, 1):.4f}, validación {validation:.4f} ({time.perf_counter() - begin:.1f} s)", flush=True)
+        if not validation >= best_error:  # Sin partidas de validación (nan) se queda con la última época
+            best, best_error = weights.copy(), validation
+    return best.reshape(phases, TABLE_SIZE)
+
+class PatternModel(PatternEvaluator): # Evaluador con unos pesos ya en memoria, sin fichero
+    def __init__(self, weights):
+        super().__init__(None)
+        self.weights = np.asarray(weights, dtype=np.float32)
+
+def validation_mse(model, route=dataset.DATASET_ROUTE, max_batches=None): # Error cuadrático medio de un evaluador (con evaluate) en la validación
+    total = count = 0
+    for inputs, targets, sample_weights in itertools.islice(pipeline.batches("validation", 512, shuffle=False, route=route, weighted=True), max_batches):
+        total += float((sample_weights * (model.evaluate(inputs) - targets[:, 0]) ** 2).sum())
+        count += float(sample_weights.sum())
+    return total / count if count else float("nan")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE, help="Conjunto de datos (el mismo que usa agent.model.model)")
+    parser.add_argument("--output", default=PATTERNS_ROUTE)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--phases", type=int, default=PHASES)
+    args = parser.parse_args()
+
+    weights = train(args.route, args.epochs, args.batch_size, args.learning_rate, phases=args.phases)
+    save(weights, args.output)
+    print(f"{weights.size} pesos guardados en {args.output} ({os.path.getsize(args.output) / 1e6:.2f} MB). Varianza de los resultados en validación: {pipeline.target_variance(route=args.route):.4f}")
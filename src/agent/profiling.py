@@ -0,0 +1,76 @@
+import csv
+import json
+import time
+import contextlib
+
+# Instrumentación opcional de mcts_uct: tiempo acumulado y número de llamadas de cada fase de la búsqueda
+# (selección, expansión, solver de finales, evaluación y retropropagación). Las fases anidadas (la expansión ocurre dentro
+# de la selección) se descuentan de la que las contiene, así que los tiempos de todas las fases suman el total medido.
+# Sin perfilado, cada fase sólo entra y sale de un contexto vacío compartido, con un coste despreciable frente a una iteración
+
+PHASES = ["selection", "expand", "solver", "evaluation", "backup"]
+NOT_PROFILING = contextlib.nullcontext()
+
+class Profiler:
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.stack = []  # Fases abiertas: [nombre, inicio, tiempo de las fases anidadas]
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            name, start, nested = self.stack.pop()
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - nested
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.stack:
+                self.stack[-1][2] += elapsed
+
+    def summary(self): # {fase: {"seconds": tiempo propio acumulado, "calls": llamadas}}
+        return {name: {"seconds": self.seconds[name], "calls": self.calls[name]} for name in PHASES if name in self.seconds}
+
+def phase(profiler, name): # Contexto para medir una fase, o uno vacío si no se está perfilando
+    return NOT_PROFILING if profiler is None else profiler.measure(name)
+
+def merge(phases_list): # Suma los resúmenes de fases de varias búsquedas
+    total = {}
+    for phases in phases_list:
+        for name, values in phases.items():
+            merged = total.setdefault(name, {"seconds": 0.0, "calls": 0})
+            merged["seconds"] += values["seconds"]
+            merged["calls"] += values["calls"]
+    return {name: total[name] for name in PHASES if name in total}
+
+def format_phases(phases): # Texto con el reparto del tiempo entre fases, para mostrar por consola
+    total = sum(values["seconds"] for values in phases.values()) or 1.0
+    lines = []
+    for name, values in phases.items():
+        per_call = values["seconds"] / values["calls"] * 1e6 if values["calls"] else 0.0
+        lines.append(f"  {name:10s} {values['seconds']:9.3f} s {values['seconds'] / total * 100:5.1f}% {values['calls']:9d} llamadas {per_call:9.1f} µs/llamada")
+    return "\n".join(lines)
+
+def flatten(record): # Registro de una jugada como fila plana para CSV: las fases pasan a columnas y las visitas de la raíz a texto JSON
+    row = {key: value for key, value in record.items() if key not in ("phases", "root_visits")}
+    for name in PHASES:
+        values = record.get("phases", {}).get(name, {"seconds": 0.0, "calls": 0})
+        row[f"{name}_seconds"] = values["seconds"]
+        row[f"{name}_calls"] = values["calls"]
+    row["root_visits"] = json.dumps(record.get("root_visits", {}))
+    return row
+
+def dump(records, route): # Guarda los registros por jugada en JSON (con el resumen de fases de todas) o en CSV, según la extensión de route
+    if route.endswith(".csv"):
+        rows = [flatten(record) for record in records]
+        with open(route, "w", newline="") as f:
+            fields = list(dict.fromkeys(key for row in rows for key in row))  # Unión de columnas en orden de aparición (las jugadas del libro tienen alguna más)
+            writer = csv.DictWriter(f, fieldnames=fields, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(route, "w") as f:
+            json.dump({"phases": merge(record.get("phases", {}) for record in records), "moves": records}, f, indent=1)
+    return route
@@ -0,0 +1,66 @@
+import numpy as np
+from game import bitboard
+
+# Simulaciones aleatorias vectorizadas: muchas partidas avanzan a la vez, una jugada por paso, sobre arrays de bitboards (uint64).
+# Cada carril lleva (fichas del jugador activo, fichas del rival) y su jugador, y resuelve por su cuenta los pases y el final de partida.
+# Es la misma política que mcts_uct.default_policy_old (movimiento legal uniforme al azar), pero el coste de Python es por paso y no por partida
+
+FULL = np.uint64(bitboard.FULL)
+# Las 8 direcciones se procesan a la vez: los desplazamientos trabajan sobre arrays (8, carriles), una fila por dirección
+LEFT = np.array([amount > 0 for amount, _ in bitboard.SHIFTS])[:, None]
+AMOUNTS = np.array([abs(amount) for amount, _ in bitboard.SHIFTS], dtype=np.uint64)[:, None]
+MASKS = np.array([mask for _, mask in bitboard.SHIFTS], dtype=np.uint64)[:, None]
+SQUARES = np.uint64(1) << np.arange(64, dtype=np.uint64)  # Bit de cada casilla
+
+def shift(bits): # bitboard.shift en las 8 direcciones. bits tiene forma (8, carriles) o (carriles,), que se repite en cada dirección
+    return np.where(LEFT, bits << AMOUNTS, bits >> AMOUNTS) & MASKS
+
+def move_mask(own, opp): # bitboard.move_mask sobre arrays
+    line = shift(own) & opp
+    for _ in range(5):
+        line |= shift(line) & opp
+    return np.bitwise_or.reduce(shift(line) & ~(own | opp), axis=0)
+
+def flip_mask(own, opp, placed): # Fichas capturadas al poner en placed (un bit por carril, 0 si el carril no mueve)
+    line = shift(placed) & opp
+    for _ in range(5):  # Tramo contiguo de fichas del rival a partir de la casilla, en cada dirección
+        line |= shift(line) & opp
+    closed = (shift(line) & own) != 0  # Se captura sólo si el tramo termina en una ficha propia
+    return np.bitwise_or.reduce(np.where(closed, line, np.uint64(0)), axis=0)
+
+def popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).astype(np.int64)
+    return np.unpackbits(bits.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1).astype(np.int64)
+
+def random_moves(moves, rng): # Un bit elegido uniformemente entre los movimientos legales de cada carril (0 si no hay ninguno)
+    legal = np.unpackbits(moves.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little').astype(bool)
+    scores = np.where(legal, rng.random(legal.shape), -1.0)  # El máximo de valores aleatorios sobre las casillas legales es uniforme
+    chosen = SQUARES[scores.argmax(axis=1)]
+    return np.where(moves != 0, chosen, np.uint64(0))
+
+def playouts(positions, players, root_player, rng=None): # Juega al azar hasta el final desde cada (posición, jugador). Devuelve la recompensa de cada una para root_player
+    rng = rng or np.random.default_rng(np.random.randint(2**31))  # Semilla a partir del generador global, para respetar np.random.seed
+    white = np.array([position[0] for position in positions], dtype=np.uint64)
+    black = np.array([position[1] for position in positions], dtype=np.uint64)
+    player = np.asarray(players, dtype=np.int64)
+    own = np.where(player == bitboard.WHITE, white, black)
+    opp = np.where(player == bitboard.WHITE, black, white)
+    passes = np.zeros(len(player), dtype=np.int64)
+    active = (own | opp) != FULL
+
+    while active.any():
+        moves = move_mask(own, opp)
+        placed = random_moves(moves, rng)
+        flipped = flip_mask(own, opp, placed)
+        passes = np.where(moves != 0, 0, passes + 1)
+        # Todos los carriles activos cambian de turno: con movimiento se aplica, y sin él es un pase
+        new_own = np.where(active, opp & ~flipped, own)
+        new_opp = np.where(active, own | flipped | placed, opp)
+        player = np.where(active, 3 - player, player)
+        own, opp = new_own, new_opp
+        active &= ((own | opp) != FULL) & (passes < 2)
+
+    own_count, opp_count = popcount(own), popcount(opp)
+    sign = np.where(player == root_player, 1, -1)  # own son las fichas de player
+    return np.sign(own_count - opp_count) * sign
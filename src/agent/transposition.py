@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+class TranspositionTable: # Tabla de transposiciones para MCTS: hash Zobrist de (posición, jugador) -> nodo compartido del árbol
+    # Tamaño acotado con expulsión LRU: al superar capacity se olvida la entrada usada hace más tiempo. El nodo sigue en el árbol, pero deja de compartirse.
+    # Al expulsarlo también se cortan los enlaces parent de sus hijos hacia él: si no, un nodo aún en la tabla mantendría vivo a través de parent
+    # el árbol de jugadas anteriores, y la tabla no limitaría la memoria. Con tabla la retropropagación sigue el camino recorrido, así que parent
+    # sólo sirve para propagar los resultados del solver de finales, que se detiene en el hijo cortado
+    def __init__(self, capacity=200000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.evaluations_saved = 0  # Evaluaciones (red neuronal o simulación) evitadas al reutilizar estadísticas ya existentes
+
+    def get(self, key):
+        self.lookups += 1
+        node = self.entries.get(key)
+        if node is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)  # Marca la entrada como usada recientemente
+        return node
+
+    def put(self, key, node):
+        self.entries[key] = node
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            _, node = self.entries.popitem(last=False)  # Expulsa la entrada menos usada recientemente
+            detach(node)
+            self.evictions += 1
+
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def counters(self): # Contadores acumulados, para calcular lo que corresponde a cada búsqueda, como EvaluationCache.counters
+        return {"table_lookups": self.lookups, "table_hits": self.hits, "evaluations_saved": self.evaluations_saved}
+
+    def stats(self): # Contadores para mostrar o guardar junto al resto de estadísticas
+        return {
+            "size": len(self.entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "evictions": self.evictions,
+            "evaluations_saved": self.evaluations_saved,
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+def detach(node): # Corta los enlaces de los hijos hacia el nodo, para que el nodo (y lo que cuelga de él) se libere en cuanto deje de estar en el árbol
+    for child in node.children:
+        if child.parent is node:
+            child.parent = None
+
+def merge(records): # Suma los contadores de la tabla de las estadísticas de varias búsquedas (las que no usaron tabla no cuentan)
+    total = {"table_lookups": 0, "table_hits": 0, "evaluations_saved": 0}
+    for record in records:
+        for name in total:
+            total[name] += record.get(name, 0)
+    return total
+
+def format_stats(total): # Texto del resumen de merge
+    rate = total["table_hits"] / total["table_lookups"] if total["table_lookups"] else 0.0
+    return f"Tabla de transposiciones: {total['table_lookups']} consultas, {total['table_hits']} aciertos ({rate * 100:.1f}%), {total['evaluations_saved']} evaluaciones ahorradas"
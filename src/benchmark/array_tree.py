@@ -0,0 +1,64 @@
+import argparse
+import random
+import time
+import tracemalloc
+from game import bitboard
+from agent import mcts_uct, array_tree
+from benchmark.batched_search import positions
+
+# Compara el árbol de objetos MCTSNode con el árbol de arrays de agent.array_tree: memoria (medida con tracemalloc, que también cuenta los
+# arrays de NumPy) e iteraciones por segundo construyendo sólo el árbol, con recompensas aleatorias para no medir la evaluación, y
+# después iteraciones por segundo de mcts_uct completo con simulaciones aleatorias
+
+def build_nodes(position, player, iterations): # Árbol de objetos tras iterations iteraciones. Devuelve (árbol, nodos)
+    root = mcts_uct.MCTSNode(position, player)
+    for _ in range(iterations):
+        mcts_uct.tree_policy(root, mcts_uct.c).backup(random.uniform(-1, 1))
+    return root, mcts_uct.tree_stats(root)[0]
+
+def build_array(position, player, iterations, capacity): # Lo mismo con el árbol de arrays. Los hijos reservados aún sin crear no cuentan como nodos
+    tree = array_tree.ArrayTree(capacity)
+    root = tree.add_root(position, player)
+    for _ in range(iterations):
+        tree.backup(array_tree.tree_policy(tree, root, mcts_uct.c), random.uniform(-1, 1))
+    return tree, int(tree.created[:tree.size].sum()) + 1
+
+def measure(build, *args): # (iteraciones por segundo, MB en memoria al terminar, nodos). La velocidad se mide sin tracemalloc, que la reduce mucho
+    random.seed(0)
+    start = time.perf_counter()
+    build(*args)
+    elapsed = time.perf_counter() - start
+    random.seed(0)
+    tracemalloc.start()
+    tree, nodes = build(*args)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return args[2] / elapsed, memory / 2 ** 20, nodes
+
+def search_speed(tests, iterations, tree, capacity): # Iteraciones por segundo de mcts_uct sin red sobre las posiciones de prueba
+    random.seed(0)
+    start = time.perf_counter()
+    for board, player in tests:
+        mcts_uct.mcts_uct(board, player, iterations=iterations, neural=False, tree=tree, capacity=capacity)
+    return iterations * len(tests) / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, nargs="+", default=[2000, 10000, 50000], help="Iteraciones al construir el árbol")
+    parser.add_argument("--capacity", type=int, default=array_tree.DEFAULT_CAPACITY, help="Nodos del árbol de arrays")
+    parser.add_argument("--search-iterations", type=int, default=1000, help="Iteraciones de mcts_uct por posición en la búsqueda completa")
+    args = parser.parse_args()
+
+    position, player = bitboard.create_position(), bitboard.BLACK
+    print(f"{'iteraciones':>11} {'árbol':>7} {'iter/s':>9} {'MB':>8} {'nodos':>8} {'bytes/nodo':>10}")
+    for iterations in args.iterations:
+        for name, build, extra in (("objetos", build_nodes, ()), ("arrays", build_array, (args.capacity,))):
+            speed, memory, nodes = measure(build, position, player, iterations, *extra)
+            print(f"{iterations:>11} {name:>7} {speed:9.0f} {memory:8.2f} {nodes:8d} {memory * 2 ** 20 / nodes:10.0f}")
+    print(f"El árbol de arrays reserva {array_tree.ArrayTree(args.capacity).nbytes() / 2 ** 20:.1f} MB para {args.capacity} nodos al crearse")
+
+    tests = positions()
+    print()
+    for tree in mcts_uct.TREES:
+        print(f"mcts_uct con tree={tree!r}: {search_speed(tests, args.search_iterations, tree, args.capacity):.1f} iteraciones/s (simulaciones aleatorias)")
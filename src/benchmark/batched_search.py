@@ -0,0 +1,44 @@
+import argparse
+import random
+import time
+from game import othello
+from agent import mcts_uct
+
+# Compara nodos/segundo de mcts_uct con la red neuronal evaluando hoja a hoja (batch_size=1) y por lotes de K hojas
+
+def positions(count=4, seed=0): # Posiciones de prueba: la inicial y varias obtenidas con movimientos aleatorios
+    rng = random.Random(seed)
+    result = []
+    for plies in range(count):
+        board = othello.create_board()
+        player = othello.BLACK
+        for _ in range(plies * 6):
+            movs = othello.valid_movements(board, player)
+            if movs:
+                x, y = rng.choice(movs)
+                othello.apply_movement(board, x, y, player)
+            player = 3 - player
+        if not othello.valid_movements(board, player):
+            player = 3 - player
+        result.append((board, player))
+    return result
+
+def nodes_per_second(batch_size, iterations, tests): # Nodos expandidos por segundo para un tamaño de lote dado
+    mcts_uct.mcts_uct(tests[0][0], tests[0][1], iterations=batch_size, batch_size=batch_size) # Calentamiento, la primera llamada a la red es más lenta
+    start = time.perf_counter()
+    for board, player in tests:
+        mcts_uct.mcts_uct(board, player, iterations=iterations, batch_size=batch_size)
+    return iterations * len(tests) / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=400)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    tests = positions()
+    base = None
+    for batch_size in args.batch_sizes:
+        nps = nodes_per_second(batch_size, args.iterations, tests)
+        base = base or nps # La primera medida es la referencia (por defecto, el camino actual con batch_size=1)
+        print(f"batch_size={batch_size:4d}: {nps:9.1f} nodos/s (x{nps / base:.2f})")
@@ -0,0 +1,49 @@
+import argparse
+import random
+import time
+from game import bitboard
+from agent import endgame
+
+# Mide el tiempo del solver de finales según el número de casillas vacías, sobre posiciones de partidas aleatorias,
+# para elegir el umbral de EndgameSolver (a partir de cuántas vacías mcts_uct deja de simular y resuelve)
+
+def random_position(empties): # Juega movimientos aleatorios desde el inicio hasta dejar empties casillas vacías con el jugador activo pudiendo mover
+    while True:
+        position, player = bitboard.create_position(), bitboard.BLACK
+        while 64 - (position[0] | position[1]).bit_count() > empties:
+            moves = bitboard.valid_movements(position, player)
+            if not moves:
+                player = 3 - player
+                if not bitboard.valid_movements(position, player):
+                    break  # Partida terminada antes de llegar a las vacías pedidas
+                continue
+            x, y = random.choice(moves)
+            position = bitboard.apply_movement(position, x, y, player)
+            player = 3 - player
+        if 64 - (position[0] | position[1]).bit_count() == empties and bitboard.valid_movements(position, player):
+            return position, player
+
+def measure(empties, positions, exact): # Devuelve (segundos medios por posición, máximo, nodos por segundo)
+    times = []
+    nodes = 0
+    for _ in range(positions):
+        position, player = random_position(empties)
+        solver = endgame.EndgameSolver(empties)  # Solver nuevo en cada posición, para no aprovechar la tabla de la anterior
+        start = time.perf_counter()
+        solver.solve(position, player, exact)
+        times.append(time.perf_counter() - start)
+        nodes += solver.nodes
+    return sum(times) / len(times), max(times), nodes / sum(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--empties", type=int, nargs="+", default=[6, 8, 10, 12, 14])
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--exact", action="store_true", help="Diferencia exacta de fichas en lugar de victoria/empate/derrota")
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'vacías':>7} {'media (s)':>10} {'máx (s)':>10} {'nodos/s':>10}")
+    for empties in args.empties:
+        mean, worst, speed = measure(empties, args.positions, args.exact)
+        print(f"{empties:>7} {mean:>10.4f} {worst:>10.4f} {speed:>10.0f}")
@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+from game import bitboard
+from agent import mcts_uct
+
+# Compara cuántas veces se generan movimientos (llamadas a bitboard.move_mask) por iteración de MCTS
+# con el estado cacheado en MCTSNode frente al comportamiento anterior, que lo recalculaba en cada paso del árbol
+
+class UncachedNode: # Nodo tal y como era antes de cachear el estado: is_terminal y los movimientos legales se recalculan en cada consulta
+    def __init__(self, state, player, parent=None, action=None):
+        self.state = state
+        self.player = player
+        self.parent = parent
+        self.action = action
+        self.children = []
+        self.visits = 0
+        self.total_reward = 0
+        self.not_explored = None
+
+    def is_terminal(self):
+        return bitboard.is_game_finished(self.state)
+
+    def expand(self):
+        if self.not_explored is None:
+            self.not_explored = bitboard.valid_movements(self.state, self.player)
+        action = self.not_explored.pop()
+        child = UncachedNode(bitboard.apply_movement(self.state, action[0], action[1], self.player), 3 - self.player, parent=self, action=action)
+        self.children.append(child)
+        return child
+
+    def is_totally_expanded(self):
+        if self.not_explored is None:
+            self.not_explored = bitboard.valid_movements(self.state, self.player)
+        return len(self.not_explored) == 0
+
+    best_child = mcts_uct.MCTSNode.best_child
+    backup = mcts_uct.MCTSNode.backup
+
+def tree_policy_uncached(node, c): # tree_policy anterior a la caché
+    while not node.is_terminal():
+        movs = bitboard.valid_movements(node.state, node.player)
+        if not movs:
+            pass_turn_child = next((child for child in node.children if child.action is None), None)
+            if pass_turn_child is not None:
+                node = pass_turn_child
+                continue
+            child = UncachedNode(node.state, 3 - node.player, parent=node, action=None)
+            node.children.append(child)
+            return child
+        if not node.is_totally_expanded():
+            return node.expand()
+        node = node.best_child(c)
+    return node
+
+def profile(root, policy, iterations): # Devuelve (llamadas a move_mask por iteración, segundos). La evaluación es aleatoria para medir sólo el árbol
+    calls = [0]
+    original = bitboard.move_mask
+    def counted(own, opp):
+        calls[0] += 1
+        return original(own, opp)
+    bitboard.move_mask = counted
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            policy(root, mcts_uct.c).backup(random.uniform(-1, 1))
+        elapsed = time.perf_counter() - start
+    finally:
+        bitboard.move_mask = original
+    return calls[0] / iterations, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    position = bitboard.create_position()
+    random.seed(0)
+    before, before_time = profile(UncachedNode(position, bitboard.BLACK), tree_policy_uncached, args.iterations)
+    random.seed(0)
+    after, after_time = profile(mcts_uct.MCTSNode(position, bitboard.BLACK), mcts_uct.tree_policy, args.iterations)
+    print(f"Sin caché: {before:.2f} llamadas a move_mask por iteración, {before_time:.2f} s")
+    print(f"Con caché: {after:.2f} llamadas a move_mask por iteración, {after_time:.2f} s")
+    print(f"Eliminadas: {before - after:.2f} llamadas por iteración ({(1 - after / before) * 100:.1f}%)")
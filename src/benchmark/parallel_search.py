@@ -0,0 +1,61 @@
+import argparse
+from game import othello
+from agent import mcts_uct, parallel_mcts
+from benchmark.batched_search import positions
+
+# Compara la búsqueda en paralelo (raíz o árbol) con mcts_uct en serie, dando a ambas el mismo tiempo por jugada:
+# rendimiento en nodos/segundo y fuerza jugando partidas entre ellas
+
+def throughput(mode, workers, time_limit, neural, tests, pool): # Nodos por segundo medios sobre las posiciones de prueba
+    total_nodes = total_time = 0
+    for board, player in tests:
+        if mode == "serial":
+            _, stats = mcts_uct.mcts_uct(board, player, iterations=None, neural=neural, time_limit=time_limit, return_stats=True)
+        else:
+            _, stats = parallel_mcts.parallel_mcts(board, player, iterations=None, neural=neural, workers=workers, mode=mode, time_limit=time_limit, pool=pool, return_stats=True)
+        total_nodes += stats["iterations"]
+        total_time += stats["seconds"]
+    return total_nodes / total_time
+
+def play_game(parallel_player, mode, workers, time_limit, neural, pool): # Partida entre la búsqueda paralela (con el color parallel_player) y la serie
+    board = othello.create_board()
+    player = othello.BLACK
+    skipped_turns = 0
+    while not othello.is_board_full(board) and skipped_turns < 2:
+        if not othello.valid_movements(board, player):
+            skipped_turns += 1
+            player = 3 - player
+            continue
+        skipped_turns = 0
+        if player == parallel_player:
+            mov = parallel_mcts.parallel_mcts(board, player, iterations=None, neural=neural, workers=workers, mode=mode, time_limit=time_limit, pool=pool)
+        else:
+            mov = mcts_uct.mcts_uct(board, player, iterations=None, neural=neural, time_limit=time_limit)
+        othello.apply_movement(board, mov[0], mov[1], player)
+        player = 3 - player
+    return othello.get_winner(board)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--time-limit", type=int, default=500, help="milisegundos por jugada")
+    parser.add_argument("--games", type=int, default=4, help="partidas por modo, alternando colores")
+    parser.add_argument("--neural", action="store_true")
+    args = parser.parse_args()
+
+    tests = positions()
+    with parallel_mcts.create_pool(args.workers) as pool:
+        serial = throughput("serial", 1, args.time_limit, args.neural, tests, pool)
+        print(f"serie: {serial:9.1f} nodos/s")
+        for mode in ("root", "tree"):
+            nps = throughput(mode, args.workers, args.time_limit, args.neural, tests, pool)
+            print(f"{mode:5s}: {nps:9.1f} nodos/s (x{nps / serial:.2f}) con {args.workers} workers")
+
+        for mode in ("root", "tree"):
+            wins = draws = 0
+            for game in range(args.games):
+                parallel_player = othello.BLACK if game % 2 == 0 else othello.WHITE
+                winner = play_game(parallel_player, mode, args.workers, args.time_limit, args.neural, pool)
+                wins += winner == parallel_player
+                draws += winner == 0
+            print(f"{mode:5s} contra serie: {wins} victorias, {draws} empates, {args.games - wins - draws} derrotas")
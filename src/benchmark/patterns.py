@@ -0,0 +1,73 @@
+import os
+import time
+import random
+import argparse
+from multiprocessing import Pool
+import numpy as np
+from game import arena
+from agent import mcts_uct, evaluator, patterns
+from agent.model import encoding
+from data import dataset
+from benchmark.batched_search import positions
+
+# Compara el evaluador por patrones (agent.patterns) con la red: posiciones evaluadas por segundo según el tamaño del batch,
+# iteraciones de mcts_uct por segundo, error cuadrático medio en la validación del conjunto de datos, y fuerza en parejas de
+# partidas con las mismas iteraciones por jugada y con el mismo tiempo por jugada
+
+def throughput(model, batch_size, repeats): # Posiciones evaluadas por segundo, como bench_evaluator de benchmark.suite
+    rng = np.random.default_rng(0)
+    inputs = encoding.convert_board_states(rng.integers(0, 3, size=(batch_size, 8, 8)), rng.integers(1, 3, size=batch_size))
+    model.evaluate(inputs)  # Calentamiento
+    begin = time.perf_counter()
+    for _ in range(repeats):
+        model.evaluate(inputs)
+    return batch_size * repeats / (time.perf_counter() - begin)
+
+def search_speed(model, iterations): # Iteraciones por segundo de mcts_uct sobre las posiciones fijas de benchmark.batched_search
+    evaluator.set_evaluator(model)
+    random.seed(0)
+    total_iterations = total_time = 0
+    for board, player in positions():
+        _, stats = mcts_uct.mcts_uct(board, player, iterations=iterations, return_stats=True)
+        total_iterations += stats["iterations"]
+        total_time += stats["seconds"]
+    return total_iterations / total_time
+
+def match(first, second, pairs, processes, opening_plies, seed): # Puntuación media de first contra second en pairs parejas de partidas
+    with Pool(processes=processes) as pool:
+        pair_scores = pool.map(arena.play_pair_task, [(first, second, opening_plies, seed + i) for i in range(pairs)])
+    return sum(sum(scores) for scores in pair_scores) / (2 * pairs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["keras", "numpy"], default="keras", help="Motor de la red con la que se compara")
+    parser.add_argument("--model", default=None, help="Modelo de la red (por defecto el del backend)")
+    parser.add_argument("--patterns", default=patterns.PATTERNS_ROUTE, help="Tablas de patrones (python -m agent.patterns)")
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE, help="Conjunto de datos para el error en validación")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200, help="Iteraciones por jugada, en la medida de mcts_uct y en las partidas a iteraciones iguales")
+    parser.add_argument("--time", type=int, default=500, help="Milisegundos por jugada en las partidas a tiempo igual")
+    parser.add_argument("--pairs", type=int, default=20, help="Parejas de partidas de cada enfrentamiento (0 para no jugarlas)")
+    parser.add_argument("--processes", type=int, default=max((os.cpu_count() or 2) - 1, 1))
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.pairs:  # Antes de cargar los modelos en este proceso, para que los procesos de las partidas no hereden TensorFlow ya iniciado
+        seed = random.getrandbits(32) if args.seed is None else args.seed
+        network = dict(model=args.model, backend=args.backend)
+        table = dict(model=args.patterns, backend="patterns")
+        for budget, limits in ((f"{args.iterations} iteraciones", dict(iterations=args.iterations)), (f"{args.time} ms", dict(iterations=None, time_limit=args.time))):
+            score = match(arena.AgentConfig("Patrones", **table, **limits), arena.AgentConfig("Red", **network, **limits), args.pairs, args.processes, args.opening_plies, seed)
+            print(f"Patrones contra red con {budget} por jugada: {score * 100:5.1f}% ({arena.elo_from_score(score):+.0f} Elo)", flush=True)
+
+    models = {"red": evaluator.create_evaluator(args.backend, args.model), "patrones": evaluator.create_evaluator("patterns", args.patterns)}
+    for batch_size in args.batch_sizes:
+        speeds = {name: throughput(model, batch_size, args.repeats) for name, model in models.items()}
+        print(f"Batch {batch_size:4d}: red {speeds['red']:10.0f} posiciones/s, patrones {speeds['patrones']:10.0f} posiciones/s (x{speeds['patrones'] / speeds['red']:.1f})")
+    speeds = {name: search_speed(model, args.iterations) for name, model in models.items()}
+    print(f"mcts_uct: red {speeds['red']:.0f} iteraciones/s, patrones {speeds['patrones']:.0f} iteraciones/s (x{speeds['patrones'] / speeds['red']:.1f})")
+    if os.path.exists(args.route):
+        errors = {name: patterns.validation_mse(model, args.route) for name, model in models.items()}
+        print(f"MSE en validación: red {errors['red']:.4f}, patrones {errors['patrones']:.4f}")
@@ -0,0 +1,43 @@
+import os
+import random
+import argparse
+from multiprocessing import Pool
+from game import arena
+
+# Mide cuántas iteraciones por jugada necesita la búsqueda PUCT con el modelo dual (agent.model.model con DUAL) para igualar
+# al agente actual (UCT con el modelo de sólo valor): juega parejas de partidas de PUCT, con cada número de iteraciones de la
+# escalera, contra UCT con un número fijo de iteraciones, y muestra la puntuación y la diferencia de Elo de cada escalón
+
+def ladder(dual_model, baseline_model, backend, baseline_iterations, steps, pairs, processes, opening_plies, seed): # Lista de (iteraciones, puntuación, Elo) de PUCT contra UCT
+    baseline = arena.AgentConfig("UCT", model=baseline_model, backend=backend, iterations=baseline_iterations)
+    results = []
+    with Pool(processes=processes) as pool:
+        for iterations in steps:
+            candidate = arena.AgentConfig("PUCT", model=dual_model, backend=backend, iterations=iterations, puct=True)
+            tasks = [(candidate, baseline, opening_plies, seed + i) for i in range(pairs)]  # Las mismas aperturas en cada escalón
+            pair_scores = pool.map(arena.play_pair_task, tasks)
+            score = sum(sum(scores) for scores in pair_scores) / (2 * pairs)
+            results.append((iterations, score, arena.elo_from_score(score)))
+            print(f"PUCT {iterations:5d} iteraciones contra UCT {baseline_iterations}: {score * 100:5.1f}% ({arena.elo_from_score(score):+.0f} Elo)", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dual-model", required=True, help="Modelo con cabeza de política")
+    parser.add_argument("--baseline-model", default=None, help="Modelo del agente actual (por defecto el del backend)")
+    parser.add_argument("--backend", choices=["keras", "numpy"], default="keras")
+    parser.add_argument("--baseline-iterations", type=int, default=400)
+    parser.add_argument("--ladder", type=int, nargs="+", default=[50, 100, 200, 400], help="Iteraciones de PUCT a probar")
+    parser.add_argument("--pairs", type=int, default=20, help="Parejas de partidas por escalón")
+    parser.add_argument("--processes", type=int, default=max((os.cpu_count() or 2) - 1, 1))
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    seed = random.getrandbits(32) if args.seed is None else args.seed
+    results = ladder(args.dual_model, args.baseline_model, args.backend, args.baseline_iterations, args.ladder, args.pairs, args.processes, args.opening_plies, seed)
+    matching = [iterations for iterations, score, _ in results if score >= 0.5]
+    if matching:
+        print(f"PUCT iguala al agente actual con {min(matching)} iteraciones por jugada, {args.baseline_iterations / min(matching):.1f} veces menos")
+    else:
+        print("Ningún escalón de PUCT iguala al agente actual")
@@ -0,0 +1,53 @@
+import argparse
+import random
+import time
+import numpy as np
+from game import bitboard
+from agent import mcts_uct, rollouts
+from benchmark.batched_search import positions
+
+# Compara las simulaciones aleatorias una a una (mcts_uct.default_policy_old) con el motor vectorizado de agent.rollouts,
+# primero en simulaciones por segundo según el número de carriles y después en iteraciones por segundo de mcts_uct sin red
+
+def scalar_speed(position, player, count): # Simulaciones por segundo jugando una partida tras otra
+    start = time.perf_counter()
+    for _ in range(count):
+        mcts_uct.default_policy_old(position, bitboard.BLACK, player)
+    return count / (time.perf_counter() - start)
+
+def vectorized_speed(position, player, lanes, repeats): # Simulaciones por segundo con lanes partidas avanzando a la vez
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rollouts.playouts([position] * lanes, [player] * lanes, bitboard.BLACK)
+    return lanes * repeats / (time.perf_counter() - start)
+
+def search_speed(tests, iterations, batch_size, rollouts_per_leaf): # (iteraciones por segundo, simulaciones por segundo) de mcts_uct sin red
+    start = time.perf_counter()
+    for board, player in tests:
+        mcts_uct.mcts_uct(board, player, iterations=iterations, neural=False, batch_size=batch_size, rollouts=rollouts_per_leaf)
+    elapsed = time.perf_counter() - start
+    return iterations * len(tests) / elapsed, iterations * rollouts_per_leaf * len(tests) / elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lanes", type=int, nargs="+", default=[1, 8, 32, 128, 512])
+    parser.add_argument("--playouts", type=int, default=2000, help="Simulaciones aproximadas por medida")
+    parser.add_argument("--iterations", type=int, default=200, help="Iteraciones de mcts_uct por posición")
+    parser.add_argument("--configs", nargs="+", default=["1x1", "16x1", "1x16", "16x4"], help="Configuraciones de búsqueda como batch_size x simulaciones por hoja")
+    args = parser.parse_args()
+
+    random.seed(0)
+    np.random.seed(0)
+    position, player = bitboard.create_position(), bitboard.BLACK
+    base = scalar_speed(position, player, max(args.playouts // 10, 1))
+    print(f"Una a una:        {base:9.1f} simulaciones/s")
+    for lanes in args.lanes:
+        speed = vectorized_speed(position, player, lanes, max(args.playouts // lanes, 1))
+        print(f"carriles={lanes:5d}: {speed:9.1f} simulaciones/s (x{speed / base:.2f})")
+
+    tests = positions()
+    print()
+    for config in args.configs:
+        batch_size, rollouts_per_leaf = (int(value) for value in config.split("x"))
+        iterations_speed, playouts_speed = search_speed(tests, args.iterations, batch_size, rollouts_per_leaf)
+        print(f"batch_size={batch_size:3d} simulaciones por hoja={rollouts_per_leaf:3d}: {iterations_speed:8.1f} iteraciones/s {playouts_speed:9.1f} simulaciones/s")
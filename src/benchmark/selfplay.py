@@ -0,0 +1,37 @@
+import os
+import time
+import random
+import argparse
+import numpy as np
+from game import game_generator, batched_selfplay
+from agent import evaluator
+
+# Compara las partidas de autojuego por hora del generador actual (game_generator.generate_data_parallel, una partida por
+# proceso con batches de 1) con game.batched_selfplay (muchas partidas en un proceso, con las hojas de todas evaluadas juntas)
+
+def pool_speed(games, iterations, processes, backend): # Partidas por hora con el Pool de game_generator
+    start = time.perf_counter()
+    game_generator.generate_data_parallel(game_generator.simulate_agent_vs_agent, num_games=games, iterations=iterations, processes=processes, backend=backend)
+    return games * 3600 / (time.perf_counter() - start)
+
+def batched_speed(games, iterations, concurrency, backend): # (partidas por hora, batch medio) con batched_selfplay
+    start = time.perf_counter()
+    _, stats = batched_selfplay.play(games, iterations, concurrency, backend)
+    return games * 3600 / (time.perf_counter() - start), stats["mean_batch"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=max((os.cpu_count() or 2) - 1, 1), help="Procesos del generador actual")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64], help="Partidas a la vez en batched_selfplay")
+    parser.add_argument("--backend", choices=evaluator.BACKENDS, default="keras")
+    args = parser.parse_args()
+
+    random.seed(0)
+    np.random.seed(0)
+    base = pool_speed(args.games, args.iterations, args.processes, args.backend)
+    print(f"Pool, {args.processes} procesos: {base:9.1f} partidas/hora")
+    for concurrency in args.concurrency:
+        speed, mean_batch = batched_speed(args.games, args.iterations, concurrency, args.backend)
+        print(f"Un proceso, {concurrency:3d} partidas a la vez: {speed:9.1f} partidas/hora (x{speed / base:.2f}), batch medio {mean_batch:.1f}")
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import numpy as np
+from game import othello, bitboard
+from agent import mcts_uct, evaluator
+from agent.model import encoding
+from benchmark.batched_search import positions
+
+# Conjunto de benchmarks para detectar regresiones de rendimiento: perft (generación y aplicación de movimientos),
+# iteraciones por segundo de mcts_uct, rendimiento del evaluador por tamaño de batch y partidas de autojuego por hora.
+# Los resultados se guardan en JSON como un diccionario plano nombre -> valor (mayor es mejor, salvo los recuentos de perft,
+# que deben coincidir exactamente) y se pueden comparar con los de una ejecución anterior guardada como referencia
+
+PERFT = {1: 4, 2: 12, 3: 56, 4: 244, 5: 1396, 6: 8200, 7: 55092, 8: 390216, 9: 3005288}  # Nodos hoja conocidos desde la posición inicial
+SECTIONS = ["perft", "mcts", "evaluator", "selfplay"]
+MIN_SECONDS = 0.2  # Las medidas muy cortas se repiten hasta durar al menos esto, para que el ruido del temporizador no domine
+
+def perft_array(board, player, depth, passed=False): # Perft con la API de game.othello (tableros de NumPy, copiando en cada movimiento)
+    if depth == 0:
+        return 1
+    movs = othello.valid_movements(board, player)
+    if not movs:
+        if passed:
+            return 1  # Ninguno puede mover: la partida termina antes de la profundidad pedida
+        return perft_array(board, 3 - player, depth - 1, True)  # El pase cuenta como una jugada
+    nodes = 0
+    for x, y in movs:
+        child = np.copy(board)
+        othello.apply_movement(child, x, y, player)
+        nodes += perft_array(child, 3 - player, depth - 1)
+    return nodes
+
+def perft_bitboard(position, player, depth, passed=False): # El mismo recuento con game.bitboard
+    if depth == 0:
+        return 1
+    movs = bitboard.valid_movements(position, player)
+    if not movs:
+        if passed:
+            return 1
+        return perft_bitboard(position, 3 - player, depth - 1, True)
+    if depth == 1:
+        return len(movs)  # No hace falta aplicar los movimientos para contarlos
+    return sum(perft_bitboard(bitboard.apply_movement(position, x, y, player), 3 - player, depth - 1) for x, y in movs)
+
+def timed(function, *args): # Ejecuta function(*args) las veces necesarias para durar MIN_SECONDS. Devuelve (resultado, segundos por ejecución)
+    runs = 0
+    begin = time.perf_counter()
+    while True:
+        result = function(*args)
+        runs += 1
+        elapsed = time.perf_counter() - begin
+        if elapsed >= MIN_SECONDS:
+            return result, elapsed / runs
+
+def bench_perft(max_depth, array_depth): # game.othello sólo hasta array_depth, por ser mucho más lento
+    results = {}
+    for depth in range(1, max_depth + 1):
+        for engine, function, start in (("othello", perft_array, othello.create_board()), ("bitboard", perft_bitboard, bitboard.create_position())):
+            if engine == "othello" and depth > array_depth:
+                continue
+            nodes, elapsed = timed(function, start, othello.BLACK, depth)
+            if depth in PERFT and nodes != PERFT[depth]:
+                raise RuntimeError(f"perft({depth}) con {engine} da {nodes} nodos, deberían ser {PERFT[depth]}")
+            results[f"perft.{engine}.{depth}.nodes"] = nodes
+            results[f"perft.{engine}.{depth}.nodes_per_second"] = nodes / elapsed
+    return results
+
+def bench_mcts(iterations, neural_modes): # Iteraciones por segundo de mcts_uct sobre las posiciones fijas de benchmark.batched_search
+    results = {}
+    tests = positions()
+    for neural in neural_modes:
+        if neural:
+            mcts_uct.mcts_uct(tests[0][0], tests[0][1], iterations=1)  # Calentamiento: carga del modelo
+        random.seed(0)
+        total_iterations = total_time = 0
+        for board, player in tests:
+            _, stats = mcts_uct.mcts_uct(board, player, iterations=iterations, neural=neural, return_stats=True)
+            total_iterations += stats["iterations"]
+            total_time += stats["seconds"]
+        results[f"mcts.{'neural' if neural else 'random'}.iterations_per_second"] = total_iterations / total_time
+    return results
+
+def bench_evaluator(backends, batch_sizes, repeats): # Posiciones evaluadas por segundo con cada motor y tamaño de batch
+    results = {}
+    rng = np.random.default_rng(0)
+    for backend in backends:
+        model = evaluator.create_evaluator(backend)
+        for batch_size in batch_sizes:
+            boards = rng.integers(0, 3, size=(batch_size, 8, 8))
+            inputs = encoding.convert_board_states(boards, rng.integers(1, 3, size=batch_size))
+            model.evaluate(inputs)  # Calentamiento
+            begin = time.perf_counter()
+            for _ in range(repeats):
+                model.evaluate(inputs)
+            results[f"evaluator.{backend}.{batch_size}.positions_per_second"] = batch_size * repeats / (time.perf_counter() - begin)
+    return results
+
+def bench_selfplay(games, iterations, backend): # Partidas completas de autojuego por hora, en un solo proceso, una a una y por batches
+    from game import game_generator, batched_selfplay  # Import diferido: sólo hace falta en esta sección
+    evaluator.use_backend(backend)
+    random.seed(0)
+    begin = time.perf_counter()
+    for _ in range(games):
+        game_generator.simulate_agent_vs_agent(iterations)
+    results = {f"selfplay.{backend}.{iterations}.games_per_hour": games * 3600 / (time.perf_counter() - begin)}
+    random.seed(0)
+    begin = time.perf_counter()
+    batched_selfplay.play(games, iterations, concurrency=games, backend=backend)  # Pasa por BatchingEvaluator, que necesita evaluate_policy
+    results[f"selfplay.{backend}.{iterations}.batched_games_per_hour"] = games * 3600 / (time.perf_counter() - begin)
+    return results
+
+def compare(results, baseline, tolerance): # Devuelve las líneas del informe y si hay alguna regresión respecto a baseline
+    lines = []
+    regression = False
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+        if name.endswith(".nodes"):
+            status = "ok" if value == reference else "DISTINTO"
+            regression |= value != reference
+            lines.append(f"{name:50s} {value:>14} {reference:>14} {status}")
+            continue
+        ratio = value / reference if reference else float("inf")
+        status = "REGRESIÓN" if ratio < 1 - tolerance else "mejora" if ratio > 1 + tolerance else "ok"
+        regression |= ratio < 1 - tolerance
+        lines.append(f"{name:50s} {value:>14.1f} {reference:>14.1f} x{ratio:.2f} {status}")
+    return lines, regression
+
+def machine(): # Datos del entorno, para no comparar resultados de máquinas distintas sin saberlo
+    return {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(), "numpy": np.__version__}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--perft-depth", type=int, default=7, help="Profundidad máxima de perft con bitboards (hasta 9)")
+    parser.add_argument("--perft-array-depth", type=int, default=6, help="Profundidad máxima de perft con la API de game.othello")
+    parser.add_argument("--iterations", type=int, default=400, help="Iteraciones de mcts_uct por posición")
+    parser.add_argument("--backends", nargs="+", choices=evaluator.BACKENDS, default=["keras"], help="Motores de inferencia a medir")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--repeats", type=int, default=20, help="Llamadas al evaluador por tamaño de batch")
+    parser.add_argument("--games", type=int, default=2, help="Partidas de autojuego")
+    parser.add_argument("--selfplay-iterations", type=int, default=100)
+    parser.add_argument("--no-neural", action="store_true", help="Omite todo lo que usa la red neuronal (sin modelo entrenado)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Pérdida relativa de rendimiento que se considera regresión")
+    args = parser.parse_args()
+
+    results = {}
+    if "perft" in args.sections:
+        results.update(bench_perft(args.perft_depth, args.perft_array_depth))
+    if "mcts" in args.sections:
+        results.update(bench_mcts(args.iterations, [False] if args.no_neural else [False, True]))
+    if "evaluator" in args.sections and not args.no_neural:
+        results.update(bench_evaluator(args.backends, args.batch_sizes, args.repeats))
+    if "selfplay" in args.sections and not args.no_neural:
+        for backend in args.backends:
+            results.update(bench_selfplay(args.games, args.selfplay_iterations, backend))
+
+    for name, value in results.items():
+        print(f"{name:50s} {value:>14.1f}" if isinstance(value, float) else f"{name:50s} {value:>14}")
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine(), "arguments": vars(args), "results": results}, f, indent=1)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regression = compare(results, baseline["results"], args.tolerance)
+        print(f"\nComparación con {args.baseline} ({baseline['timestamp']}):")
+        print("\n".join(lines))
+        sys.exit(1 if regression else 0)  # Código de salida distinto de cero si hay regresiones, para usarlo en scripts
@@ -0,0 +1,55 @@
+import argparse
+import gc
+import random
+import time
+from game import othello
+from agent import mcts_uct, transposition
+
+# Compara una partida de autojuego con árboles independientes por orden de jugadas y con una tabla de transposiciones por jugador:
+# iteraciones por segundo, aciertos de la tabla, evaluaciones ahorradas, expulsiones y nodos del árbol vivos en memoria.
+# Los nodos vivos se cuentan tras cada jugada, así que con una tabla pequeña se ve que las expulsiones acotan la memoria
+
+def live_nodes(): # Nodos de MCTS que siguen en memoria
+    gc.collect()
+    return sum(isinstance(obj, mcts_uct.MCTSNode) for obj in gc.get_objects())
+
+def play(iterations, neural, table_size, seed=0): # Juega una partida. Devuelve (iteraciones por segundo, máximo de nodos vivos, contadores sumados de las tablas)
+    random.seed(seed)
+    tables = {color: transposition.TranspositionTable(table_size) if table_size else None for color in (othello.WHITE, othello.BLACK)}
+    searches = {color: mcts_uct.MCTSSearch(iterations=iterations, neural=neural, table=tables[color]) for color in tables}
+    board, player = othello.create_board(), othello.BLACK
+    skipped_turns = 0
+    done = seconds = peak = 0
+    while not othello.is_board_full(board) and skipped_turns < 2:
+        if not othello.valid_movements(board, player):
+            skipped_turns += 1
+            player = 3 - player
+            for search in searches.values():
+                search.advance(None)
+            continue
+        skipped_turns = 0
+        move = searches[player].search(board, player)
+        done += searches[player].stats["iterations"]
+        seconds += searches[player].stats["seconds"]
+        othello.apply_movement(board, move[0], move[1], player)
+        for search in searches.values():
+            search.advance(move)
+        player = 3 - player
+        peak = max(peak, live_nodes())
+    counters = transposition.merge(table.counters() for table in tables.values() if table is not None)
+    counters["evictions"] = sum(table.evictions for table in tables.values() if table is not None)
+    return done / seconds, peak, counters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000, help="Iteraciones de mcts_uct por jugada")
+    parser.add_argument("--table", type=int, nargs="+", default=[200000, 5000], help="Entradas de la tabla de cada jugador (una partida por valor)")
+    parser.add_argument("--neural", action="store_true", help="Evalúa las hojas con la red en lugar de simulaciones aleatorias")
+    args = parser.parse_args()
+
+    speed, peak, _ = play(args.iterations, args.neural, None)
+    print(f"Sin tabla:            {speed:9.1f} iteraciones/s, {peak:8d} nodos vivos como máximo")
+    for table_size in args.table:
+        speed, peak, counters = play(args.iterations, args.neural, table_size)
+        print(f"Tabla de {table_size:8d}: {speed:9.1f} iteraciones/s, {peak:8d} nodos vivos como máximo, {counters['evictions']} expulsiones")
+        print(f"    {transposition.format_stats(counters)}")
@@ -0,0 +1,52 @@
+import numpy as np
+from data import dataset
+from agent.model.encoding import symmetry
+
+# Compactación del conjunto de entrenamiento: las posiciones repetidas (la apertura y muchas del principio de la partida aparecen
+# miles de veces) se agrupan en una sola fila con el resultado medio y el número de apariciones, que puede usarse como peso.
+# Dos posiciones se consideran la misma si coinciden el jugador activo y el tablero salvo giro o reflejo
+
+def canonical(white, black): # Representante canónico de cada posición: la menor (blancas, negras) de sus 8 simetrías
+    boards = dataset.unpack_boards(white, black)
+    best_white, best_black = dataset.pack_boards(boards)
+    for k in range(1, 8):
+        sym_white, sym_black = dataset.pack_boards(symmetry(boards, k))
+        better = (sym_white < best_white) | ((sym_white == best_white) & (sym_black < best_black))
+        best_white = np.where(better, sym_white, best_white)
+        best_black = np.where(better, sym_black, best_black)
+    return best_white, best_black
+
+def compact(source_route=dataset.DATASET_ROUTE, target_route=dataset.COMPACT_ROUTE): # Crea el conjunto compactado a partir del original. Devuelve (muestras, filas)
+    keys = []
+    totals = []
+    first_games = []
+    for records in dataset.Dataset(source_route).chunks():  # Se lee por bloques. Sólo se guardan las claves canónicas, no los tableros
+        key = np.zeros(len(records), dtype=[("white", "<u8"), ("black", "<u8"), ("player", "u1")])
+        key["white"], key["black"] = canonical(records["white"], records["black"])
+        key["player"] = records["player"]
+        keys.append(key)
+        totals.append(np.asarray(records["result"], dtype=np.float64))
+        first_games.append(np.asarray(records["game"]))
+    if not keys:
+        return 0, 0
+    keys = np.concatenate(keys)
+    totals = np.concatenate(totals)
+    first_games = np.concatenate(first_games)
+
+    unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    compacted = np.zeros(len(unique), dtype=dataset.COMPACT_RECORD)
+    compacted["white"], compacted["black"], compacted["player"] = unique["white"], unique["black"], unique["player"]
+    compacted["result"] = np.bincount(inverse, weights=totals, minlength=len(unique)) / counts  # Resultado medio para el jugador activo
+    compacted["count"] = counts
+    game = np.full(len(unique), np.iinfo(np.uint32).max, dtype=np.uint32)
+    np.minimum.at(game, inverse, first_games)  # Primera partida en la que aparece, para la división entrenamiento/validación
+    compacted["game"] = game
+
+    target = dataset.Dataset(target_route, format="compact")
+    target.clear()
+    target.append_records(compacted)
+    return len(keys), len(compacted)
+
+if __name__ == "__main__":
+    samples, rows = compact()
+    print(f"{samples} muestras compactadas en {rows} posiciones distintas (ratio {samples / max(rows, 1):.2f}x) en {dataset.COMPACT_ROUTE}")
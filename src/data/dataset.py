@@ -0,0 +1,160 @@
+import os
+import json
+import numpy as np
+
+# Formato binario para los datos de entrenamiento. Cada muestra es un registro de 23 bytes con la posición empaquetada en dos
+# bitboards, el jugador activo, el resultado de la partida para él, el identificador de la partida y el número de jugada.
+# Los datos se guardan en un directorio con ficheros (shards) que sólo se añaden, nunca se reescriben, y un índice index.json.
+# Cada shard contiene partidas completas y se lee con np.memmap, sin cargarlo entero en memoria
+
+RECORD = np.dtype([("white", "<u8"), ("black", "<u8"), ("player", "u1"), ("result", "i1"), ("game", "<u4"), ("ply", "u1")])
+# Formato del conjunto compactado (ver data.compaction): una fila por posición canónica, con el resultado medio y el número de apariciones
+COMPACT_RECORD = np.dtype([("white", "<u8"), ("black", "<u8"), ("player", "u1"), ("result", "<f4"), ("count", "<u4"), ("game", "<u4")])
+FORMATS = {"samples": RECORD, "compact": COMPACT_RECORD}
+# Objetivo de la cabeza de política (opcional): distribución de las visitas de la raíz sobre las 64 casillas de la búsqueda hecha en
+# cada posición, en un fichero aparte por shard con una fila por registro (todo ceros si en esa posición no se buscó)
+POLICY_DTYPE = np.dtype("<f2")
+
+base_route = os.path.dirname(os.path.abspath(__file__))
+DATASET_ROUTE = os.path.join(base_route, "training_data")
+COMPACT_ROUTE = os.path.join(base_route, "training_data_compact")
+PICKLE_ROUTE = os.path.join(base_route, "training_data.pkl")
+INDEX_NAME = "index.json"
+
+def pack_boards(boards): # (N, 8, 8) tableros de game.othello -> (blancas, negras) como arrays de uint64
+    flat = np.asarray(boards).reshape(-1, 64)
+    white = np.packbits(flat == 1, axis=1, bitorder='little').view('<u8').ravel()
+    black = np.packbits(flat == 2, axis=1, bitorder='little').view('<u8').ravel()
+    return white, black
+
+def unpack_boards(white, black): # Operación inversa de pack_boards: devuelve (N, 8, 8) con 0 vacía, 1 blanca y 2 negra
+    white_bits = np.unpackbits(np.ascontiguousarray(white, dtype='<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    black_bits = np.unpackbits(np.ascontiguousarray(black, dtype='<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return (white_bits + 2 * black_bits).reshape(-1, 8, 8).astype(int)
+
+def game_starts(white, black): # Índices donde empieza cada partida. Cada jugada añade una ficha, así que una partida nueva es la que no tiene más fichas que la muestra anterior
+    discs = np.bitwise_count(white | black) if hasattr(np, "bitwise_count") else np.array([int(w | b).bit_count() for w, b in zip(white, black)])
+    discs = discs.astype(np.int64)
+    return np.flatnonzero(np.concatenate(([True], discs[1:] <= discs[:-1])))
+
+def to_records(samples, first_game=0): # Lista de (estado, jugador, resultado) como la de generate_data_parallel -> array de RECORD. Ignora la política si la hay
+    records = np.zeros(len(samples), dtype=RECORD)
+    if not len(samples):
+        return records
+    states, players, results = list(zip(*samples))[:3]
+    records["white"], records["black"] = pack_boards(np.stack(states))
+    records["player"] = players
+    records["result"] = results
+    starts = game_starts(records["white"], records["black"])
+    game = np.zeros(len(samples), dtype=np.int64)
+    game[starts[1:]] = 1
+    game = np.cumsum(game)
+    records["game"] = first_game + game
+    records["ply"] = np.arange(len(samples)) - starts[game]  # Posición de la muestra dentro de su partida
+    return records
+
+class Dataset:
+    def __init__(self, route=DATASET_ROUTE, format="samples"): # format: "samples" (RECORD) o "compact" (COMPACT_RECORD). Si el índice ya existe, manda el suyo
+        self.route = route
+        self.index_route = os.path.join(route, INDEX_NAME)
+        if os.path.exists(self.index_route):
+            with open(self.index_route) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"format": format, "shards": [], "samples": 0, "games": 0}
+        self.dtype = FORMATS[self.index.get("format", "samples")]
+
+    def __len__(self):
+        return self.index["samples"]
+
+    def save_index(self): # Escritura atómica del índice: un fallo a mitad nunca deja un índice corrupto
+        temporary = self.index_route + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(temporary, self.index_route)
+
+    def append(self, samples): # Añade las muestras (partidas completas) como un shard nuevo. Devuelve el número de partidas añadidas
+        # Las muestras pueden llevar un cuarto elemento con la distribución de visitas de la raíz (64 valores), que se guarda aparte
+        policy = np.stack([sample[3] for sample in samples]) if len(samples) and len(samples[0]) > 3 else None
+        return self.append_records(to_records(samples, first_game=self.index["games"]), policy)
+
+    def append_records(self, records, policy=None): # Añade un shard con registros ya en el formato del conjunto, y su política (N, 64) opcional
+        if not len(records):
+            return 0
+        os.makedirs(self.route, exist_ok=True)
+        name = f"shard-{len(self.index['shards']):05d}.bin"
+        records.tofile(os.path.join(self.route, name))
+        games = max(int(records["game"].max()) + 1 - self.index["games"], 0)
+        shard = {"file": name, "samples": len(records), "first_game": self.index["games"], "games": games}
+        if policy is not None:
+            shard["policy"] = name.replace(".bin", ".policy.bin")
+            np.asarray(policy, dtype=POLICY_DTYPE).tofile(os.path.join(self.route, shard["policy"]))
+        self.index["shards"].append(shard)
+        self.index["samples"] += len(records)
+        self.index["games"] += games
+        self.save_index()
+        return games
+
+    def clear(self): # Borra todos los shards (modo sobreescritura del generador). Los ficheros que ya no existen se saltan
+        for shard in self.index["shards"]:
+            for name in (shard["file"], shard.get("policy")):
+                if name is not None and os.path.exists(os.path.join(self.route, name)):
+                    os.remove(os.path.join(self.route, name))
+        self.index = {"format": self.index.get("format", "samples"), "shards": [], "samples": 0, "games": 0}
+        if os.path.exists(self.route):
+            self.save_index()
+
+    def shard(self, i): # Shard i como array de RECORD en memoria mapeada
+        return np.memmap(os.path.join(self.route, self.index["shards"][i]["file"]), dtype=self.dtype, mode="r")
+
+    def policy(self, i): # Política del shard i como array (N, 64) en memoria mapeada, o None si el shard no la tiene
+        shard = self.index["shards"][i]
+        if "policy" not in shard:
+            return None
+        return np.memmap(os.path.join(self.route, shard["policy"]), dtype=POLICY_DTYPE, mode="r").reshape(-1, 64)
+
+    def shards(self):
+        for i in range(len(self.index["shards"])):
+            yield self.shard(i)
+
+    def chunks(self, chunk_size=65536): # Recorre todas las muestras en bloques de como mucho chunk_size registros
+        for shard in self.shards():
+            for start in range(0, len(shard), chunk_size):
+                yield shard[start:start + chunk_size]
+
+    def load(self): # Todas las muestras como (tableros (N, 8, 8), jugadores, resultados). Sólo para conjuntos que caben en memoria
+        records = np.concatenate(list(self.shards())) if self.index["shards"] else np.zeros(0, dtype=self.dtype)
+        return unpack_boards(records["white"], records["black"]), records["player"].astype(int), records["result"]
+
+def summary(route=DATASET_ROUTE, chunk_size=65536): # Estadísticas calculadas recorriendo los shards por bloques, sin cargarlos enteros
+    dataset = Dataset(route)
+    results = {-1: 0, 0: 0, 1: 0}
+    lengths = {}  # Duración de partida (en muestras) -> número de partidas
+    for shard in dataset.shards():
+        for chunk in (shard[start:start + chunk_size] for start in range(0, len(shard), chunk_size)):
+            values, counts = np.unique(chunk["result"], return_counts=True)
+            for value, count in zip(values, counts):
+                results[int(value)] = results.get(int(value), 0) + int(count)
+        # Las partidas no se reparten entre shards, así que la longitud de cada una se obtiene contando sus muestras en el shard
+        _, game_lengths = np.unique(shard["game"], return_counts=True)
+        for length, count in zip(*np.unique(game_lengths, return_counts=True)):
+            lengths[int(length)] = lengths.get(int(length), 0) + int(count)
+    return {"samples": len(dataset), "games": dataset.index["games"], "shards": len(dataset.index["shards"]),
+            "results": results, "game_lengths": dict(sorted(lengths.items()))}
+
+def convert_pickle(pickle_route=PICKLE_ROUTE, route=DATASET_ROUTE, chunk_size=100000): # Convierte un training_data.pkl del formato anterior
+    import pandas as pd
+    df = pd.read_pickle(pickle_route)
+    dataset = Dataset(route)
+    starts = game_starts(*pack_boards(np.stack(df["state"].to_list())))
+    boundaries = list(starts) + [len(df)]
+    start = 0
+    for end in boundaries[1:]:  # Agrupa partidas completas en shards de unas chunk_size muestras
+        if end - start >= chunk_size or end == len(df):
+            dataset.append(list(zip(df["state"].iloc[start:end], df["player"].iloc[start:end], df["result"].iloc[start:end])))
+            start = end
+    return dataset
+
+if __name__ == "__main__":
+    dataset = convert_pickle()
+    print(f"Convertidas {len(dataset)} muestras de {dataset.index['games']} partidas a {DATASET_ROUTE}")
@@ -1,14 +1,15 @@
-import os
-import pickle
+from data import dataset
 
 if __name__ == "__main__":
-    
-    base_route = os.path.dirname(os.path.abspath(__file__)) # Obtener la ruta absoluta del script
-
-    data_route = os.path.join(base_route, "training_data.pkl")
-
-    # Abro el fichero con los datos y lo cargo
-    with open(data_route, 'rb') as f:
-        datos = pickle.load(f)
-
-    print(datos)
\ No newline at end of file
+    # Recorre los shards de datos en bloques, sin cargarlos enteros en memoria, y muestra estadísticas resumidas
+    stats = dataset.summary()
+
+    print(f"Muestras: {stats['samples']} | Partidas: {stats['games']} | Shards: {stats['shards']}")
+    total = max(stats["samples"], 1)
+    for result, name in [(1, "Victorias"), (0, "Empates"), (-1, "Derrotas")]:
+        count = stats["results"].get(result, 0)
+        print(f"{name} (para el jugador activo): {count} ({count / total * 100:.1f}%)")
+
+    print("Histograma de duración de partidas (jugadas: partidas):")
+    for length, count in stats["game_lengths"].items():
+        print(f"  {length:3d}: {count}")
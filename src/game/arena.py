@@ -0,0 +1,188 @@
+import math
+import random
+import argparse
+from multiprocessing import Pool
+from game import othello
+from agent import mcts_uct, evaluator, endgame
+
+# Arena para comparar dos configuraciones del agente (modelo, iteraciones o tiempo por jugada, con o sin red) sin generar datos
+# de entrenamiento. Las partidas se juegan por parejas: la misma apertura aleatoria dos veces, intercambiando los colores,
+# para que la ventaja de la apertura se compense. Los resultados se muestran según terminan, con una estimación de la diferencia
+# de Elo y su intervalo de confianza, y la comparación para en cuanto un test secuencial de razón de probabilidades (SPRT)
+# decide entre H0 (diferencia elo0) y H1 (diferencia elo1)
+
+PAIR_SCORES = [0.0, 0.25, 0.5, 0.75, 1.0]  # Puntuación media de first en una pareja según sus puntos (0 a 2)
+SPRT_PRIOR = 0.5  # Pseudo-parejas por resultado en el SPRT, que evita decisiones precipitadas con muy pocas partidas
+
+class AgentConfig:
+    def __init__(self, name, model=None, backend="keras", iterations=1000, time_limit=None, neural=True, solver=True, rollouts=1, puct=False):
+        # model: ruta del modelo (None para el de por defecto del backend) # solver: resolver los finales con EndgameSolver # rollouts: simulaciones aleatorias por hoja sin red
+        # puct: selección PUCT con la cabeza de política (model debe ser un modelo dual)
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.neural = neural
+        self.solver = solver
+        self.rollouts = rollouts
+        self.puct = puct
+
+    def __str__(self):
+        budget = f"{self.time_limit} ms" if self.time_limit is not None else f"{self.iterations} iteraciones"
+        return f"{self.name} ({'PUCT, ' if self.puct else ''}{'red ' + (self.model or self.backend) if self.neural else f'{self.rollouts} simulaciones aleatorias por hoja'}, {budget})"
+
+_models = {}  # (backend, ruta) -> evaluador, para cargar cada modelo una sola vez por proceso
+
+def model_for(config):
+    key = (config.backend, config.model)
+    if key not in _models:
+        _models[key] = evaluator.create_evaluator(config.backend, config.model)
+    return _models[key]
+
+def random_opening(plies, seed): # Lista de movimientos aleatorios desde la posición inicial. Se repite si la partida acabaría dentro de la apertura
+    rng = random.Random(seed)
+    while True:
+        board = othello.create_board()
+        player = othello.BLACK
+        moves = []
+        for _ in range(plies):
+            movs = othello.valid_movements(board, player)
+            if not movs:
+                break
+            mov = rng.choice(movs)
+            othello.apply_movement(board, mov[0], mov[1], player)
+            moves.append(mov)
+            player = 3 - player
+        if len(moves) == plies and not othello.is_game_finished(board):
+            return moves
+
+def play_game(black, white, opening): # Partida entre dos AgentConfig tras jugar los movimientos de la apertura. Devuelve el ganador (0 empate)
+    board = othello.create_board()
+    player = othello.BLACK
+    for mov in opening:
+        othello.apply_movement(board, mov[0], mov[1], player)
+        player = 3 - player
+    configs = {othello.BLACK: black, othello.WHITE: white}
+    searches = {color: mcts_uct.MCTSSearch(iterations=config.iterations, neural=config.neural, time_limit=config.time_limit,
+                                           solver=endgame.EndgameSolver() if config.solver else None, rollouts=config.rollouts, puct=config.puct) for color, config in configs.items()}
+    skipped_turns = 0
+    while not othello.is_board_full(board) and skipped_turns < 2:
+        if not othello.valid_movements(board, player):
+            skipped_turns += 1
+            player = 3 - player
+            for search in searches.values():
+                search.advance(None)
+            continue
+        skipped_turns = 0
+        if configs[player].neural:
+            evaluator.set_evaluator(model_for(configs[player]))  # Cada agente evalúa con su propio modelo
+        mov = searches[player].search(board, player)
+        othello.apply_movement(board, mov[0], mov[1], player)
+        for search in searches.values():
+            search.advance(mov)
+        player = 3 - player
+    return othello.get_winner(board)
+
+def play_pair(first, second, opening_plies, seed): # Dos partidas con la misma apertura y colores cambiados. Devuelve los puntos de first en cada una (1, 0.5 o 0)
+    opening = random_opening(opening_plies, seed)
+    random.seed(seed)
+    scores = []
+    for black, white in ((first, second), (second, first)):
+        winner = play_game(black, white, opening)
+        first_color = othello.BLACK if black is first else othello.WHITE
+        scores.append(0.5 if winner == 0 else 1.0 if winner == first_color else 0.0)
+    return scores
+
+def expected_score(elo): # Puntuación esperada con una diferencia de Elo dada
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)  # Evita el infinito con el 100% o el 0% de los puntos
+    return -400 * math.log10(1 / score - 1)
+
+def pair_statistics(pairs, prior=0.0): # Media y varianza de la puntuación media por pareja. Con aperturas emparejadas, la pareja es la muestra independiente
+    # prior: pseudo-parejas que se suman a cada uno de los 5 resultados posibles de una pareja (0, 0.25, 0.5, 0.75, 1), para que
+    # la varianza no sea cero cuando todas las parejas acaban igual
+    counts = [prior] * len(PAIR_SCORES)
+    for scores in pairs:
+        counts[round(sum(scores) * 2)] += 1
+    total = sum(counts)
+    mean = sum(count * score for count, score in zip(counts, PAIR_SCORES)) / total
+    variance = sum(count * (score - mean) ** 2 for count, score in zip(counts, PAIR_SCORES)) / total
+    return mean, variance
+
+def elo_interval(pairs, z=1.96): # (Elo estimado, límite inferior, límite superior) con un intervalo de confianza del 95%
+    mean, variance = pair_statistics(pairs)
+    margin = z * math.sqrt(variance / len(pairs))
+    return elo_from_score(mean), elo_from_score(mean - margin), elo_from_score(mean + margin)
+
+def sprt(pairs, elo0, elo1, alpha, beta): # SPRT generalizado (aproximación normal). Devuelve (LLR, cota inferior, cota superior)
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    mean, variance = pair_statistics(pairs, SPRT_PRIOR)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    llr = len(pairs) * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+    return llr, lower, upper
+
+def run(first, second, max_pairs=100, processes=2, opening_plies=4, elo0=0.0, elo1=50.0, alpha=0.05, beta=0.05, seed=None): # Enfrenta first contra second. Devuelve un resumen
+    seed = random.getrandbits(32) if seed is None else seed
+    tasks = [(first, second, opening_plies, seed + i) for i in range(max_pairs)]
+    pairs = []
+    wins = draws = losses = 0
+    decision = None
+    print(f"{first} contra {second}")
+    with Pool(processes=processes) as pool:
+        for scores in pool.imap_unordered(play_pair_task, tasks):  # Cada pareja se procesa en cuanto termina, sin esperar al resto
+            pairs.append(scores)
+            wins += scores.count(1.0)
+            draws += scores.count(0.5)
+            losses += scores.count(0.0)
+            elo, low, high = elo_interval(pairs)
+            llr, lower, upper = sprt(pairs, elo0, elo1, alpha, beta)
+            print(f"Parejas {len(pairs):4d} | +{wins} ={draws} -{losses} | Elo {elo:+7.1f} [{low:+7.1f}, {high:+7.1f}] | LLR {llr:+6.2f} ({lower:.2f}, {upper:.2f})")
+            if llr >= upper:
+                decision = "H1"
+                break
+            if llr <= lower:
+                decision = "H0"
+                break
+        pool.terminate()  # Descarta las parejas que quedan en curso si el SPRT ya ha decidido
+    elo, low, high = elo_interval(pairs)
+    return {"pairs": len(pairs), "wins": wins, "draws": draws, "losses": losses, "elo": elo, "elo_low": low, "elo_high": high, "decision": decision}
+
+def play_pair_task(task): # imap_unordered sólo pasa un argumento
+    return play_pair(*task)
+
+def add_agent_arguments(parser, side): # Opciones de un agente, con sufijo -a o -b
+    parser.add_argument(f"--model-{side}", default=None, help="Ruta del modelo (por defecto el del backend)")
+    parser.add_argument(f"--backend-{side}", choices=evaluator.BACKENDS, default="keras")
+    parser.add_argument(f"--iterations-{side}", type=int, default=400)
+    parser.add_argument(f"--time-{side}", type=int, default=None, help="Milisegundos por jugada, en lugar de iteraciones")
+    parser.add_argument(f"--random-{side}", action="store_true", help="Sin red neuronal, con simulaciones aleatorias")
+    parser.add_argument(f"--rollouts-{side}", type=int, default=1, help="Simulaciones aleatorias por hoja con --random")
+    parser.add_argument(f"--puct-{side}", action="store_true", help="Selección PUCT (el modelo debe tener cabeza de política)")
+
+def agent_from_arguments(args, side):
+    options = vars(args)
+    return AgentConfig(side.upper(), model=options[f"model_{side}"], backend=options[f"backend_{side}"],
+                       iterations=None if options[f"time_{side}"] is not None else options[f"iterations_{side}"],
+                       time_limit=options[f"time_{side}"], neural=not options[f"random_{side}"], rollouts=options[f"rollouts_{side}"], puct=options[f"puct_{side}"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_agent_arguments(parser, "a")
+    add_agent_arguments(parser, "b")
+    parser.add_argument("--pairs", type=int, default=100, help="Máximo de parejas de partidas")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--opening-plies", type=int, default=4, help="Movimientos aleatorios de cada apertura")
+    parser.add_argument("--elo0", type=float, default=0.0, help="Diferencia de Elo de A sobre B bajo H0")
+    parser.add_argument("--elo1", type=float, default=50.0, help="Diferencia de Elo de A sobre B bajo H1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    summary = run(agent_from_arguments(args, "a"), agent_from_arguments(args, "b"), args.pairs, args.processes, args.opening_plies,
+                  args.elo0, args.elo1, args.alpha, args.beta, args.seed)
+    verdict = {"H1": f"A es al menos {args.elo1:+.0f} Elo mejor que B", "H0": f"A no supera a B en más de {args.elo0:+.0f} Elo", None: "sin decisión del SPRT"}[summary["decision"]]
+    print(f"Resultado tras {summary['pairs']} parejas: Elo {summary['elo']:+.1f} [{summary['elo_low']:+.1f}, {summary['elo_high']:+.1f}], {verdict}")
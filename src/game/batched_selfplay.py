@@ -0,0 +1,139 @@
+import os
+import time
+import queue
+import argparse
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+from game import game_generator
+from agent import evaluator, inference_server, opening_book, endgame
+from data import dataset
+
+# Autojuego de muchas partidas a la vez dentro de un solo proceso. Cada partida es simulate_agent_vs_agent en su propio hilo,
+# así que produce exactamente los mismos registros (estado, jugador, resultado). Todos los hilos comparten un BatchingEvaluator:
+# cada búsqueda se detiene en su hoja hasta que todas las partidas en curso están esperando, y entonces todas las hojas se evalúan
+# con una sola llamada a la red. Con la red como coste dominante, la red recibe batches del tamaño del número de partidas en curso
+# en lugar de batches de 1. Las partidas terminadas se guardan en el conjunto de datos y se sustituyen por partidas nuevas
+
+class BatchingEvaluator: # Evaluador compartido por los hilos de las partidas. El último hilo en pedir una evaluación evalúa el batch de todos
+    def __init__(self, model):
+        self.model = model
+        self.condition = threading.Condition()
+        self.pending = []  # Peticiones en espera: [entradas, momento de la petición, (valores, política) (None hasta evaluarlas)]
+        self.running = 0  # Partidas en curso. El batch se evalúa cuando todas están esperando
+        self.batch_sizes = Counter()
+        self.latencies = array('d')
+
+    def start_game(self):
+        with self.condition:
+            self.running += 1
+
+    def finish_game(self):
+        with self.condition:
+            self.running -= 1
+            if self.pending and len(self.pending) >= self.running:
+                self.flush()  # Las demás partidas esperaban a esta
+
+    def evaluate(self, inputs):
+        return self.evaluate_policy(inputs)[0]
+
+    def evaluate_policy(self, inputs): # (valores, política o None), como los evaluadores de agent.evaluator
+        request = [np.asarray(inputs, dtype=np.float32), time.monotonic(), None]
+        with self.condition:
+            self.pending.append(request)
+            if len(self.pending) >= self.running:
+                self.flush()
+            while request[2] is None:
+                self.condition.wait()
+        return request[2]
+
+    def flush(self): # Evalúa todas las peticiones pendientes con una sola llamada y despierta a sus hilos. Se llama con el cerrojo tomado
+        batch, self.pending = self.pending, []
+        start = time.monotonic()
+        values, policy = self.model.evaluate_policy(np.concatenate([inputs for inputs, _, _ in batch]))  # La política sale en la misma llamada si el modelo es dual
+        offset = 0
+        for request in batch:
+            size = len(request[0])
+            request[2] = (values[offset:offset + size], None if policy is None else policy[offset:offset + size])
+            offset += size
+            self.latencies.append(start - request[1])
+        self.batch_sizes[offset] += 1
+        self.condition.notify_all()
+
+    def stats(self): # Mismo formato que las estadísticas del servidor de inferencia (inference_server.format_stats)
+        return inference_server.summarize(self.batch_sizes, self.latencies)
+
+def play(num_games, iterations=100, concurrency=64, backend="keras", book=None, route=None, shard_games=64, policy=False, puct=False, solver=False): # Juega num_games partidas de autojuego con concurrency a la vez
+    # route: conjunto de datos donde se añaden las partidas según terminan, en shards de shard_games partidas (None para no guardarlas)
+    # policy, puct, solver: como en simulate_agent_vs_agent. Con solver, todas las partidas comparten un SharedEndgameSolver, con una sola tabla
+    # Devuelve (lista de registros de todas las partidas, estadísticas de las llamadas a la red)
+    batching = BatchingEvaluator(evaluator.create_evaluator(backend))
+    shared_solver = endgame.SharedEndgameSolver() if solver else None
+    previous = evaluator.get_evaluator()
+    evaluator.set_evaluator(batching)
+    finished = queue.Queue()
+    output = dataset.Dataset(route) if route is not None else None
+
+    def game():
+        try:
+            finished.put(game_generator.simulate_agent_vs_agent(iterations, book=book, policy=policy, puct=puct, solver=shared_solver)[0])
+        except BaseException as error:
+            finished.put(error)
+        finally:
+            batching.finish_game()
+
+    def start():
+        batching.start_game()  # Antes de arrancar el hilo, para que ninguna evaluación se adelante sin contar con esta partida
+        threading.Thread(target=game, daemon=True).start()
+
+    started = 0
+    data = []
+    buffer = []
+    buffered_games = 0
+    try:
+        for _ in range(min(concurrency, num_games)):
+            start()
+            started += 1
+        for _ in range(num_games):
+            samples = finished.get()
+            if isinstance(samples, BaseException):
+                raise samples
+            if started < num_games:  # La partida terminada se sustituye por una nueva
+                start()
+                started += 1
+            data.extend(samples)
+            buffer.extend(samples)
+            buffered_games += 1
+            if output is not None and buffered_games >= shard_games:
+                output.append(buffer)
+                buffer = []
+                buffered_games = 0
+    finally:
+        evaluator.set_evaluator(previous)
+    if output is not None and buffer:
+        output.append(buffer)
+    return data, batching.stats()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=256)
+    parser.add_argument("--iterations", type=int, default=100, help="Iteraciones de mcts_uct por jugada")
+    parser.add_argument("--concurrency", type=int, default=64, help="Partidas en curso a la vez (tamaño máximo de cada batch de la red)")
+    parser.add_argument("--backend", choices=evaluator.BACKENDS, default="keras")
+    parser.add_argument("--book", action="store_true", help="Aperturas variadas con el libro de aperturas (python -m agent.opening_book)")
+    parser.add_argument("--overwrite", action="store_true", help="Borra los datos anteriores en lugar de extenderlos")
+    parser.add_argument("--policy", action="store_true", help="Guarda también la distribución de visitas de cada búsqueda")
+    parser.add_argument("--puct", action="store_true", help="Selección PUCT con la cabeza de política (modelo dual)")
+    parser.add_argument("--solver", action="store_true", help="Resuelve los finales de forma exacta (agent.endgame), con un solver compartido por todas las partidas")
+    parser.add_argument("--route", default=dataset.DATASET_ROUTE)
+    args = parser.parse_args()
+
+    if args.overwrite:
+        dataset.Dataset(args.route).clear()
+    book = opening_book.OpeningBook(randomized=True) if args.book and os.path.exists(opening_book.BOOK_ROUTE) else None
+    begin = time.perf_counter()
+    data, stats = play(args.games, args.iterations, args.concurrency, args.backend, book, args.route, policy=args.policy, puct=args.puct, solver=args.solver)
+    elapsed = time.perf_counter() - begin
+    print(f"{args.games} partidas ({len(data)} muestras) en {elapsed:.1f} s: {args.games * 3600 / elapsed:.1f} partidas/hora, guardadas en {args.route}")
+    print(inference_server.format_stats(stats))
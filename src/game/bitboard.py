@@ -0,0 +1,105 @@
+import numpy as np
+
+# Motor de generación de movimientos con bitboards. Una posición es una tupla (blancas, negras) de dos enteros de 64 bits,
+# donde el bit x * 8 + y está activo si la casilla (x, y) tiene ficha de ese color. Las funciones mantienen los nombres de game.othello
+
+# Constantes para representar el estado de cada casilla (las mismas que en game.othello)
+EMPTY = 0   # Casilla vacía
+WHITE = 1   # Ficha blanca
+BLACK = 2   # Ficha negra
+
+FULL = 0xFFFFFFFFFFFFFFFF  # Las 64 casillas ocupadas
+NOT_COL_0 = 0xFEFEFEFEFEFEFEFE  # Todas las casillas salvo la columna 0
+NOT_COL_7 = 0x7F7F7F7F7F7F7F7F  # Todas las casillas salvo la columna 7
+
+# Por cada dirección (dx, dy): desplazamiento de bits (dx * 8 + dy) y máscara que evita que las fichas "salten" de un borde al otro
+SHIFTS = [(dx * 8 + dy, FULL if dy == 0 else NOT_COL_0 if dy == 1 else NOT_COL_7)
+          for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]]
+
+def shift(bits, amount, mask): # Desplaza todas las fichas una casilla en la dirección indicada
+    if amount > 0:
+        return (bits << amount) & mask & FULL
+    return (bits >> -amount) & mask
+
+def move_mask(own, opp): # Devuelve una máscara con todas las casillas a las que puede mover el jugador con fichas own
+    empty = ~(own | opp) & FULL
+    moves = 0
+    for amount, mask in SHIFTS:
+        line = shift(own, amount, mask) & opp  # Fichas del oponente pegadas a una propia en esta dirección
+        for _ in range(5):  # Como mucho hay 6 fichas del oponente en línea entre la propia y la casilla libre
+            line |= shift(line, amount, mask) & opp
+        moves |= shift(line, amount, mask) & empty
+    return moves
+
+def flip_mask(own, opp, square): # Devuelve la máscara de fichas del oponente capturadas al mover a la casilla square (0-63)
+    origin = 1 << square
+    flipped = 0
+    for amount, mask in SHIFTS:
+        line = 0
+        bit = shift(origin, amount, mask)
+        while bit & opp:  # Avanza mientras haya fichas del oponente
+            line |= bit
+            bit = shift(bit, amount, mask)
+        if bit & own:  # Sólo se capturan si la línea se cierra con una ficha propia
+            flipped |= line
+    return flipped
+
+def squares(bits): # Devuelve los índices de los bits activos, de menor a mayor (mismo orden que recorrer el tablero por filas)
+    result = []
+    while bits:
+        low = bits & -bits
+        result.append(low.bit_length() - 1)
+        bits ^= low
+    return result
+
+def split(position, player): # Separa la posición en (fichas del jugador, fichas del oponente)
+    if player == WHITE:
+        return position[0], position[1]
+    return position[1], position[0]
+
+def join(own, opp, player): # Operación inversa de split
+    if player == WHITE:
+        return own, opp
+    return opp, own
+
+def create_position(): # Posición inicial, equivalente a othello.create_board
+    return (1 << 27) | (1 << 36), (1 << 28) | (1 << 35)
+
+def from_array(board): # Convierte el tablero 8x8 de NumPy en una posición (blancas, negras)
+    flat = np.asarray(board).ravel()
+    white = np.packbits(flat == WHITE, bitorder='little').view('<u8')[0]
+    black = np.packbits(flat == BLACK, bitorder='little').view('<u8')[0]
+    return int(white), int(black)
+
+def to_array(position): # Convierte una posición (blancas, negras) en el tablero 8x8 de NumPy que usa game.othello
+    bits = np.unpackbits(np.array(position, dtype='<u8').view(np.uint8), bitorder='little').reshape(2, 64)
+    board = bits[0] * WHITE + bits[1] * BLACK
+    return board.reshape(8, 8).astype(int)
+
+def valid_movements(position, player):
+    own, opp = split(position, player)
+    return [divmod(square, 8) for square in squares(move_mask(own, opp))]  # Lista de tuplas (x, y), igual que othello.valid_movements
+
+def apply_movement(position, x, y, player): # Los enteros son inmutables, así que devuelve la nueva posición en lugar de modificarla
+    own, opp = split(position, player)
+    square = x * 8 + y
+    flipped = flip_mask(own, opp, square)
+    return join(own | flipped | (1 << square), opp & ~flipped, player)
+
+def count_discs(position):
+    return position[0].bit_count(), position[1].bit_count()
+
+def is_board_full(position):
+    return (position[0] | position[1]) == FULL
+
+def is_game_finished(position):
+    white, black = position
+    if (white | black) == FULL:
+        return True
+    return move_mask(white, black) == 0 and move_mask(black, white) == 0
+
+def get_winner(position):
+    num_white, num_black = count_discs(position)
+    if num_white == num_black:
+        return 0
+    return WHITE if num_white > num_black else BLACK
@@ -1,19 +1,33 @@
 import numpy as np
 import os
 import random
-import pandas as pd
 from multiprocessing import Pool
 from game import othello
-from agent import mcts_uct
+from agent import mcts_uct, evaluator, inference_server, endgame, opening_book, profiling, evaluation_cache, transposition
+from data import dataset
 
 BLANCO = 1
 NEGRO = 2
 
-def simulate_agent_vs_agent(iterations=1000):
+def simulate_agent_vs_agent(iterations=1000, time_limit=None, book=None, profile=False, policy=False, puct=False, cache_mb=None, solver=False, table_size=None): # time_limit: milisegundos por jugada, opcional # book: OpeningBook opcional para las primeras jugadas
+    # Devuelve (registros, estadísticas): la lista de estadísticas de búsqueda de cada jugada sólo se llena con profile, cache_mb o table_size
+    # profile: las estadísticas de búsqueda de cada jugada incluyen el tiempo por fase (agent.profiling)
+    # policy: cada registro lleva un cuarto elemento, la distribución de visitas de la búsqueda hecha en ese estado (objetivo de la cabeza de política)
+    # puct: búsqueda con selección PUCT (modelo dual)
+    # cache_mb: memoria de una caché de evaluaciones (agent.evaluation_cache) para toda la partida. Con ella también se guardan las
+    # estadísticas de cada jugada, que incluyen los aciertos y fallos de la caché
+    # solver: resuelve de forma exacta los finales con agent.endgame en lugar de evaluarlos, lo que cambia los datos generados cerca del final.
+    # True crea un EndgameSolver para la partida; también se puede pasar uno ya creado, para compartirlo entre partidas
+    # table_size: entradas de una tabla de transposiciones (agent.transposition) por jugador. Las estadísticas de cada jugada incluyen sus aciertos
     board = othello.create_board()
     player = NEGRO # Empieza el negro siempre
     states = []
+    moves = [] # Estadísticas de cada búsqueda, sólo con profile, cache_mb o table_size
     skipped_turns = 0
+    solver = endgame.EndgameSolver() if solver is True else solver or None # Resuelve de forma exacta los finales en lugar de simularlos
+    cache = evaluation_cache.EvaluationCache(cache_mb) if cache_mb else None # Compartida por los dos jugadores: la clave incluye la perspectiva
+    searches = {color: mcts_uct.MCTSSearch(iterations=iterations, training=True, time_limit=time_limit, solver=solver, book=book, profile=profile, puct=puct, cache=cache, table=create_table(table_size)) for color in (BLANCO, NEGRO)} # Un árbol por jugador, que se conserva entre jugadas
+    policies = [] # Distribución de visitas de cada estado guardado, sólo con policy
 
     while not othello.is_board_full(board) and skipped_turns < 2:
 
@@ -21,15 +35,23 @@ def simulate_agent_vs_agent(iterations=1000):
         if not movs: # Si no hay movimientos validos, se skipea el turno, no se puede aplicar el algoritmo
             skipped_turns += 1
             player = 3 - player
+            for search in searches.values():
+                search.advance(None) # El pase de turno también es una acción del árbol
             continue
         skipped_turns = 0
 
-        mov = mcts_uct.mcts_uct(state=board, player=player, iterations=iterations, training=True) # Aplica algoritmo mcts con uct para encontrar movimiento óptimo
+        mov = searches[player].search(board, player) # Aplica algoritmo mcts con uct para encontrar movimiento óptimo
+        if profile or cache is not None or table_size:
+            moves.append(dict(searches[player].stats, ply=len(states), player=player))
+        record_policy(policies, states, searches[player], player)
 
         othello.apply_movement(board, mov[0], mov[1], player)
+        for search in searches.values():
+            search.advance(mov) # Ambos árboles avanzan con la jugada realizada
         actual_state = np.copy(board)
         player = 3 - player
         states.append((actual_state, player))
+        policies.append(None)
 
     winner = othello.decide_winner(board)
 
@@ -42,16 +64,34 @@ def simulate_agent_vs_agent(iterations=1000):
         else:
             result = -1
         results.append((state, active_player, result))
+    if policy:
+        results = with_policies(results, policies)
 
-    return results
+    return results, moves
 
-def simulate_agent_vs_random(iterations=1000): # Simula partida en la que el agente entrenado juega contra un agente que pilla movimientos random
+def create_table(table_size): # Tabla de transposiciones de un jugador: la raíz y proven son desde su perspectiva, así que no se comparte
+    return transposition.TranspositionTable(table_size) if table_size else None
+
+def record_policy(policies, states, search, player): # Guarda la distribución de visitas de la búsqueda recién hecha en el último estado guardado, que es el buscado salvo tras un pase
+    # El estado inicial no se guarda, y tras un pase el último estado es del jugador que no podía mover. Las jugadas del libro no tienen árbol
+    if states and states[-1][1] == player and search.root is not None:
+        policies[-1] = mcts_uct.visit_distribution(search.root)
+
+def with_policies(results, policies): # Añade a cada registro su distribución de visitas (ceros si en ese estado no se buscó)
+    return [(state, player, result, distribution if distribution is not None else np.zeros(64, dtype=np.float32)) for (state, player, result), distribution in zip(results, policies)]
+
+def simulate_agent_vs_random(iterations=1000, time_limit=None, book=None, profile=False, policy=False, puct=False, cache_mb=None, solver=False, table_size=None): # Simula partida en la que el agente entrenado juega contra un agente que pilla movimientos random
+    # Devuelve (registros, 1 si gana el agente, estadísticas de cada jugada del agente). Las opciones son las de simulate_agent_vs_agent
     board = othello.create_board()
     states = []
+    moves = []
     skipped_turns = 0
 
     current_player = NEGRO
     agent = random.choice([BLANCO,NEGRO])
+    cache = evaluation_cache.EvaluationCache(cache_mb) if cache_mb else None
+    search = mcts_uct.MCTSSearch(iterations=iterations, neural=True, time_limit=time_limit, solver=endgame.EndgameSolver() if solver else None, book=book, profile=profile, puct=puct, cache=cache, table=create_table(table_size)) # Árbol del agente, que se conserva entre jugadas
+    policies = [] # Sólo hay distribución de visitas en los estados en los que buscó el agente
 
     while not othello.is_board_full(board) and skipped_turns < 2:
 
@@ -59,18 +99,24 @@ def simulate_agent_vs_random(iterations=1000): # Simula partida en la que el age
         if not movs: # Si no hay movimientos validos, se skipea el turno, no se puede aplicar el algoritmo
             skipped_turns += 1
             current_player = 3 - current_player
+            search.advance(None)
             continue
         skipped_turns = 0
 
         if current_player == agent:
-            mov = mcts_uct.mcts_uct(state=board, player=current_player, iterations=iterations, neural=True) # Aplica algoritmo mcts con uct para encontrar movimiento óptimo
+            mov = search.search(board, current_player) # Aplica algoritmo mcts con uct para encontrar movimiento óptimo
+            if profile or cache is not None or table_size:
+                moves.append(dict(search.stats, ply=len(states), player=current_player))
+            record_policy(policies, states, search, current_player)
         else:
             mov = random.choice(movs)
 
         othello.apply_movement(board, mov[0], mov[1], current_player)
+        search.advance(mov)
         actual_state = np.copy(board)
         current_player = 3 - current_player
         states.append((actual_state, current_player))
+        policies.append(None)
 
     winner = othello.decide_winner(board)
 
@@ -93,16 +139,25 @@ def simulate_agent_vs_random(iterations=1000): # Simula partida en la que el age
         else:
             result = -1
         results.append((state, active_player, result))
+    if policy:
+        results = with_policies(results, policies)
 
-    return results, agent_won
+    return results, agent_won, moves
 
-def simulate_agent_vs_old(iterations=1000): # Simula partida en la que el agente entrenado juega contra el mismo agente con la política anterior
+def simulate_agent_vs_old(iterations=1000, time_limit=None, book=None, profile=False, policy=False, puct=False, cache_mb=None, solver=False, table_size=None): # Simula partida en la que el agente entrenado juega contra el mismo agente con la política anterior
+    # Devuelve (registros, 1 si gana el agente con red, estadísticas de cada jugada), como simulate_agent_vs_random
     board = othello.create_board()
     states = []
+    moves = []
     skipped_turns = 0
 
     current_player = NEGRO
     neural_agent = random.choice([BLANCO,NEGRO])
+    solver = endgame.EndgameSolver() if solver else None # Si se usa, lo usan ambos agentes, para que la comparación sólo dependa de la evaluación
+    policies = []
+    cache = evaluation_cache.EvaluationCache(cache_mb) if cache_mb else None # Sólo la usa el agente con red
+    searches = {neural_agent: mcts_uct.MCTSSearch(iterations=iterations, neural=True, time_limit=time_limit, solver=solver, book=book, profile=profile, puct=puct, cache=cache, table=create_table(table_size)), # Un árbol por agente, que se conserva entre jugadas
+                3 - neural_agent: mcts_uct.MCTSSearch(iterations=iterations, neural=False, time_limit=time_limit, solver=solver, book=book, profile=profile, table=create_table(table_size))}
 
     while not othello.is_board_full(board) and skipped_turns < 2:
 
@@ -110,18 +165,23 @@ def simulate_agent_vs_old(iterations=1000): # Simula partida en la que el agente
         if not movs: # Si no hay movimientos validos, se skipea el turno, no se puede aplicar el algoritmo
             skipped_turns += 1
             current_player = 3 - current_player
+            for search in searches.values():
+                search.advance(None)
             continue
         skipped_turns = 0
 
-        if current_player == neural_agent:
-            mov = mcts_uct.mcts_uct(state=board, player=current_player, iterations=iterations, neural=True) # Aplica algoritmo mcts con red neuronal como política
-        else:
-            mov = mcts_uct.mcts_uct(state=board, player=current_player, iterations=iterations, neural=False)
+        mov = searches[current_player].search(board, current_player) # Aplica algoritmo mcts, con red neuronal como política sólo para neural_agent
+        if profile or cache is not None or table_size:
+            moves.append(dict(searches[current_player].stats, ply=len(states), player=current_player, neural=current_player == neural_agent))
+        record_policy(policies, states, searches[current_player], current_player)
 
         othello.apply_movement(board, mov[0], mov[1], current_player)
+        for search in searches.values():
+            search.advance(mov)
         actual_state = np.copy(board)
         current_player = 3 - current_player
         states.append((actual_state, current_player))
+        policies.append(None)
 
     winner = othello.decide_winner(board)
 
@@ -144,22 +204,46 @@ def simulate_agent_vs_old(iterations=1000): # Simula partida en la que el agente
         else:
             result = -1
         results.append((state, active_player, result))
-
-    return results, agent_won
-
-def generate_data_parallel(simulation_function, num_games=500, iterations=1000, processes=4): #Simulación de varias partidas paralelamente, para reducir tiempo de espera
-    args = [(iterations,) for _ in range(num_games)] # Creamos una lista de argumentos, uno por cada juego. El argumento siempre es el mismo, las iteraciones
-    with Pool(processes=processes) as pool: # Pool de procesos, cada uno simulando una partida. Al salir del bloque with Python se encarga de liberar recursos
+    if policy:
+        results = with_policies(results, policies)
+
+    return results, agent_won, moves
+
+def generate_data_parallel(simulation_function, num_games=500, iterations=1000, processes=4, backend="keras", server=False, time_limit=None, book=None, profile_route=None, policy=False, puct=False, cache_mb=None, solver=False, table_size=None): #Simulación de varias partidas paralelamente, para reducir tiempo de espera. backend: motor de inferencia de la red ("keras" o "numpy") # book: OpeningBook opcional
+    # profile_route: fichero .json o .csv donde guardar las estadísticas de búsqueda de todas las jugadas (opcional)
+    # policy: guarda también la distribución de visitas de la raíz de cada búsqueda # puct: búsqueda con selección PUCT (modelo dual)
+    # cache_mb: cada partida usa una caché de evaluaciones con esta memoria, y al final se muestran sus aciertos y el tiempo de red ahorrado
+    # solver: los agentes resuelven los finales de forma exacta con agent.endgame
+    # table_size: cada agente usa una tabla de transposiciones con estas entradas, y al final se muestran sus aciertos y las evaluaciones ahorradas
+    args = [(iterations, time_limit, book, profile_route is not None, policy, puct, cache_mb, solver, table_size) for _ in range(num_games)] # Creamos una lista de argumentos, uno por cada juego. Los argumentos son siempre los mismos, las iteraciones, el tiempo por jugada y el libro de aperturas
+    if server: # Un único proceso servidor carga el modelo y agrupa en batches las evaluaciones de todos los procesos
+        inference = inference_server.InferenceServer(processes, backend=backend).start()
+        initializer, initargs = inference_server.connect_worker, inference.worker_args()
+    else: # Cada proceso carga su propio modelo la primera vez que lo necesita
+        initializer, initargs = evaluator.use_backend, (backend,)
+    with Pool(processes=processes, initializer=initializer, initargs=initargs) as pool: # Pool de procesos, cada uno simulando una partida. Al salir del bloque with Python se encarga de liberar recursos
         results = pool.starmap(simulation_function, args) # Cada simulate_game recibe un argumento de la lista, que es el mismo realmente
+    if server:
+        print(inference_server.format_stats(inference.stop()))
+    records = [dict(move, game=game) for game, result in enumerate(results) for move in result[-1]] # Vacía salvo con profile_route, cache_mb o table_size
+    if cache_mb:
+        print(evaluation_cache.format_stats(evaluation_cache.merge(records)))
+    if table_size:
+        print(transposition.format_stats(transposition.merge(records)))
+    if profile_route is not None: # Se guardan todas juntas
+        profiling.dump(records, profile_route)
+        print("Tiempo por fase de la búsqueda en todas las partidas:")
+        print(profiling.format_phases(profiling.merge(record.get("phases", {}) for record in records)))
+        print(f"Estadísticas de {len(records)} jugadas guardadas en {profile_route}")
     data = []
     if(simulation_function == simulate_agent_vs_old or simulation_function == simulate_agent_vs_random):
         victories = 0 # Contador de victorias del agente, sea el normal o el que usa la neurona dependiendo del caso
-        for game_data, agent_won in results: 
+        for game_data, agent_won, _ in results: 
             data.extend(game_data)  # Unimos todos los datos de las diferentes partidas simuladas en una única lista
             victories += agent_won # Sumo al contador de victorias para estadisticas
         return data, victories
     else:
-        for game_data in results: 
+        for game_data, _ in results: 
             data.extend(game_data)  # Unimos todos los datos de las diferentes partidas simuladas en una única lista
         return data
 
@@ -184,6 +268,96 @@ if __name__ == "__main__":
         except:
             print("Entrada inválida.")
 
+    while True:
+        try:
+            choice = int(input("Escoge el evaluador de las hojas: red en Keras (1), red en NumPy (2, requiere exportar antes el modelo con python -m agent.evaluator), tablas de patrones (3, requiere entrenarlas con python -m agent.patterns) o red reducida (4, requiere crearla con python -m agent.model.distillation): "))
+            if choice in [1,2,3,4]:
+                backend = evaluator.BACKENDS[choice - 1]
+                break
+            else:
+                print("Introduce un número entre 1 y 4")
+        except:
+            print("Entrada inválida.")
+
+    while True:
+        try:
+            choice = int(input("¿Usar un único proceso servidor para la red neuronal, compartido por todos los procesos? Sí (1) o No (2): "))
+            if choice in [1,2]:
+                server = choice == 1
+                break
+            else:
+                print("Introduce 1 o 2")
+        except:
+            print("Entrada inválida.")
+
+    book = None
+    if os.path.exists(opening_book.BOOK_ROUTE):
+        while True:
+            try:
+                choice = int(input("¿Usar el libro de aperturas en las primeras jugadas (eligiendo al azar entre sus movimientos para variar las partidas)? Sí (1) o No (2): "))
+                if choice in [1,2]:
+                    book = opening_book.OpeningBook(randomized=True) if choice == 1 else None
+                    break
+                else:
+                    print("Introduce 1 o 2")
+            except:
+                print("Entrada inválida.")
+
+    profile_route = input("Fichero donde guardar las estadísticas de búsqueda por jugada (.json o .csv), o vacío para no medirlas: ").strip() or None
+
+    while True:
+        try:
+            choice = int(input("¿Guardar también la distribución de visitas de cada búsqueda (para entrenar la cabeza de política, DUAL en agent.model.model)? Sí (1) o No (2): "))
+            if choice in [1,2]:
+                policy = choice == 1
+                break
+            else:
+                print("Introduce 1 o 2")
+        except:
+            print("Entrada inválida.")
+
+    while True:
+        try:
+            choice = int(input("¿Buscar con selección PUCT, usando la cabeza de política del modelo (requiere un modelo dual)? Sí (1) o No (2): "))
+            if choice in [1,2]:
+                puct = choice == 1
+                break
+            else:
+                print("Introduce 1 o 2")
+        except:
+            print("Entrada inválida.")
+
+    while True:
+        try:
+            cache_mb = int(input("Memoria en MB de la caché de evaluaciones de cada partida (posiciones ya evaluadas o simétricas no vuelven a la red), o 0 para no usarla: ")) or None
+            if cache_mb is None or cache_mb > 0:
+                break
+            else:
+                print("Introduce un número positivo o 0")
+        except:
+            print("Entrada inválida.")
+
+    while True:
+        try:
+            choice = int(input("¿Resolver de forma exacta los finales (agent.endgame) en lugar de evaluarlos? Cambia los valores de los datos cerca del final. Sí (1) o No (2): "))
+            if choice in [1,2]:
+                solver = choice == 1
+                break
+            else:
+                print("Introduce 1 o 2")
+        except:
+            print("Entrada inválida.")
+
+    while True:
+        try:
+            table_size = int(input("Entradas de la tabla de transposiciones de cada agente (las posiciones a las que se llega por otro orden de jugadas comparten estadísticas), o 0 para no usarla: ")) or None
+            if table_size is None or table_size > 0:
+                break
+            else:
+                print("Introduce un número positivo o 0")
+        except:
+            print("Entrada inválida.")
+
     while True:
         try:
             mode = int(input("Introduce 1 si quieres sobreescribir cualquier dato antiguo o 2 si quieres extender el conjunto de datos: "))
@@ -195,23 +369,15 @@ if __name__ == "__main__":
             print("Entrada inválida.")
     
     if(simulation_function == simulate_agent_vs_old or simulation_function == simulate_agent_vs_random):
-        data, victories = generate_data_parallel(simulation_function,num_games=num_games, iterations=iterations, processes=processes)
+        data, victories = generate_data_parallel(simulation_function,num_games=num_games, iterations=iterations, processes=processes, backend=backend, server=server, book=book, profile_route=profile_route, policy=policy, puct=puct, cache_mb=cache_mb, solver=solver, table_size=table_size)
     else:
-        data = generate_data_parallel(simulation_function,num_games=num_games, iterations=iterations, processes=processes)
+        data = generate_data_parallel(simulation_function,num_games=num_games, iterations=iterations, processes=processes, backend=backend, server=server, book=book, profile_route=profile_route, policy=policy, puct=puct, cache_mb=cache_mb, solver=solver, table_size=table_size)
 
-    base_route = os.path.dirname(os.path.abspath(__file__)) # Obtiene la ruta absoluta del script
-    data_route = os.path.join(base_route, "..", "data") # Obtiene la ruta donde guardar el fichero a partir de la anterior
-    os.makedirs(data_route, exist_ok=True)
-    file_route = os.path.join(data_route, "training_data.pkl")
-
-    df = pd.DataFrame(data, columns=['state', 'player', 'result'])
-    if os.path.exists(file_route) and mode == 2: # Si ya existe el fichero y estamos no estamos en modo sobreescritura, concatenamos datos
-        old_df = pd.read_pickle(file_route)
-        final_df = pd.concat([old_df, df], ignore_index=True)
-    else:
-        final_df = df
-    
-    final_df.to_pickle(file_route)
+    # Los datos se guardan en data/training_data como un shard nuevo, sin leer ni reescribir los anteriores
+    training_data = dataset.Dataset()
+    if mode == 1: # En modo sobreescritura se borran los shards anteriores
+        training_data.clear()
+    training_data.append(data)
 
     # Mostramos estadísticas para análisis en caso de simular partidas del agente vs random o agente con red neuronal vs agente con politica antigua
     if(simulation_function == simulate_agent_vs_random):
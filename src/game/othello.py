@@ -1,4 +1,5 @@
 import numpy as np
+from game import bitboard
 
 # Constantes para representar el estado de cada casilla en el tablero
 EMPTY = 0   # Casilla vacía
@@ -24,7 +25,10 @@ def show_board(board): # Muestra el tablero en consola usando símbolos para rep
 def inside_board(x, y): # Verifica que las coordenadas (x, y) estén dentro de los límites del tablero 8x8
     return 0 <= x < 8 and 0 <= y < 8
 
-def valid_movements(board, player):
+def valid_movements(board, player): # Usa el motor de bitboards, mucho más rápido que recorrer las 64 casillas en las 8 direcciones
+    return bitboard.valid_movements(bitboard.from_array(board), player)
+
+def valid_movements_scan(board, player): # Versión original casilla a casilla, se mantiene como referencia
     movs = []
     for x in range(8):
         for y in range(8):
@@ -35,9 +39,9 @@ def valid_movements(board, player):
     return movs
 
 def apply_movement(board, x, y, player): # Aplica el movimiento del jugador hacia la posición (x, y) y cambia las fichas capturadas
-    board[x, y] = player
-    for fx, fy in get_captured_discs(board, x, y, player):
-        board[fx, fy] = player  # Cambia fichas atrapadas del oponente a las del jugador
+    own, opp = bitboard.split(bitboard.from_array(board), player)
+    flipped = bitboard.flip_mask(own, opp, x * 8 + y) | (1 << (x * 8 + y))
+    board.flat[bitboard.squares(flipped)] = player  # Cambia fichas atrapadas del oponente a las del jugador
 
 def get_captured_discs(board, x, y, player): # Devuelve la lista de fichas del oponente que serían capturadas si el jugador coloca ficha en (x, y)
     opponent = 3 - player  # Si jugador es blanco(1), oponente es negro(2) y viceversa
@@ -65,7 +69,7 @@ def is_board_full(board):
 def is_game_finished(board):
     if is_board_full(board):  # Termina si el tablero está lleno
         return True  # Evita calcular movimientos válidos si no quedan casillas libres
-    return len(valid_movements(board, 1)) == 0 and len(valid_movements(board, 2)) == 0 # Termina si ninguno de los dos jugadores tiene movimientos válidos
+    return bitboard.is_game_finished(bitboard.from_array(board)) # Termina si ninguno de los dos jugadores tiene movimientos válidos
 
 def decide_winner(board): # Decide el ganador contando las fichas y mostrando el resultado por pantalla
     num_white, num_black = count_discs(board)  # Gana el jugador con más fichas
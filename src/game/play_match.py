@@ -1,18 +1,27 @@
+import argparse
 from game.othello import create_board, is_board_full, show_board, valid_movements, apply_movement, decide_winner
-from agent.mcts_uct import mcts_uct
+from agent.mcts_uct import MCTSSearch
+from agent.parallel_mcts import ParallelSearch
+from agent.endgame import EndgameSolver
+from agent.opening_book import OpeningBook
 
 # Constantes para representar el estado de cada casilla en el tablero
 EMPTY = 0   # Casilla vacía
 WHITE = 1   # Ficha blanca
 BLACK = 2   # Ficha negra
 
-def play(user, iterations, neural=False): # Bucle principal para jugar una partida
+def play(user, iterations, neural=False, time_limit=None, book=None, workers=1, mode="root"): # Bucle principal para jugar una partida. time_limit: milisegundos por jugada del agente (opcional) # book: OpeningBook opcional
+    # workers: con más de 1, el agente busca cada jugada en paralelo con agent.parallel_mcts, en el modo mode ("root" o "tree")
     board = create_board()  # Crea el tablero inicial con las 4 fichas en el centro
     print("¡Comienza la partida!")
     
     agent = 3 - user  # El agente es el color opuesto
     current_player = BLACK  # Empieza el jugador negro según las reglas
     skipped_turns = 0
+    if workers > 1:
+        search = ParallelSearch(iterations=iterations, neural=neural, workers=workers, mode=mode, time_limit=time_limit, solver=EndgameSolver(), book=book)
+    else:
+        search = MCTSSearch(iterations=iterations, neural=neural, time_limit=time_limit, early_stop=time_limit is not None, solver=EndgameSolver(), book=book) # El agente conserva su árbol entre jugadas. Con tiempo limitado, para antes si la jugada ya está decidida. Los finales los resuelve de forma exacta
     while not is_board_full(board) and skipped_turns < 2:  # Bucle principal del juego hasta que se acabe
         print("\nTurno de:", "BLANCAS" if current_player == WHITE else "NEGRAS")
         show_board(board)  # Muestra el tablero actual
@@ -23,6 +32,7 @@ def play(user, iterations, neural=False): # Bucle principal para jugar una parti
             print("No hay movimientos válidos. Se pasa el turno.")
             current_player = 3 - current_player
             skipped_turns += 1
+            search.advance(None)
             continue
         else:
             skipped_turns = 0 # Reinicia contador si hay movimientos posibles
@@ -35,15 +45,23 @@ def play(user, iterations, neural=False): # Bucle principal para jugar una parti
                     x, y = map(int, input("Introduce fila y columna (con un espacio entre ambos): ").split())  # Split por cualquier número de espacios, por si acaso
                     if (x, y) in valid_moves:
                         apply_movement(board, x, y, user)
+                        search.advance((x, y))
                         break
                     else:
                         print("Movimiento inválido. Inténtalo de nuevo.")
                 except:
                         print("Entrada incorrecta. Inténtalo de nuevo.")
         else: # Turno del agente (elige un movimiento aplicando mcts con uct)
-            mov = mcts_uct(board, current_player, iterations = iterations, neural=neural) # La política usada depende del parámetro neural
+            mov = search.search(board, current_player) # La política usada depende del parámetro neural
             print(f"El agente mueve ficha a: {mov[0]} {mov[1]}")
+            stats = search.stats
+            if stats.get("book"):
+                print("(jugada del libro de aperturas)")
+            else:
+                tree = f", {stats['tree_size']} nodos en el árbol, profundidad {stats['max_depth']}" if "tree_size" in stats else ""  # La búsqueda en paralelo no mide el árbol
+                print(f"({stats['iterations']} iteraciones en {stats['seconds']:.2f} s, {stats['nodes_per_second']:.0f} nodos/s{tree})")
             apply_movement(board, mov[0], mov[1], agent)
+            search.advance(mov)
 
         current_player = 3 - current_player  # Cambia de turno al otro jugador
 
@@ -55,8 +73,15 @@ def play(user, iterations, neural=False): # Bucle principal para jugar una parti
         print("Derrota")
     else:
         print("¡Empate!")
+    if workers > 1:
+        search.close()  # Termina los procesos de la búsqueda en paralelo
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1, help="Núcleos para la búsqueda de cada jugada del agente (agent.parallel_mcts)")
+    parser.add_argument("--mode", choices=["root", "tree"], default="root", help="Paralelismo de raíz (procesos) o de árbol (hilos) con --workers. Sólo el de árbol conserva el árbol entre jugadas")
+    args = parser.parse_args()
+
     while True: # Elección de color por parte del usuario
         try:
             user = int(input("Elige tu color: 1 (Blancas) o 2 (Negras - Empiezas tú): "))
@@ -78,10 +103,14 @@ if __name__ == "__main__":
         except:
             print("Entrada inválida.")
 
-    while True: # Selección de dificultad de juego (numero de iteraciones del algoritmo MCTS)
+    while True: # Selección de dificultad de juego (numero de iteraciones del algoritmo MCTS, o tiempo por jugada)
         try:
-            iterations = int(input("Elige la dificultadad del juego (nº de iteraciones del algoritmo, a más iteraciones, mayor tiempo de espera): "))
+            difficulty = input("Elige la dificultadad del juego (nº de iteraciones del algoritmo, o tiempo por jugada terminado en ms, por ejemplo 500ms. A más iteraciones o tiempo, mayor dificultad): ").strip()
+            if difficulty.endswith("ms"):
+                iterations, time_limit = None, int(difficulty[:-2])
+            else:
+                iterations, time_limit = int(difficulty), None
             break
         except:
             print("Entrada inválida.")
-    play(user, iterations, neural)
\ No newline at end of file
+    play(user, iterations, neural, time_limit, OpeningBook(), args.workers, args.mode) # Si no se ha creado el libro (python -m agent.opening_book), está vacío y no se usa
\ No newline at end of file
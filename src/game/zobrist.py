@@ -0,0 +1,32 @@
+import random
+import numpy as np
+from game import bitboard
+
+# Hashing Zobrist: cada (color, casilla) tiene un número aleatorio de 64 bits y el hash de una posición es el XOR de los de sus fichas,
+# más SIDE si mueve el negro. Al hacer un movimiento basta con aplicar XOR sobre las casillas que cambian
+
+_rng = random.Random(20240517)  # Semilla fija para que el hash de una posición sea siempre el mismo
+PIECES = {color: [_rng.getrandbits(64) for _ in range(64)] for color in (bitboard.WHITE, bitboard.BLACK)}
+SIDE = _rng.getrandbits(64)
+
+def hash_position(position, player): # Calcula el hash completo de la posición con el jugador que mueve
+    key = SIDE if player == bitboard.BLACK else 0
+    for color, bits in zip((bitboard.WHITE, bitboard.BLACK), position):
+        for square in bitboard.squares(bits):
+            key ^= PIECES[color][square]
+    return key
+
+def update(key, before, after): # Hash incremental tras pasar de la posición before a after, con cambio de turno (movimiento o pase)
+    key ^= SIDE
+    for color, old, new in zip((bitboard.WHITE, bitboard.BLACK), before, after):
+        for square in bitboard.squares(old ^ new):  # Sólo las casillas que cambian: la ficha colocada y las capturadas
+            key ^= PIECES[color][square]
+    return key
+
+def hash_positions(white, black, players): # Versión vectorizada de hash_position para arrays de bitboards (uint64) y de jugadores
+    keys = np.where(np.asarray(players) == bitboard.BLACK, np.uint64(SIDE), np.uint64(0))
+    for color, bits in zip((bitboard.WHITE, bitboard.BLACK), (white, black)):
+        occupied = np.unpackbits(np.ascontiguousarray(bits, dtype='<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        table = np.array(PIECES[color], dtype=np.uint64)
+        keys = keys ^ np.bitwise_xor.reduce(np.where(occupied == 1, table, np.uint64(0)), axis=1)
+    return keys
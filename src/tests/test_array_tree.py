@@ -0,0 +1,52 @@
+import random
+import pytest
+from game import bitboard
+from agent import mcts_uct, array_tree
+from benchmark.batched_search import positions
+
+# El árbol de arrays debe recorrer y actualizar el árbol exactamente igual que tree_policy y MCTSNode.backup. Sin ruido en la selección,
+# las dos búsquedas consumen igual el generador aleatorio (sólo las simulaciones), así que con la misma semilla dan el mismo árbol
+
+def assert_same_tree(node, tree, index): # Compara el subárbol de node (MCTSNode) con el de index en tree, hijo a hijo en orden de creación
+    assert node.visits == tree.visits[index]
+    assert node.total_reward == pytest.approx(tree.total_reward[index])
+    assert node.player == tree.player[index]
+    children = tree.children(index)
+    assert len(node.children) == children.stop - children.start
+    for move, child, array_child in zip(node.moves, node.children, range(children.start, children.stop)):
+        assert move == tree.action(array_child)
+        assert_same_tree(child, tree, array_child)
+
+def test_same_search_as_nodes(monkeypatch):
+    monkeypatch.setattr(random, "gauss", lambda mu, sigma: 0.0)
+    monkeypatch.setattr(array_tree, "SELECTION_NOISE", 0.0)
+    for seed, (board, player) in enumerate(positions(4)):
+        position = bitboard.from_array(board)
+        random.seed(seed)
+        root = mcts_uct.MCTSNode(position, player)
+        mcts_uct.run_iterations(root, 400, False)
+        random.seed(seed)
+        tree = array_tree.ArrayTree(1 << 14)
+        array_root = tree.add_root(position, player)
+        array_tree.run_iterations(tree, array_root, 400, False)
+        assert_same_tree(root, tree, array_root)
+        assert mcts_uct.choose_action(root, 0.0) == array_tree.choose_action(tree, array_root)
+
+def test_capacity_is_never_exceeded():
+    board, player = positions(1)[0]
+    action, stats = mcts_uct.mcts_uct(board, player, iterations=500, neural=False, tree="array", capacity=200, return_stats=True)
+    assert action in bitboard.valid_movements(bitboard.from_array(board), player)
+    assert stats["iterations"] == 500 and stats["capacity_used"] <= 1
+
+def test_search_reuses_the_subtree():
+    board, player = positions(1)[0]
+    search = mcts_uct.MCTSSearch(iterations=300, neural=False, tree="array")
+    move = search.search(board, player)
+    child = search.array.child(search.array_root, move)
+    visits = int(search.array.visits[child])
+    search.advance(move)
+    assert search.array_root == child and search.array.visits[child] == visits and search.array.parent[child] == -1
+
+def test_unsupported_options():
+    with pytest.raises(ValueError):
+        mcts_uct.MCTSSearch(neural=False, tree="array", batch_size=8)
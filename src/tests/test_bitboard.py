@@ -0,0 +1,49 @@
+import random
+import numpy as np
+from game import othello, bitboard
+from benchmark.suite import PERFT, perft_array, perft_bitboard
+
+# El motor de bitboards debe dar exactamente los mismos movimientos, capturas y resultados que el recorrido casilla a casilla de game.othello
+
+def random_games(count, seed=0): # Todas las posiciones (tablero, jugador activo) de count partidas aleatorias
+    rng = random.Random(seed)
+    for _ in range(count):
+        board, player = othello.create_board(), othello.BLACK
+        while not othello.is_game_finished(board):
+            yield board.copy(), player
+            movs = othello.valid_movements_scan(board, player)
+            if movs:
+                x, y = rng.choice(movs)
+                othello.apply_movement(board, x, y, player)
+            player = 3 - player
+        yield board.copy(), player
+
+def test_perft():
+    for depth in range(1, 6):
+        assert perft_bitboard(bitboard.create_position(), bitboard.BLACK, depth) == PERFT[depth]
+
+def test_perft_array():
+    for depth in range(1, 5):
+        assert perft_array(othello.create_board(), othello.BLACK, depth) == PERFT[depth]
+
+def test_valid_movements_match_scan():
+    for board, player in random_games(20):
+        assert bitboard.valid_movements(bitboard.from_array(board), player) == othello.valid_movements_scan(board, player)
+
+def test_apply_movement_matches_scan():
+    for board, player in random_games(10, seed=1):
+        position = bitboard.from_array(board)
+        for x, y in othello.valid_movements_scan(board, player):
+            expected = board.copy()  # Movimiento aplicado a mano con las capturas de get_captured_discs
+            for cx, cy in othello.get_captured_discs(board, x, y, player):
+                expected[cx, cy] = player
+            expected[x, y] = player
+            assert np.array_equal(bitboard.to_array(bitboard.apply_movement(position, x, y, player)), expected)
+
+def test_end_of_game_matches_array():
+    for board, player in random_games(10, seed=2):
+        position = bitboard.from_array(board)
+        assert np.array_equal(bitboard.to_array(position), board)
+        assert bitboard.count_discs(position) == othello.count_discs(board)
+        assert bitboard.is_game_finished(position) == (othello.is_board_full(board) or not (othello.valid_movements_scan(board, 1) or othello.valid_movements_scan(board, 2)))
+        assert bitboard.get_winner(position) == othello.get_winner(board)
@@ -0,0 +1,61 @@
+import os
+import random
+import numpy as np
+from game import othello
+from data import dataset
+
+# Escritura y lectura del formato binario por shards de data.dataset
+
+def random_games(count, seed=0, policy=False): # Muestras (estado, jugador, resultado[, política]) de count partidas aleatorias, como las del generador
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        board, player = othello.create_board(), othello.BLACK
+        game = []
+        while not othello.is_game_finished(board):
+            movs = othello.valid_movements(board, player)
+            if movs:
+                game.append((board.copy(), player))
+                x, y = rng.choice(movs)
+                othello.apply_movement(board, x, y, player)
+            player = 3 - player
+        winner = othello.get_winner(board)
+        for state, player in game:
+            sample = (state, player, 0 if winner == 0 else (1 if winner == player else -1))
+            samples.append(sample + (np.full(64, 1 / 64),) if policy else sample)
+    return samples
+
+def test_pack_boards_round_trip():
+    boards = np.stack([state for state, _, _ in random_games(3)])
+    assert np.array_equal(dataset.unpack_boards(*dataset.pack_boards(boards)), boards)
+
+def test_write_and_read(tmp_path):
+    first, second = random_games(3, seed=0), random_games(2, seed=1, policy=True)
+    data = dataset.Dataset(str(tmp_path))
+    assert data.append(first) == 3
+    assert data.append(second) == 2
+
+    reopened = dataset.Dataset(str(tmp_path))  # Se lee desde el índice guardado
+    assert len(reopened) == len(first) + len(second) and reopened.index["games"] == 5
+    boards, players, results = reopened.load()
+    samples = first + second
+    assert np.array_equal(boards, np.stack([sample[0] for sample in samples]))
+    assert players.tolist() == [sample[1] for sample in samples]
+    assert results.tolist() == [sample[2] for sample in samples]
+
+    shard = reopened.shard(1)
+    assert isinstance(shard, np.memmap) and set(shard["game"].tolist()) == {3, 4}
+    assert shard["ply"][0] == 0
+    assert reopened.policy(0) is None
+    assert reopened.policy(1).shape == (len(second), 64)
+
+def test_clear(tmp_path):
+    data = dataset.Dataset(str(tmp_path))
+    data.append(random_games(1, seed=0, policy=True))
+    data.append(random_games(1, seed=1, policy=True))
+    os.remove(os.path.join(str(tmp_path), data.index["shards"][0]["file"]))  # Ficheros borrados a mano no impiden vaciar el conjunto
+    os.remove(os.path.join(str(tmp_path), data.index["shards"][1]["policy"]))
+    data.clear()
+    assert os.listdir(str(tmp_path)) == [dataset.INDEX_NAME]
+    reopened = dataset.Dataset(str(tmp_path))
+    assert len(reopened) == 0 and reopened.index["shards"] == [] and reopened.load()[0].shape == (0, 8, 8)
@@ -0,0 +1,28 @@
+import random
+from game import bitboard
+from agent import endgame
+from benchmark.endgame import random_position
+
+# El solver de finales debe dar el mismo valor que un minimax sin poda, ordenación ni tabla
+
+def brute_force(own, opp, passed=False): # Diferencia final de fichas (propias - rival) con juego perfecto, recorriendo el árbol entero
+    moves = bitboard.move_mask(own, opp)
+    if not moves:
+        if passed or not bitboard.move_mask(opp, own):
+            return own.bit_count() - opp.bit_count()
+        return -brute_force(opp, own, True)
+    best = -65
+    for square in bitboard.squares(moves):
+        flipped = bitboard.flip_mask(own, opp, square)
+        best = max(best, -brute_force(opp & ~flipped, own | flipped | (1 << square)))
+    return best
+
+def test_solver_matches_brute_force():
+    random.seed(0)
+    solver = endgame.EndgameSolver()  # Una sola tabla para todas las posiciones, como en una partida
+    for empties in (3, 5, 7):
+        for _ in range(5):
+            position, player = random_position(empties)
+            expected = brute_force(*bitboard.split(position, player))
+            assert solver.outcome(position, player) == (expected > 0) - (expected < 0)
+            assert solver.solve(position, player, exact=True) == expected  # Después de outcome, con las cotas de la ventana estrecha ya en la tabla
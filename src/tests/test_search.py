@@ -0,0 +1,37 @@
+import random
+from game import bitboard, othello
+from agent import mcts_uct, parallel_mcts
+from benchmark.batched_search import positions
+
+# Propiedades de la búsqueda que no dependen de la red (simulaciones aleatorias con semilla fija)
+
+def test_early_stop_keeps_the_move(): # Parar antes no cambia la jugada: con la misma semilla, la búsqueda completa repite las mismas iteraciones y sigue
+    stopped = 0
+    for seed, (board, player) in enumerate(positions(4)):
+        random.seed(seed)
+        early, stats = mcts_uct.mcts_uct(board, player, iterations=600, neural=False, early_stop=True, return_stats=True)
+        random.seed(seed)
+        root = mcts_uct.MCTSNode(bitboard.from_array(board), player)
+        mcts_uct.search(root, 600, False)
+        stopped += stats["iterations"] < 600
+        assert early == mcts_uct.choose_action(root, by_visits=True)
+    assert stopped  # Al menos una búsqueda ha parado antes, si no la prueba no comprueba nada
+
+def test_parallel_without_visits_plays_a_legal_move(): # Con el tiempo agotado antes de la primera iteración no hay hijos visitados
+    board, player = positions(1)[0]
+    action, stats = parallel_mcts.parallel_mcts(board, player, iterations=100, neural=False, mode="tree", time_limit=0, return_stats=True)
+    assert stats["iterations"] == 0
+    assert action in bitboard.valid_movements(bitboard.from_array(board), player)
+
+def test_parallel_tree_is_reused(): # En modo "tree" la búsqueda sigue desde el subárbol de la jugada anterior, como MCTSSearch
+    board, player = positions(1)[0]
+    search = parallel_mcts.ParallelSearch(iterations=300, neural=False, workers=2, mode="tree")
+    move = search.search(board, player)
+    previous = search.root
+    search.advance(move)
+    kept = search.root.visits
+    assert search.root in previous.children and search.root.parent is None and kept > 0
+    board = board.copy()
+    othello.apply_movement(board, move[0], move[1], player)
+    search.search(board, 3 - player)
+    assert search.root.visits == kept + 300